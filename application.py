@@ -44,18 +44,35 @@ import json
 import numpy as np
 import pandas as pd
 import os
-import psycopg2
 
 # Import internal functions we need for TeamReel data infra, video and DB:
 from data_infra.data_pipelines import get_next_video
 from data_infra.postgresql_db_functions import get_feedback_for_user
 from data_infra.postgresql_db_functions import get_feedback_for_video, get_video_info
+from data_infra.postgresql_db_functions import upsert_video_feedback
+from data_infra.job_workspace import JobWorkspace
+from data_infra.analysis_cache import ANALYSIS_CACHE_ENABLED, AnalysisCache
+from data_infra.analysis_cache import get_analysis_version
 
-from audio_analysis.audio_functions import get_audio_from_video, get_transcript_from_audio
+from audio_analysis.audio_functions import get_transcript_from_audio
 from audio_analysis.audio_functions import get_audio_sentiment_analysis, get_speed_of_speech
-from audio_analysis.audio_functions import get_text_sentiment, remove_files
+from audio_analysis.audio_functions import get_text_sentiment, tokenize, warm_up
+from audio_analysis.audio_functions import AUDIO_MODEL_ENGINE, AUDIO_MODEL_PRECISION
+from audio_analysis.audio_functions import get_audio_model_files
+from audio_analysis.audio_functions import VAD_ENABLED
+from audio_analysis.asr_backends import ASR_BACKEND
+from audio_analysis.audio_buffer import AudioBuffer
+from audio_analysis.acoustic_metrics import get_acoustic_metrics
+from audio_analysis.filler_words import FILLER_LEXICON_PATH, get_filler_words
+from audio_analysis.vocabulary import get_vocabulary_richness, get_word_frequency_table_files
 
 # Import functions we need from facial_analysis package
+# (only modules that don't need OpenCV and dlib; facial_alignment, which
+# does, is imported in run_video_analysis):
+from facial_analysis.facial_settings import FACE_DETECTION_SCALE, FACE_KEYFRAME_INTERVAL, FACE_TRACKING
+from facial_analysis.facial_settings import EMOTION_MODEL_PATH, FACIAL_SAMPLE_FPS, FACIAL_WORKERS
+from facial_analysis.facial_settings import SHAPE_PREDICTOR_PATH
+from facial_analysis.visual_emotion import EMOTION_INPUT_SIZE, get_visual_emotions, has_emotion_model
 
 # Import functions we need from audio_analysis.background_noise module
 
@@ -69,25 +86,16 @@ application = Flask(__name__)
 # Get access info from .env file:
 load_dotenv()
 
-# PostgreSQL DB info:
-PG_DB_HOST = os.getenv("PG_DB_HOST")
-PG_DB_PORT = os.getenv("PG_DB_PORT")
-PG_DB_NAME = os.getenv("PG_DB_NAME")
-PG_DB_USER = os.getenv("PG_DB_USER")
-PG_DB_PW = os.getenv("PG_DB_PW")
-PG_DB_URI = os.getenv("PG_DB_URI")
+# Our ML models and heavy ML libraries (TensorFlow, etc.) load lazily, on
+# the first video analysis, so the API starts fast and the read-only
+# endpoints never load them. Set WARM_UP_MODELS=true on workers that
+# analyze videos to load them at startup instead:
+if os.getenv("WARM_UP_MODELS", "false").lower() in ("1", "true", "yes"):
+    warm_up()
 
-# Open a connection to our PostgreSQL DB:
-pg_conn = psycopg2.connect(
-    host = PG_DB_HOST,
-    port = PG_DB_PORT,
-    database = PG_DB_NAME,
-    user = PG_DB_USER,
-    password = PG_DB_PW
-)
-
-# Instantiate a cursor using this connection:
-pg_cursor = pg_conn.cursor()
+# Cache of ML analysis results, keyed by video content (see
+# get_analysis_cache), created on first use:
+_analysis_cache = None
 
 
 # ----------------------------------------------------------------------------
@@ -184,12 +192,26 @@ def analyze_new_video():
     Returns true if received.
     """
 
-    # GET BASE MATERIALS: VIDEO, AUDIO, TRANSCRIPT:
+    # Run the analysis in its own workspace (a private temp directory for
+    # this job's files), which is removed when the job ends, even on error,
+    # so several analyses can run at once in the same process/container:
+    with JobWorkspace() as workspace:
+        return analyze_next_video(workspace=workspace)
+
+
+def analyze_next_video(workspace:JobWorkspace):
+    """
+    Gets the next video in line, analyzes it and adds/updates its analysis
+    in the 'videos_feedback' table in our DB (see '/analyze_new_video'),
+    writing all intermediate files to the given job workspace.
+    """
+
+    # GET BASE MATERIALS: VIDEO:
 
     # Get next video in line for analysis (recently uploaded by a user):
     # (1) video_info dict = info about that video from our DB (video_id, etc.)
-    # (2) download .MP4 video file to project directory
-    video_info = get_next_video()
+    # (2) download .MP4 video file to the job's workspace
+    video_info = get_next_video(workspace=workspace)
 
     # Exception handling: If get_next_video() returns "No messages in queue."
     # to indicate there are no messages in the SQS queue (no new videos
@@ -199,7 +221,7 @@ def analyze_new_video():
         return "No new videos uploaded since last check."
 
     try:
-        video_filename = video_info['video']['s3_filename']
+        video_filename = workspace.path(video_info['video']['s3_filename'])
         video_id = video_info['video']['video_id']
         video_s3_key = video_info['video']['s3_key']
     except KeyError:
@@ -209,55 +231,27 @@ def analyze_new_video():
 
     print(f"video_id: {video_id} \nvideo_s3_key: {video_s3_key}")  # [?? To do: remove this! ??]
 
-    # Get audio from the video file:
-    audio_filename = get_audio_from_video(video_filename=video_filename,
-                                          save_audio_as='audio.wav')
-
-    # Get transcript for the audio (which is from the video):
-    transcript_filename = get_transcript_from_audio(audio_filename=audio_filename,
-                                                    save_transcript_as='audio_transcript.txt')
-    transcript_string = open(transcript_filename).read().replace("\n", " ")
-
-
-    # --------------------------------------------------------------------
-    # SENTIMENT ANALYSIS:
-
-    # VISUAL SENTIMENT:
+    # Get the ML analysis results for this video: from our analysis cache
+    # if these exact video bytes were analyzed before (e.g., an SQS
+    # redelivery or a duplicate upload), else by running our ML functions:
+    results = get_video_analysis_results(video_filename=video_filename,
+                                         workspace=workspace)
 
-    # [?? To add: Facial centering: Call Chris Huskey's master function and get results ??]
-    # visual_sentiment_results = [?? To add ??]
-
-    # Values for our DB videos_feedback table:
-    sentiment_visual = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
-    sentiment_visual_details_fake = {
-        "emotions": {
-            "sad": 0.4816375482887931,
-            "calm": 0.8443668165181737,
-            "fear": 0.9012952623858596,
-            "angry": 0.031246441854258622,
-            "happy": 0.45286566659565175,
-            "confused": 0.163269892703233,
-            "disgusted": 0.9995419575080721,
-            "surprised": 0.7591465415994776
-        }
-    }
-    sentiment_visual_details = json.dumps(sentiment_visual_details_fake)
-
-    # AUDIO AND TEXT SENTIMENT:
-
-    audio_sentiment = get_audio_sentiment_analysis(audio_filename=audio_filename)
-    text_sentiment = get_text_sentiment(file=transcript_filename)
-
-    # Values for our DB videos_feedback table:
-    sentiment_audio = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
-    sentiment_audio_details = json.dumps(audio_sentiment)
+    sentiment_visual = results['sentiment_visual']
+    sentiment_visual_details = json.dumps(results['sentiment_visual_details'])
+    sentiment_audio = results['sentiment_audio']
+    sentiment_audio_details = json.dumps(results['sentiment_audio_details'])
+    background_noise = results['background_noise']
+    speaking_volume = results['speaking_volume']
+    speaking_filler_words = results['speaking_filler_words']
+    speaking_vocabulary = results['speaking_vocabulary']
+    appearance_facial_centering = results['appearance_facial_centering']
 
 
     # --------------------------------------------------------------------
     # SPEAKING SPEED:
 
-    speaking_speed = get_speed_of_speech(transcript_filename=transcript_filename,
-                                          audio_filename=audio_filename)
+    speaking_speed = results['speaking_speed']
 
     # Speaking speed summary stats:
     ss_mean = 160
@@ -277,27 +271,6 @@ def analyze_new_video():
       speaking_speed_score = 2
 
 
-    # --------------------------------------------------------------------
-    # BACKGROUND NOISE:
-
-    # [To add:] Background noise: Call Chris Howell's master function and get results
-    # background_noise_score = [?? To add ??]
-
-    # Values for our DB videos_feedback table:
-    background_noise = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
-
-
-    # --------------------------------------------------------------------
-    # APPEARANCE: FACIAL CENTERING:
-
-    # [To add:] Facial alignment and centering: Call Chris Huskey's master function
-    # and get results
-    # appearance_facial_centering = [?? To add ??]
-
-    # Values for our DB videos_feedback table:
-    appearance_facial_centering = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
-
-
     # --------------------------------------------------------------------
     # HUMAN FEEDBACK:
 
@@ -339,10 +312,10 @@ def analyze_new_video():
     sentiment_audio = sentiment_audio
     sentiment_audio_details = sentiment_audio_details
     speaking_confidence = 0
-    speaking_volume = 0
-    speaking_vocabulary = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
+    speaking_volume = speaking_volume
+    speaking_vocabulary = speaking_vocabulary
     speaking_speed = speaking_speed_score
-    speaking_filler_words = 0
+    speaking_filler_words = speaking_filler_words
     background_visual_environment = 0
     background_noise = background_noise
     appearance_facial_centering = appearance_facial_centering
@@ -384,7 +357,8 @@ def analyze_new_video():
     overall_performance = np.dot(overall_performance_factors,
                                  overall_performance_weights)
 
-    # For our SQL queries below: Dictionary of values to insert into SQL queries:
+    # For our SQL query below: Dictionary of values to insert (one per
+    # column in VIDEOS_FEEDBACK_COLUMNS):
     values_to_insert = {
         'video_id': video_id,
         'overall_performance': overall_performance,
@@ -414,124 +388,17 @@ def analyze_new_video():
         'human_visual_environment': human_visual_environment
     }
 
-    # Add the analysis for this video to the videos_feedback table in our DB:
-
-    # Check if record for this video exists in the videos_feedback table yet,
-    # and UPDATE or CREATE the record accordingly:
-    query = f"SELECT EXISTS (SELECT * FROM videos_feedback WHERE video_id = {video_id})"
-    pg_cursor.execute(query)
-    exists_in_vf_table = pg_cursor.fetchall()[0][0]
-
-    print(f"exists_in_vf_table: {exists_in_vf_table}")
+    # Add the analysis for this video to the videos_feedback table in our DB
+    # (or update its row, if it has one already), in one atomic upsert:
     print(f"values_to_insert: \n{values_to_insert}")
-
-    if exists_in_vf_table:
-        print(f"Yes, exists in vf table --> update values.")
-        # Update record in videos_feedback table:
-        pg_cursor.execute(
-            """
-            UPDATE videos_feedback
-            SET
-                overall_performance = %(overall_performance)s,
-                delivery_and_presentation = %(delivery_and_presentation)s,
-                response_quality = %(response_quality)s,
-                audio_quality = %(audio_quality)s,
-                visual_environment = %(visual_environment)s,
-                attitude = %(attitude)s,
-                sentiment_visual = %(sentiment_visual)s,
-                sentiment_visual_details = %(sentiment_visual_details)s,
-                sentiment_audio = %(sentiment_audio)s,
-                sentiment_audio_details = %(sentiment_audio_details)s,
-                speaking_confidence = %(speaking_confidence)s,
-                speaking_volume = %(speaking_volume)s,
-                speaking_vocabulary = %(speaking_vocabulary)s,
-                speaking_speed = %(speaking_speed)s,
-                speaking_filler_words = %(speaking_filler_words)s,
-                background_visual_environment = %(background_visual_environment)s,
-                background_noise = %(background_noise)s,
-                appearance_facial_centering = %(appearance_facial_centering)s,
-                appearance_posture = %(appearance_posture)s,
-                appearance_gesticulation = %(appearance_gesticulation)s,
-                human_overall_performance = %(human_overall_performance)s,
-                human_delivery_and_presentation = %(human_delivery_and_presentation)s,
-                human_response_quality = %(human_response_quality)s,
-                human_audio_quality = %(human_audio_quality)s,
-                human_visual_environment = %(human_visual_environment)s
-            WHERE video_id = %(video_id)s
-            """,
-            values_to_insert
-        )
-    else:
-        print(f"No, does NOT exist in vf table --> add values as new row.")
-        # Create record in videos_feedback table:
-        pg_cursor.execute(
-            """
-            INSERT INTO videos_feedback(
-                                        video_id,
-                                        overall_performance,
-                                        delivery_and_presentation,
-                                        response_quality,
-                                        audio_quality,
-                                        visual_environment,
-                                        attitude,
-                                        sentiment_visual,
-                                        sentiment_visual_details,
-                                        sentiment_audio,
-                                        sentiment_audio_details,
-                                        speaking_confidence,
-                                        speaking_volume,
-                                        speaking_vocabulary,
-                                        speaking_speed,
-                                        speaking_filler_words,
-                                        background_visual_environment,
-                                        background_noise,
-                                        appearance_facial_centering,
-                                        appearance_posture,
-                                        appearance_gesticulation,
-                                        human_overall_performance,
-                                        human_delivery_and_presentation,
-                                        human_response_quality,
-                                        human_audio_quality,
-                                        human_visual_environment
-                                        )
-            VALUES (%(video_id)s,
-                    %(overall_performance)s,
-                    %(delivery_and_presentation)s,
-                    %(response_quality)s,
-                    %(audio_quality)s,
-                    %(visual_environment)s,
-                    %(attitude)s,
-                    %(sentiment_visual)s,
-                    %(sentiment_visual_details)s,
-                    %(sentiment_audio)s,
-                    %(sentiment_audio_details)s,
-                    %(speaking_confidence)s,
-                    %(speaking_volume)s,
-                    %(speaking_vocabulary)s,
-                    %(speaking_speed)s,
-                    %(speaking_filler_words)s,
-                    %(background_visual_environment)s,
-                    %(background_noise)s,
-                    %(appearance_facial_centering)s,
-                    %(appearance_posture)s,
-                    %(appearance_gesticulation)s,
-                    %(human_overall_performance)s,
-                    %(human_delivery_and_presentation)s,
-                    %(human_response_quality)s,
-                    %(human_audio_quality)s,
-                    %(human_visual_environment)s
-                    )
-            """,
-            values_to_insert
-        )
-
-    pg_conn.commit()
+    upsert_video_feedback(values_to_insert)
 
 
     # --------------------------------------------------------------------
     # REMOVE FILES:
 
-    remove_files(specified_files_list=[transcript_filename, audio_filename])
+    # (All of this job's files are in its workspace, which is removed by
+    # analyze_new_video when this function returns.)
 
     # --------------------------------------------------------------------
     # RETURN:
@@ -541,6 +408,183 @@ def analyze_new_video():
     return json.dumps(True)
 
 
+def get_analysis_cache():
+    """
+    Returns our analysis cache (created on the first call), or None if it
+    is turned off (ANALYSIS_CACHE_ENABLED=false).
+    """
+    global _analysis_cache
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+
+    if _analysis_cache is None:
+        version = get_analysis_version(file_paths=(get_audio_model_files()
+                                                   + get_word_frequency_table_files()
+                                                   + [FILLER_LEXICON_PATH,
+                                                      SHAPE_PREDICTOR_PATH, EMOTION_MODEL_PATH]),
+                                       settings={'ASR_BACKEND': ASR_BACKEND,
+                                                 'AUDIO_MODEL_ENGINE': AUDIO_MODEL_ENGINE,
+                                                 'AUDIO_MODEL_PRECISION': AUDIO_MODEL_PRECISION,
+                                                 'VAD_ENABLED': VAD_ENABLED,
+                                                 'FILLER_LEXICON_PATH': FILLER_LEXICON_PATH,
+                                                 'FACIAL_SAMPLE_FPS': FACIAL_SAMPLE_FPS,
+                                                 'FACE_TRACKING': FACE_TRACKING,
+                                                 'FACE_DETECTION_SCALE': FACE_DETECTION_SCALE,
+                                                 'FACE_KEYFRAME_INTERVAL': FACE_KEYFRAME_INTERVAL,
+                                                 'FACIAL_WORKERS': FACIAL_WORKERS})
+        _analysis_cache = AnalysisCache(version=version)
+    return _analysis_cache
+
+
+def get_video_analysis_results(video_filename:str, workspace:JobWorkspace):
+    """
+    Returns the ML analysis results for a video file (see
+    run_video_analysis): cached results if this video's exact bytes were
+    already analyzed with the current analysis version, else new results
+    (which are then cached).
+    """
+    analysis_cache = get_analysis_cache()
+    if analysis_cache is None:
+        return run_video_analysis(video_filename=video_filename, workspace=workspace)
+
+    cache_key = analysis_cache.key_for_file(video_filename)
+    results = analysis_cache.get(cache_key)
+    if results is not None:
+        print(f"Analysis cache hit: {cache_key} -> skipping ML analysis.")
+        return results
+
+    results = run_video_analysis(video_filename=video_filename, workspace=workspace)
+    analysis_cache.put(cache_key, results)
+    return results
+
+
+def run_video_analysis(video_filename:str, workspace:JobWorkspace):
+    """
+    Runs our ML functions on a video file and returns their results (all
+    JSON-serializable, so they can be cached): transcript, visual, audio
+    and text sentiment, speaking speed (words per minute), filler words,
+    vocabulary richness, background noise, speaking volume (and the
+    acoustic metrics behind both) and facial centering.
+    """
+
+    # GET BASE MATERIALS: AUDIO, TRANSCRIPT:
+
+    # Get audio from the video file: decode only the audio track, once,
+    # straight into memory, and share it across all audio analysis stages:
+    audio_buffer = AudioBuffer.from_video(video_filename=video_filename)
+
+    # Get transcript for the audio (which is from the video):
+    transcript_filename = get_transcript_from_audio(audio_buffer=audio_buffer,
+                                                    save_transcript_as='audio_transcript.txt',
+                                                    workspace=workspace)
+    transcript_string = open(transcript_filename).read().replace("\n", " ")
+
+
+    # --------------------------------------------------------------------
+    # SENTIMENT ANALYSIS:
+
+    # VISUAL SENTIMENT:
+
+    # One pass over frames sampled from the video finds the speaker's face
+    # and landmarks (for facial centering, below) and, if we have the
+    # emotion model, crops the aligned face for emotion recognition (the
+    # per-frame stats are not kept, to keep our cached results small).
+    # Skipped (scores 0, "not set" in our DB) on workers without OpenCV and
+    # dlib, or without the dlib model:
+    try:
+        # (Imported here, so OpenCV and dlib only load on workers that
+        # analyze videos:)
+        from facial_analysis.facial_alignment import get_facial_alignment
+
+        facial_centering = get_facial_alignment(video_filename=video_filename,
+                                                face_crop_size=EMOTION_INPUT_SIZE if has_emotion_model() else None)
+        facial_frames = facial_centering.pop('frames')
+    except (ImportError, FileNotFoundError) as e:
+        print(f"Skipping facial analysis: {e}")
+        facial_centering = {'score': 0}
+        facial_frames = {}
+
+    # Facial expressions, classified in batches across all face crops:
+    visual_emotions = get_visual_emotions(facial_frames.get('face_crops'))
+
+    # Values for our DB videos_feedback table:
+    sentiment_visual = visual_emotions['score']
+    sentiment_visual_details = visual_emotions
+
+    # AUDIO AND TEXT SENTIMENT:
+
+    audio_sentiment = get_audio_sentiment_analysis(audio_buffer=audio_buffer)
+    text_sentiment = get_text_sentiment(file=transcript_filename)
+
+    # Values for our DB videos_feedback table:
+    sentiment_audio = np.random.uniform(3, 5)  # [?? To do: REMOVE this ??]
+
+
+    # --------------------------------------------------------------------
+    # SPEAKING SPEED:
+
+    speaking_speed = get_speed_of_speech(transcript_filename=transcript_filename,
+                                          audio_buffer=audio_buffer)
+
+
+    # --------------------------------------------------------------------
+    # FILLER WORDS:
+
+    filler_words = get_filler_words(transcript_string,
+                                    duration_minutes=audio_buffer.duration / 60)
+
+    # Score (1-5) for our DB videos_feedback table:
+    speaking_filler_words = filler_words['score']
+
+
+    # --------------------------------------------------------------------
+    # VOCABULARY:
+
+    vocabulary = get_vocabulary_richness(tokenize(transcript_string))
+
+    # Score (1-5) for our DB videos_feedback table:
+    speaking_vocabulary = vocabulary['score']
+
+    # --------------------------------------------------------------------
+    # BACKGROUND NOISE AND SPEAKING VOLUME:
+
+    # Loudness, noise floor, SNR and clipping, from the same per-frame
+    # stats as voice activity detection (already computed for this audio):
+    acoustic_metrics = get_acoustic_metrics(audio_buffer=audio_buffer)
+
+    # Scores (1-5) for our DB videos_feedback table:
+    background_noise = acoustic_metrics['background_noise']
+    speaking_volume = acoustic_metrics['speaking_volume']
+
+
+    # --------------------------------------------------------------------
+    # APPEARANCE: FACIAL CENTERING:
+
+    # (Facial alignment and centering were analyzed with visual sentiment,
+    # above.)
+
+    # Score (1-5) for our DB videos_feedback table:
+    appearance_facial_centering = facial_centering['score']
+
+
+    return {'transcript': transcript_string,
+            'sentiment_visual': float(sentiment_visual),
+            'sentiment_visual_details': sentiment_visual_details,
+            'sentiment_audio': float(sentiment_audio),
+            'sentiment_audio_details': audio_sentiment,
+            'text_sentiment': float(text_sentiment),
+            'speaking_speed': float(speaking_speed),
+            'speaking_filler_words': speaking_filler_words,
+            'filler_words': filler_words,
+            'speaking_vocabulary': speaking_vocabulary,
+            'vocabulary': vocabulary,
+            'background_noise': background_noise,
+            'speaking_volume': speaking_volume,
+            'acoustic_metrics': acoustic_metrics,
+            'appearance_facial_centering': appearance_facial_centering,
+            'facial_centering': facial_centering}
+
+
 # ----------------------------------------------------------------------------
 # '/get_user_performance': Takes in a JSON with a TeamReel user_id
 # (the id in our DB's 'users' table), and returns a JSON with analysis of
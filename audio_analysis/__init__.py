@@ -8,7 +8,8 @@ and for audio sentiment analysis.
 
 from .audio_functions import get_audio_from_video, get_transcript_from_audio
 from .audio_functions import get_audio_sentiment_analysis, get_speed_of_speech
-from .audio_functions import get_text_sentiment, remove_files
+from .audio_functions import get_text_sentiment, remove_files, warm_up
+from .audio_buffer import AudioBuffer
 
 
 __all__ = ["get_audio_from_video",
@@ -16,5 +17,7 @@ __all__ = ["get_audio_from_video",
            "get_audio_sentiment_analysis",
            "get_speed_of_speech",
            "get_text_sentiment",
-           "remove_files"
+           "remove_files",
+           "AudioBuffer",
+           "warm_up"
            ]
@@ -0,0 +1,140 @@
+#!python
+
+"""
+Module with acoustic metrics for TeamReel videos -- how loud the speaker
+is, how noisy the background is, and whether the audio clips -- and their
+1-5 scores for the 'speaking_volume' and 'background_noise' columns of our
+DB's videos_feedback table.
+
+All metrics come from one pass over the audio: the per-frame stats that our
+voice activity detector already computes (see voice_activity.py; computed
+once per AudioBuffer and shared), split into speech and non-speech frames
+by its speech-segment map. Nothing is decoded or transformed a second time.
+"""
+
+# Import external modules, packages, libraries we will use:
+import numpy as np
+
+# Import internal modules, packages, libraries for this project:
+from .audio_buffer import AudioBuffer, stream_audio_from_video
+from .voice_activity import FrameStats, get_frame_stats, get_speech_mask
+from .voice_activity import stream_frame_stats
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# A frame is clipped if its peak reaches (almost) full scale:
+CLIPPING_PEAK_LEVEL = 0.999
+
+# Score thresholds (score: min value), checked from best to worst:
+# Background noise: signal-to-noise ratio of speech vs. background (dB):
+SNR_SCORE_THRESHOLDS = [(5, 30), (4, 20), (3, 12), (2, 6)]
+# Speaking volume: speech loudness (dBFS), best between -26 and -12 dBFS:
+VOLUME_SCORE_RANGES = [(5, -26, -12), (4, -32, -6), (3, -40, -3), (2, -48, 0)]
+# Speaking volume is capped at this score if more than this share of speech
+# frames clip (distorted audio):
+CLIPPING_MAX_RATIO = 0.01
+CLIPPING_MAX_SCORE = 2
+
+
+# -------------------------------------------------------------------------
+def _mean_level_db(levels_db):
+    """
+    Mean of levels in dB, averaged as energy (not as dB values).
+    """
+    return float(10 * np.log10(np.mean(np.power(10.0, levels_db / 10.0))))
+
+
+def compute_acoustic_metrics(frame_stats:FrameStats, speech_mask=None):
+    """
+    Computes acoustic metrics from per-frame stats and a speech mask (True
+    for speech frames; default: our voice activity detector's):
+
+    speech_level_dbfs: Mean loudness of speech frames (dBFS)
+    noise_floor_dbfs: Mean loudness of non-speech frames (dBFS)
+    snr_db: Signal-to-noise ratio: speech level minus noise floor (dB)
+    clipping_ratio: Share of speech frames that clip
+    speech_ratio: Share of frames that are speech
+
+    Metrics that need speech (or non-speech) frames are None without them.
+    """
+    if speech_mask is None:
+        speech_mask = get_speech_mask(frame_stats)
+
+    metrics = {'speech_level_dbfs': None,
+               'noise_floor_dbfs': None,
+               'snr_db': None,
+               'clipping_ratio': None,
+               'speech_ratio': float(np.mean(speech_mask)) if len(speech_mask) else 0.0}
+
+    if np.any(speech_mask):
+        metrics['speech_level_dbfs'] = _mean_level_db(frame_stats.rms_dbfs[speech_mask])
+        metrics['clipping_ratio'] = float(np.mean(frame_stats.peak[speech_mask] >= CLIPPING_PEAK_LEVEL))
+    if not np.all(speech_mask):
+        metrics['noise_floor_dbfs'] = _mean_level_db(frame_stats.rms_dbfs[~speech_mask])
+    if metrics['speech_level_dbfs'] is not None and metrics['noise_floor_dbfs'] is not None:
+        metrics['snr_db'] = metrics['speech_level_dbfs'] - metrics['noise_floor_dbfs']
+
+    return metrics
+
+
+def get_background_noise_score(metrics:dict):
+    """
+    Translates acoustic metrics to a background noise score from 1-5 (5 =
+    quiet background), or 0 ("not set" in our DB) if there is no speech to
+    compare the background to.
+    """
+    if metrics['speech_level_dbfs'] is None:
+        return 0
+    if metrics['snr_db'] is None:
+        # Speech from start to end, no background-only frames to measure:
+        return 5
+
+    for score, min_snr_db in SNR_SCORE_THRESHOLDS:
+        if metrics['snr_db'] >= min_snr_db:
+            return score
+    return 1
+
+
+def get_speaking_volume_score(metrics:dict):
+    """
+    Translates acoustic metrics to a speaking volume score from 1-5 (5 =
+    speech at a comfortable level, neither too quiet nor too loud, and not
+    clipping), or 0 ("not set" in our DB) if there is no speech.
+    """
+    if metrics['speech_level_dbfs'] is None:
+        return 0
+
+    volume_score = 1
+    for score, low_dbfs, high_dbfs in VOLUME_SCORE_RANGES:
+        if low_dbfs <= metrics['speech_level_dbfs'] <= high_dbfs:
+            volume_score = score
+            break
+
+    if metrics['clipping_ratio'] > CLIPPING_MAX_RATIO:
+        volume_score = min(volume_score, CLIPPING_MAX_SCORE)
+    return volume_score
+
+
+def get_acoustic_metrics(audio_buffer:AudioBuffer=None, video_filename:str=None,
+                         sample_rate:int=44100):
+    """
+    Returns acoustic metrics (see compute_acoustic_metrics) plus the
+    'background_noise' and 'speaking_volume' scores for a video's audio.
+
+    Pass the already-decoded audio_buffer (shares its cached frame stats
+    with voice activity detection), or a video_filename to stream its audio
+    through ffmpeg with bounded memory (one block of audio at a time).
+    """
+    if audio_buffer is not None:
+        frame_stats = get_frame_stats(audio_buffer)
+    else:
+        frame_stats = stream_frame_stats(stream_audio_from_video(video_filename=video_filename,
+                                                                 sample_rate=sample_rate),
+                                         sample_rate=sample_rate)
+
+    metrics = compute_acoustic_metrics(frame_stats)
+    metrics['background_noise'] = get_background_noise_score(metrics)
+    metrics['speaking_volume'] = get_speaking_volume_score(metrics)
+    return metrics
@@ -0,0 +1,165 @@
+#!python
+
+"""
+Module of ASR (automatic speech recognition, speech-to-text) backends for
+transcribing the audio from TeamReel videos. Every backend takes in-memory
+audio (a NumPy array of float samples plus its sample rate) and returns the
+text, so audio chunks can be transcribed in parallel without writing them
+to disk:
+
+- GoogleASRBackend: the Google Web Speech API, via SpeechRecognition
+(what we have always used; needs network access).
+- DeepSpeechASRBackend: Mozilla DeepSpeech, run in-process and offline,
+using the model files from our DeepSpeech/DeepSpeech_functions.py setup.
+
+Use get_asr_backend() to get the backend selected by the ASR_BACKEND env
+var ('google' (default) or 'deepspeech').
+"""
+
+# Import external modules, packages, libraries we will use:
+from dotenv import load_dotenv
+import numpy as np
+import os
+import threading
+
+# Import internal modules, packages, libraries for this project:
+from .audio_buffer import to_pcm16_bytes
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+ASR_BACKEND = os.getenv("ASR_BACKEND", "google")
+
+
+# -------------------------------------------------------------------------
+class ASRBackend:
+    """
+    Base class for ASR backends.
+
+    Subclasses implement transcribe(). sample_rate is the sample rate the
+    backend wants its audio in (None = any rate), so callers can hand it
+    audio that is already at that rate (e.g., AudioBuffer.chunks(...,
+    sample_rate=backend.sample_rate)).
+    """
+
+    sample_rate = None
+
+    def transcribe(self, samples, sample_rate:int):
+        """
+        Transcribes one chunk of mono audio (float samples in [-1, 1]) and
+        returns the text ("" if the chunk could not be transcribed).
+        """
+        raise NotImplementedError
+
+
+# -------------------------------------------------------------------------
+class GoogleASRBackend(ASRBackend):
+    """
+    ASR with the Google Web Speech API (recognize_google), via the
+    SpeechRecognition library.
+    """
+
+    def transcribe(self, samples, sample_rate:int):
+        import speech_recognition as sr
+
+        audio_data = sr.AudioData(to_pcm16_bytes(samples), sample_rate, 2)
+        return self.recognize(audio_data)
+
+    def recognize(self, audio_data):
+        """
+        Transcribes a speech_recognition.AudioData object.
+        """
+        import speech_recognition as sr
+
+        # Failed chunks give no text (not an error message, which would end
+        # up in the transcript and be scored as if the user had said it):
+        recognizer = sr.Recognizer()
+        try:
+            text = recognizer.recognize_google(audio_data)   # recognize_google_cloud for GC API
+        except sr.UnknownValueError:
+            print("Google Speech Recognition could not understand audio")
+            text = ""
+        except sr.RequestError as e:
+            print("Could not request results from Google Speech Recognition service; {0}".format(e))
+            text = ""
+        return text
+
+
+# -------------------------------------------------------------------------
+class DeepSpeechASRBackend(ASRBackend):
+    """
+    In-process, offline ASR with Mozilla DeepSpeech.
+
+    Model and scorer paths default to the DEEPSPEECH_MODEL and
+    DEEPSPEECH_SCORER env vars, else to the files used by
+    DeepSpeech/DeepSpeech_functions.py. Each worker thread loads its own
+    copy of the model on its first chunk (DeepSpeech models are not safe to
+    share between threads), so memory use grows with the number of ASR
+    workers.
+    """
+
+    def __init__(self, model_path:str=None, scorer_path:str=None,
+                 beam_width:int=None):
+        # Imported here, so the deepspeech package is only needed when
+        # this backend is actually used:
+        from .DeepSpeech import DeepSpeech_functions
+
+        self._functions = DeepSpeech_functions
+        self.model_path = model_path or os.getenv("DEEPSPEECH_MODEL", DeepSpeech_functions.model)
+        self.scorer_path = scorer_path or os.getenv("DEEPSPEECH_SCORER", DeepSpeech_functions.scorer)
+        self.beam_width = beam_width
+        self._local = threading.local()
+
+        # Load one model up front, to fail fast on missing model files and
+        # to get the sample rate the model expects:
+        self.sample_rate = self._get_model().sampleRate()
+
+    def _get_model(self):
+        """
+        Returns this thread's DeepSpeech model, loading it on first use.
+        """
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            model = self._functions.Model(self.model_path)
+            if self.beam_width:
+                model.setBeamWidth(self.beam_width)
+            if self.scorer_path and os.path.exists(self.scorer_path):
+                model.enableExternalScorer(self.scorer_path)
+            self._local.model = model
+        return model
+
+    def transcribe(self, samples, sample_rate:int):
+        if sample_rate != self.sample_rate:
+            raise ValueError(f"DeepSpeech needs {self.sample_rate} Hz audio, got {sample_rate} Hz")
+
+        audio = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        metadata = self._get_model().sttWithMetadata(audio, 1)
+        return self._functions.metadata_to_string(metadata.transcripts[0])
+
+
+# -------------------------------------------------------------------------
+ASR_BACKENDS = {'google': GoogleASRBackend,
+                'deepspeech': DeepSpeechASRBackend}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_asr_backend(name:str=None):
+    """
+    Returns the ASR backend with the given name ('google' or 'deepspeech';
+    default: the ASR_BACKEND env var). Each backend is created once per
+    process and then reused (so DeepSpeech models are not reloaded per job).
+    """
+    name = (name or ASR_BACKEND).lower()
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{name}': use one of {sorted(ASR_BACKENDS)}")
+
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = ASR_BACKENDS[name]()
+        return _backends[name]
@@ -0,0 +1,244 @@
+#!python
+
+"""
+Module with the AudioBuffer class: audio from a TeamReel video decoded once
+into memory and shared by every audio analysis stage (transcript, audio
+sentiment, audio duration and speed of speech), plus a streaming decoder
+that pipes only the audio track out of a video file through ffmpeg.
+"""
+
+# Import external modules, packages, libraries we will use:
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import subprocess
+import tempfile
+import threading
+
+
+# -------------------------------------------------------------------------
+class AudioBuffer:
+    """
+    Decoded mono PCM audio: a float32 NumPy array of samples (in [-1, 1])
+    plus its sample rate.
+
+    Slicing methods (view, windows, chunks) return NumPy views of the
+    decoded samples, not copies. Resampled versions of the audio are made
+    on demand and cached per target sample rate, so each stage that needs
+    a different rate (e.g., 44.1 kHz for the audio sentiment model) pays
+    for that resample only once per video. Other data derived from the
+    audio (e.g., voice activity frame stats) can be cached on the buffer
+    too, with cached().
+    """
+
+    def __init__(self, samples, sample_rate:int):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sample_rate = int(sample_rate)
+        self._resampled = {self.sample_rate: self.samples}
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._cache_lock = threading.RLock()
+
+    @classmethod
+    def from_file(cls, filename:str):
+        """
+        Decodes an audio file (e.g., 'audio.wav') once, at its native
+        sample rate, downmixed to mono.
+        """
+        import librosa
+
+        samples, sample_rate = librosa.load(filename, sr=None, mono=True)
+        return cls(samples=samples, sample_rate=sample_rate)
+
+    @classmethod
+    def from_video(cls, video_filename:str, sample_rate:int=44100):
+        """
+        Decodes only the audio track of a video file (e.g., the user's .mp4)
+        straight into memory via an ffmpeg pipe, at the given sample rate,
+        in mono -- no temporary 'audio.wav' and no video decoding.
+        """
+        blocks = list(stream_audio_from_video(video_filename=video_filename,
+                                              sample_rate=sample_rate,
+                                              channels=1))
+        if blocks:
+            samples = np.concatenate(blocks)
+        else:
+            samples = np.zeros(0, dtype=np.float32)
+        return cls(samples=samples, sample_rate=sample_rate)
+
+    @property
+    def duration(self):
+        """
+        Length of the audio in seconds.
+        """
+        return len(self.samples) / float(self.sample_rate)
+
+    def resample(self, sample_rate:int=None):
+        """
+        Returns the samples at the given sample rate (default: native rate),
+        resampling on first request and caching the result.
+        """
+        if sample_rate is None:
+            return self.samples
+        sample_rate = int(sample_rate)
+
+        with self._lock:
+            if sample_rate not in self._resampled:
+                import librosa
+
+                resampled = librosa.resample(self.samples,
+                                             orig_sr=self.sample_rate,
+                                             target_sr=sample_rate,
+                                             res_type='kaiser_fast')
+                self._resampled[sample_rate] = np.ascontiguousarray(resampled, dtype=np.float32)
+            return self._resampled[sample_rate]
+
+    def view(self, start_seconds:float=0, end_seconds:float=None,
+             sample_rate:int=None):
+        """
+        Returns a view of the samples between start_seconds and end_seconds
+        (default: to the end), at the given sample rate (default: native).
+        """
+        samples = self.resample(sample_rate)
+        rate = sample_rate or self.sample_rate
+        start = int(start_seconds * rate)
+        end = len(samples) if end_seconds is None else int(end_seconds * rate)
+        return samples[start:end]
+
+    def windows(self, window_seconds:float, sample_rate:int=None):
+        """
+        Returns consecutive, non-overlapping windows of window_seconds each,
+        as a 2-D (n_windows, window_length) view of the samples. A trailing
+        partial window is dropped.
+        """
+        samples = self.resample(sample_rate)
+        window_length = int(window_seconds * (sample_rate or self.sample_rate))
+        n_windows = len(samples) // window_length
+        return samples[:n_windows * window_length].reshape(n_windows, window_length)
+
+    def windows_at(self, start_seconds, window_seconds:float, sample_rate:int=None):
+        """
+        Returns windows of window_seconds each, starting at the given times
+        (in seconds), as a 2-D (n_windows, window_length) array. Unlike
+        windows(), the windows may overlap or skip audio, so this is a copy.
+        """
+        samples = self.resample(sample_rate)
+        rate = sample_rate or self.sample_rate
+        window_length = int(window_seconds * rate)
+        starts = np.clip((np.asarray(start_seconds, dtype=np.float64) * rate).astype(np.int64),
+                         0, max(len(samples) - window_length, 0))
+        if len(starts) == 0 or len(samples) < window_length:
+            return np.zeros((0, window_length), dtype=np.float32)
+        # (All windows as a strided view, then a copy of the ones we need:)
+        all_windows = as_strided(samples,
+                                 shape=(len(samples) - window_length + 1, window_length),
+                                 strides=(samples.strides[0], samples.strides[0]),
+                                 writeable=False)
+        return all_windows[starts]
+
+    def chunks_at(self, bounds, sample_rate:int=None):
+        """
+        Returns a list of chunks (views of the samples) between the given
+        (start_seconds, end_seconds) bounds.
+        """
+        return [self.view(start, end, sample_rate=sample_rate) for start, end in bounds]
+
+    def cached(self, key, compute):
+        """
+        Returns data derived from this audio (e.g., voice activity frame
+        stats) under the given key, calling compute() to make it on first
+        request and caching the result for all later callers.
+        """
+        with self._cache_lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def chunks(self, chunk_seconds:float, sample_rate:int=None):
+        """
+        Returns a list of consecutive chunks of chunk_seconds each (views of
+        the samples), keeping a trailing partial chunk, like pydub's
+        make_chunks does.
+        """
+        samples = self.resample(sample_rate)
+        chunk_length = int(chunk_seconds * (sample_rate or self.sample_rate))
+        return [samples[start:start + chunk_length]
+                for start in range(0, len(samples), chunk_length)]
+
+
+# -------------------------------------------------------------------------
+def to_pcm16_bytes(samples):
+    """
+    Converts float samples in [-1, 1] to little-endian 16-bit PCM bytes
+    (e.g., for speech_recognition.AudioData).
+    """
+    pcm16 = np.clip(samples, -1.0, 1.0) * 32767
+    return pcm16.astype('<i2').tobytes()
+
+
+# -------------------------------------------------------------------------
+def get_ffmpeg_exe():
+    """
+    Returns the path to the ffmpeg binary: the one bundled with moviepy's
+    imageio-ffmpeg dependency if installed, otherwise 'ffmpeg' on the PATH.
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return 'ffmpeg'
+
+
+# -------------------------------------------------------------------------
+def stream_audio_from_video(video_filename:str, sample_rate:int=44100,
+                            channels:int=1, block_seconds:float=1.0):
+    """
+    Generator that demuxes and decodes only the audio track of a video file
+    through an ffmpeg pipe, as raw 16-bit PCM at the given sample rate and
+    channel count, and yields it in fixed-size float32 blocks of
+    block_seconds each (the last block may be shorter), so downstream
+    stages can start on the first seconds of audio before the whole file
+    is decoded.
+
+    Blocks have shape (n_samples,) for mono or (n_samples, channels) for
+    multi-channel audio, with values in [-1, 1).
+    """
+    frame_bytes = 2 * channels
+    block_bytes = int(block_seconds * sample_rate) * frame_bytes
+
+    command = [get_ffmpeg_exe(),
+               '-nostdin', '-loglevel', 'error',
+               '-i', video_filename,
+               '-map', '0:a:0', '-vn', '-sn', '-dn',
+               '-ac', str(channels),
+               '-ar', str(sample_rate),
+               '-f', 's16le', '-acodec', 'pcm_s16le',
+               'pipe:1']
+
+    # ffmpeg's error output goes to a temp file, so it can never fill up a
+    # pipe and stall the decoder while we are reading audio from stdout:
+    with tempfile.TemporaryFile() as error_output:
+        process = subprocess.Popen(command,
+                                   stdout=subprocess.PIPE,
+                                   stderr=error_output,
+                                   bufsize=block_bytes)
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = data[:len(data) - (len(data) % frame_bytes)]
+                block = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+                if channels > 1:
+                    block = block.reshape(-1, channels)
+                yield block
+
+            if process.wait() != 0:
+                error_output.seek(0)
+                error_message = error_output.read().decode(errors='replace').strip()
+                raise RuntimeError(f"ffmpeg could not decode audio from {video_filename}: {error_message}")
+        finally:
+            # Stop ffmpeg if the consumer stopped early (or on error):
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
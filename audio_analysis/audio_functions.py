@@ -7,83 +7,263 @@ TeamReel videos.
 """
 
 # Import external modules, packages, libraries we will use:
+# (Heavy libraries -- TensorFlow/Keras, librosa, moviepy, pydub, gensim,
+# pandas, SpeechRecognition, TextBlob -- are imported inside the functions
+# that use them, and the audio sentiment model is loaded on first use, so
+# importing this module (e.g., from application.py) stays fast.)
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
-from gensim.utils import simple_preprocess
 import json
-import keras
-from keras.models import Model, model_from_json
-import librosa
-import moviepy.editor
 import numpy as np
 import os
-import pandas as pd
 import pickle
-from pydub import AudioSegment
-from pydub.utils import make_chunks
-import re
-import speech_recognition as sr
 import shutil
-from textblob import TextBlob
-import tensorflow as tf
+import threading
 import wave
 
 # Import internal modules, packages, libraries for this project:
-from data_infra.data_pipelines import get_next_video
+from data_infra.job_workspace import workspace_path
+from .asr_backends import ASRBackend, GoogleASRBackend, get_asr_backend
+from .audio_buffer import AudioBuffer, to_pcm16_bytes
+from .voice_activity import get_speech_chunk_bounds, get_speech_window_starts
+from .voice_activity import has_enough_speech
 
 
 # LOAD MODELS:
 
-# Get relative file path for models:
-cwd = os.getcwd().split('/')[-1]
+# File path for models: the repo's 'models' folder (or MODELS_PATH env var):
+MODELS_PATH = os.getenv("MODELS_PATH",
+                        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'models', ''))
+
+# Engine that runs the audio sentiment model: 'keras' (TensorFlow), or
+# 'numpy' (our pure-NumPy engine in numpy_model.py, no TensorFlow needed):
+AUDIO_MODEL_ENGINE = os.getenv("AUDIO_MODEL_ENGINE", "keras").lower()
+
+# Precision of the audio sentiment model's weights: 'float32' (the trained
+# model), or quantized 'float16' / 'int8' weights made by quantize_model.py
+# (models/audio_analysis_weights_<precision>.npz), which always run on the
+# NumPy engine:
+AUDIO_MODEL_PRECISION = os.getenv("AUDIO_MODEL_PRECISION", "float32").lower()
+
+# Where to run the audio sentiment model: '' (default: call the model
+# directly), 'inprocess' (a micro-batching inference server shared by all
+# threads of this process) or 'unix:<socket path>' (a micro-batching
+# inference server shared by all processes on this node; see
+# inference_server.py):
+AUDIO_INFERENCE_SERVER = os.getenv("AUDIO_INFERENCE_SERVER", "")
+AUDIO_INFERENCE_MAX_BATCH_SIZE = int(os.getenv("AUDIO_INFERENCE_MAX_BATCH_SIZE", 64))
+AUDIO_INFERENCE_MAX_WAIT_MS = float(os.getenv("AUDIO_INFERENCE_MAX_WAIT_MS", 10))
+
+# Only send speech (found by our voice activity detector, see
+# voice_activity.py) to speech recognition and the audio sentiment model,
+# skipping silence and long pauses (default: true):
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Audio sentiment model and its class labels, loaded once per process on
+# first use (see get_audio_model, get_audio_labels and warm_up):
+_audio_model = None
+_audio_labels = None
+_audio_inference_server = None
+_models_lock = threading.Lock()
+
+def get_audio_model():
+    """
+    Returns the audio sentiment (emotion) model, loading its architecture
+    and weights on the first call, with the engine set by
+    AUDIO_MODEL_ENGINE: a Keras model ('keras'), or a NumpySequentialModel
+    ('numpy'), and the weights set by AUDIO_MODEL_PRECISION. All have the
+    same predict(x, batch_size, verbose) method. The model is only used
+    for inference, so it is not compiled (no optimizer is built).
+    """
+    global _audio_model
+    with _models_lock:
+        if _audio_model is None and AUDIO_MODEL_PRECISION != 'float32':
+            from .numpy_model import NumpySequentialModel
+
+            _audio_model = NumpySequentialModel.from_npz(
+                json_path=MODELS_PATH + 'audio_analysis_model.json',
+                npz_path=MODELS_PATH + f'audio_analysis_weights_{AUDIO_MODEL_PRECISION}.npz')
+
+        elif _audio_model is None and AUDIO_MODEL_ENGINE == 'numpy':
+            from .numpy_model import NumpySequentialModel
+
+            _audio_model = NumpySequentialModel.from_files(
+                json_path=MODELS_PATH + 'audio_analysis_model.json',
+                weights_path=MODELS_PATH + 'audio_analysis_weights.h5')
+
+        elif _audio_model is None:
+            from keras.models import model_from_json
 
-if cwd == 'video-journal-for-teams-ds':
-    MODELS_PATH = './models/'
-elif cwd == 'audio_analysis':
-    MODELS_PATH = '../models/'
+            # loading json and model architecture
+            with open(MODELS_PATH + 'audio_analysis_model.json', 'r') as json_file:
+                loaded_model = model_from_json(json_file.read())
 
-# loading json and model architecture
-json_file = open(MODELS_PATH + 'audio_analysis_model.json', 'r')
-loaded_model_json = json_file.read()
-json_file.close()
-loaded_model = model_from_json(loaded_model_json)
+            # load weights into new model
+            loaded_model.load_weights(MODELS_PATH + 'audio_analysis_weights.h5')
+            _audio_model = loaded_model
+    return _audio_model
 
-# load weights into new model
-loaded_model.load_weights(MODELS_PATH + 'audio_analysis_weights.h5')
+def get_audio_model_files():
+    """
+    Returns the paths of the audio sentiment model files in use (as set by
+    AUDIO_MODEL_PRECISION), e.g. to tell when the model has changed.
+    """
+    if AUDIO_MODEL_PRECISION != 'float32':
+        weights_path = MODELS_PATH + f'audio_analysis_weights_{AUDIO_MODEL_PRECISION}.npz'
+    else:
+        weights_path = MODELS_PATH + 'audio_analysis_weights.h5'
+    return [MODELS_PATH + 'audio_analysis_model.json',
+            weights_path,
+            MODELS_PATH + 'audio_analysis_labels']
 
-# compile loaded model
-opt = tf.keras.optimizers.RMSprop(lr=0.00001, decay=1e-6)
-loaded_model.compile(loss='categorical_crossentropy', optimizer=opt, metrics=['accuracy'])
+def get_audio_inference_server():
+    """
+    Returns the audio sentiment model's inference server, as set by
+    AUDIO_INFERENCE_SERVER (created on the first call): an in-process
+    BatchingInferenceServer, a UnixSocketInferenceClient, or (if not set)
+    the model itself. All have the same predict method.
+    """
+    global _audio_inference_server
+    if not AUDIO_INFERENCE_SERVER:
+        return get_audio_model()
+
+    if _audio_inference_server is None:
+        from .inference_server import BatchingInferenceServer, UnixSocketInferenceClient
+
+        if AUDIO_INFERENCE_SERVER.startswith('unix:'):
+            server = UnixSocketInferenceClient(socket_path=AUDIO_INFERENCE_SERVER[len('unix:'):])
+        elif AUDIO_INFERENCE_SERVER == 'inprocess':
+            server = BatchingInferenceServer(model=get_audio_model(),
+                                             max_batch_size=AUDIO_INFERENCE_MAX_BATCH_SIZE,
+                                             max_wait_ms=AUDIO_INFERENCE_MAX_WAIT_MS)
+        else:
+            raise ValueError(f"Invalid AUDIO_INFERENCE_SERVER '{AUDIO_INFERENCE_SERVER}': use 'inprocess' or 'unix:<socket path>'")
+
+        with _models_lock:
+            if _audio_inference_server is None:
+                _audio_inference_server = server
+            elif hasattr(server, 'stop'):
+                server.stop()
+    return _audio_inference_server
+
+def get_audio_labels():
+    """
+    Returns the audio sentiment model's class labels (a fitted sklearn
+    LabelEncoder), loading them on the first call.
+    """
+    global _audio_labels
+    with _models_lock:
+        if _audio_labels is None:
+            with open(MODELS_PATH + 'audio_analysis_labels', 'rb') as infile:
+                _audio_labels = pickle.load(infile)
+    return _audio_labels
+
+def warm_up():
+    """
+    Loads the audio sentiment model, its labels and the heavy audio
+    libraries now, instead of on the first analysis. Call this at startup
+    on workers that run analyses (e.g., via the WARM_UP_MODELS env var in
+    application.py); read-only API workers can skip it.
+    """
+    import librosa
+    get_audio_model()
+    get_audio_labels()
+    get_audio_inference_server()
 
-# load class labels
-infile = open(MODELS_PATH + 'audio_analysis_labels','rb')
-lb = pickle.load(infile)
-infile.close()
+def use_speech_only(audio_buffer:AudioBuffer, speech_only:bool=None):
+    """
+    Returns whether to analyze only the speech segments of the audio:
+    speech_only (default: VAD_ENABLED), unless our voice activity detector
+    found implausibly little speech in it (see
+    voice_activity.has_enough_speech), in which case the whole audio is
+    analyzed instead, so a missed answer is not dropped.
+    """
+    if speech_only is None:
+        speech_only = VAD_ENABLED
+    if speech_only and not has_enough_speech(audio_buffer):
+        print("Voice activity detector found too little speech -> analyzing the whole audio.")
+        return False
+    return speech_only
 
 
 
 # FUNCTIONS FOR SENTIMENT ANALYSIS:
 
-def get_audio_from_video(video_filename:str, save_audio_as:str):
+# Audio sentiment model inputs: 4-second windows at 44.1 kHz (the
+# model's training setup), scored in batches of SENTIMENT_BATCH_SIZE:
+SENTIMENT_WINDOW_SECONDS = 4
+SENTIMENT_SAMPLE_RATE = 44100
+SENTIMENT_BATCH_SIZE = 64
+
+def get_audio_from_video(video_filename:str, save_audio_as:str, workspace=None):
     """
-    Gets an audio file from user's video
+    Gets an audio file from user's video (saved in the job's workspace,
+    if given, else in the current directory)
     """
+    import moviepy.editor
+
+    audio_filename = workspace_path(workspace, save_audio_as)
     video = moviepy.editor.VideoFileClip(video_filename)
     audio = video.audio
-    audio.write_audiofile(save_audio_as)
-    audio_filename = save_audio_as
+    audio.write_audiofile(audio_filename)
 
     return audio_filename
 
-def get_audio_sentiment_analysis(audio_filename:str):
+def get_audio_sentiment_analysis(audio_filename:str=None, in_memory:bool=True,
+                                 audio_buffer:AudioBuffer=None, workspace=None,
+                                 speech_only:bool=None):
     """
-    A function to get sentiment/emotion analysis from the audio
+    A function to get sentiment/emotion analysis from the audio.
+
+    in_memory=True (default): uses the decoded audio (audio_buffer if
+    given, else decodes audio_filename once), windows the signal as a NumPy
+    array in memory, builds one feature tensor for all 4-second windows and
+    scores them in a single batched predict call, then aggregates the
+    per-window class probabilities by soft vote. With speech_only (default:
+    VAD_ENABLED), the windows cover only the speech segments found by our
+    voice activity detector, so silence is never scored.
+
+    in_memory=False: the original path, which exports each 4-second chunk
+    to 'audio_sentiment/' (in the job's workspace, if given), reloads it and
+    predicts one chunk at a time, then aggregates by majority (hard) vote.
     """
+    if in_memory:
+        if audio_buffer is None:
+            audio_buffer = AudioBuffer.from_file(audio_filename)
+        if use_speech_only(audio_buffer, speech_only):
+            window_starts = get_speech_window_starts(audio_buffer,
+                                                     window_seconds=SENTIMENT_WINDOW_SECONDS)
+            windows = audio_buffer.windows_at(window_starts,
+                                              window_seconds=SENTIMENT_WINDOW_SECONDS,
+                                              sample_rate=SENTIMENT_SAMPLE_RATE)
+        else:
+            windows = audio_buffer.windows(window_seconds=SENTIMENT_WINDOW_SECONDS,
+                                           sample_rate=SENTIMENT_SAMPLE_RATE)
+        if len(windows) == 0:
+            return {}
+
+        features = get_sentiment_features(windows=windows,
+                                          sample_rate=SENTIMENT_SAMPLE_RATE)
+        probabilities = get_audio_inference_server().predict(features,
+                                                  batch_size=SENTIMENT_BATCH_SIZE,
+                                                  verbose=0)
+        return get_soft_vote_predictions(probabilities=probabilities)
+
+    import librosa
+    import pandas as pd
+    from pydub import AudioSegment
+    from pydub.utils import make_chunks
+
+    loaded_model = get_audio_model()
+    lb = get_audio_labels()
+
     audio = AudioSegment.from_file(audio_filename, "wav")
-    chunk_length_ms = 4000
+    chunk_length_ms = SENTIMENT_WINDOW_SECONDS * 1000
     chunks = make_chunks(audio, chunk_length_ms)
 
     #Export all of the individual chunks as wav files
-    path = "audio_sentiment/"
+    path = workspace_path(workspace, "audio_sentiment", "")
     try:
         os.mkdir(path)
     except OSError:
@@ -102,7 +282,7 @@ def get_audio_sentiment_analysis(audio_filename:str):
         try:
             data, sample_rate = librosa.load(f"{path}{filename}",
                                              res_type='kaiser_fast',
-                                             sr=44100)
+                                             sr=SENTIMENT_SAMPLE_RATE)
             #print(filename)
             sample_rate = np.array(sample_rate)
             mfccs = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate, n_mfcc=13),axis=0)
@@ -135,20 +315,65 @@ def get_audio_sentiment_analysis(audio_filename:str):
 
     return predictions
 
+def get_sentiment_features(windows, sample_rate:int):
+    """
+    Builds the model's input tensor, shape (n_windows, n_frames, 1), from a
+    2-D array of audio windows: the mean over 13 MFCCs for each frame, the
+    same features the model was trained on.
+    """
+    import librosa
+
+    features = np.stack([np.mean(librosa.feature.mfcc(y=window, sr=sample_rate, n_mfcc=13), axis=0)
+                         for window in windows])
+    return np.expand_dims(features, axis=2)
+
+def get_soft_vote_predictions(probabilities):
+    """
+    Aggregates per-window class probabilities, shape (n_windows, n_classes),
+    into one {label: share} dict by soft vote (mean probability per class),
+    sorted from most to least likely, e.g.
+    {'positive': 0.41, 'neutral': 0.31, 'negative': 0.27}.
+    """
+    mean_probabilities = np.asarray(probabilities).mean(axis=0)
+    labels = get_audio_labels().inverse_transform(np.arange(len(mean_probabilities)))
+    order = np.argsort(mean_probabilities)[::-1]
+
+    predictions = {}
+    for i in order:
+        predictions[str(labels[i])] = round(float(mean_probabilities[i]), 2)
+
+    return predictions
+
 
 
 # FUNCTIONS FOR SPEECH RECOGNITION AND AUDIO TRANSCRIPTION:
 
-def break_audio_file(audio_filename:str):
+# Length of the audio chunks sent to speech recognition, and max number of
+# chunks transcribed at the same time:
+TRANSCRIPT_CHUNK_SECONDS = 20
+ASR_MAX_WORKERS = int(os.getenv("ASR_MAX_WORKERS", 4))
+
+def break_audio_file(audio_filename:str=None, workspace=None, speech_only:bool=None,
+                     audio_buffer:AudioBuffer=None):
     """
-    Breaks an audio file into smaller chunks
+    Breaks an audio file (or already-decoded audio, audio_buffer) into
+    smaller chunks, saved as mono 16-bit WAV files in 'audio_chunks/' in
+    the job's workspace (if given, else in the current directory). With
+    speech_only (default: VAD_ENABLED), the chunks follow speech boundaries
+    and leave out non-speech audio.
     """
-    myaudio = AudioSegment.from_file(audio_filename, "wav")
-    chunk_length_ms = 20000 # pydub calculates in millisec
-    chunks = make_chunks(myaudio, chunk_length_ms) #Make chunks of 20 sec
+    # Decode once; chunks are views of the decoded samples:
+    if audio_buffer is None:
+        audio_buffer = AudioBuffer.from_file(audio_filename)
+    if use_speech_only(audio_buffer, speech_only):
+        chunk_bounds = get_speech_chunk_bounds(audio_buffer,
+                                               max_chunk_seconds=TRANSCRIPT_CHUNK_SECONDS)
+        chunks = audio_buffer.chunks_at(chunk_bounds)
+    else:
+        chunks = audio_buffer.chunks(chunk_seconds=TRANSCRIPT_CHUNK_SECONDS) #Make chunks of 20 sec
 
     #Export all of the individual chunks as wav files
-    path = "audio_chunks/"
+    path = workspace_path(workspace, "audio_chunks", "")
     try:
         os.mkdir(path)
     except OSError:
@@ -157,8 +382,12 @@ def break_audio_file(audio_filename:str):
         print ("Successfully created the directory %s " % path)
 
     for i, chunk in enumerate(chunks):
-        chunk_name = "audio_chunks/chunk{0}.wav".format(i)
-        chunk.export(chunk_name, format="wav")
+        chunk_name = "{0}chunk{1}.wav".format(path, i)
+        with wave.open(chunk_name, 'wb') as chunk_file:
+            chunk_file.setnchannels(1)
+            chunk_file.setsampwidth(2)
+            chunk_file.setframerate(audio_buffer.sample_rate)
+            chunk_file.writeframes(to_pcm16_bytes(chunk))
     return path
 
 def get_file_paths(folder_path:str):
@@ -179,68 +408,99 @@ def get_file_paths(folder_path:str):
 
 def speech_to_text(file):
     """
-    Applies SpeechRecognition to the audio files
+    Applies SpeechRecognition (Google) to an audio file, or to in-memory
+    audio already wrapped in a speech_recognition.AudioData object.
     """
-    recognizer = sr.Recognizer()
-    a = ''
-    with sr.AudioFile(file) as source:
-        #recognizer.adjust_for_ambient_noise(source)  # adjust for noisy audio
-        audio = recognizer.record(source)
-        try:
-            a =  recognizer.recognize_google(audio)   # recognize_google_cloud for GC API
-        except sr.UnknownValueError:
-            a = "Google Speech Recognition could not understand audio"
-        except sr.RequestError as e:
-            a = "Could not request results from Google Speech Recognition service; {0}".format(e)
-    return a
-
-def get_text_chunks(audio_chunks_path:str):
-    # Create a new directory to store the chunks of txt
-    text_chunks_path = 'text_chunks/'
-    try:
-        os.mkdir(text_chunks_path)
-    except OSError:
-        print ("Creation of the directory %s failed" % text_chunks_path)
+    import speech_recognition as sr
+
+    if isinstance(file, sr.AudioData):
+        audio = file
+    else:
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(file) as source:
+            #recognizer.adjust_for_ambient_noise(source)  # adjust for noisy audio
+            audio = recognizer.record(source)
+    return GoogleASRBackend().recognize(audio)
+
+def get_text_from_chunks(chunks, sample_rate:int, asr_backend:ASRBackend=None,
+                         max_workers:int=None):
+    """
+    Transcribes a list of in-memory audio chunks with the given ASR backend
+    (default: get_asr_backend()), on a bounded pool of max_workers threads
+    (default: ASR_MAX_WORKERS), and returns the texts in chunk order,
+    leaving out chunks that gave no text (failed or silent chunks).
+    """
+    if asr_backend is None:
+        asr_backend = get_asr_backend()
+    if max_workers is None:
+        max_workers = ASR_MAX_WORKERS
+    if len(chunks) == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        texts = list(executor.map(lambda chunk: asr_backend.transcribe(chunk, sample_rate),
+                                  chunks))
+    for i, text in enumerate(texts):
+        if not (text or '').strip():
+            print(f"No text for audio chunk {i} -> left out of the transcript.")
+    return [text for text in texts if (text or '').strip()]
+
+def get_transcript_from_audio(audio_filename:str=None,
+                              save_transcript_as:str='audio_transcript.txt',
+                              audio_buffer:AudioBuffer=None, workspace=None,
+                              asr_backend:ASRBackend=None, max_workers:int=None,
+                              speech_only:bool=None):
+    """
+    A function to get a text transcript from an audio file, or from
+    already-decoded audio (audio_buffer).
+
+    The audio is split into chunks of up to 20 seconds in memory -- with
+    speech_only (default: VAD_ENABLED), chunks of speech that follow the
+    speech segments found by our voice activity detector, so silence is
+    never sent to speech recognition -- the chunks are
+    transcribed in parallel by the ASR backend (default: get_asr_backend(),
+    set by the ASR_BACKEND env var), and the transcript is assembled in
+    order in memory, then saved in the job's workspace (if given, else in
+    the current directory).
+    """
+    transcript_filename = workspace_path(workspace, save_transcript_as)
+
+    if audio_buffer is None:
+        audio_buffer = AudioBuffer.from_file(audio_filename)
+    if asr_backend is None:
+        asr_backend = get_asr_backend()
+
+    # Chunk at the sample rate the backend wants (resampled once, cached):
+    sample_rate = asr_backend.sample_rate or audio_buffer.sample_rate
+    if use_speech_only(audio_buffer, speech_only):
+        chunk_bounds = get_speech_chunk_bounds(audio_buffer,
+                                               max_chunk_seconds=TRANSCRIPT_CHUNK_SECONDS)
+        chunks = audio_buffer.chunks_at(chunk_bounds, sample_rate=sample_rate)
     else:
-        print ("Successfully created the directory %s " % text_chunks_path)
-
-    audio_chunks_files = get_file_paths(folder_path=audio_chunks_path)
-    for file in audio_chunks_files:
-        (filepath, ext) = os.path.splitext(file)
-        file_name = os.path.splitext(os.path.basename(file))[0]
-        # only process audio if the file is a '.wav' audio file:
-        if ext == '.wav':
-            transcription_text = speech_to_text(file)
-            with open(f"{text_chunks_path}{file_name}.txt", "w") as f:
-                f.write(transcription_text+". ")
-    return text_chunks_path
-
-def get_transcript_from_audio(audio_filename:str, save_transcript_as:str):
-    """
-    A function to get a text transcript from an audio file.
-    """
-    transcript_filename = save_transcript_as
-    audio_chunks_path = break_audio_file(audio_filename=audio_filename)
-    text_chunks_path = get_text_chunks(audio_chunks_path=audio_chunks_path)
-    files = get_file_paths(folder_path='text_chunks')
-    files.sort(key=lambda x: int(re.sub('\D', '', x)))
-    #sorted(files, key=lambda x: int(re.sub('\D', '', x)))
+        chunks = audio_buffer.chunks(chunk_seconds=TRANSCRIPT_CHUNK_SECONDS,
+                                     sample_rate=sample_rate)
+    texts = get_text_from_chunks(chunks=chunks,
+                                 sample_rate=sample_rate,
+                                 asr_backend=asr_backend,
+                                 max_workers=max_workers)
 
     # Combine text segments into one .txt file transcript for the audio file:
     with open(transcript_filename, 'w+') as f:
-        for file in files:
-            with open(file) as infile:
-                f.write(infile.read()+'\n')
+        for text in texts:
+            f.write(text+". "+'\n')
     return transcript_filename
 
 # Tokenize data
-def tokenize(text):
-    return [token for token in simple_preprocess(text)]   # (if token not in STOPWORDS)
+# (min_len: shortest token to keep; use 1 to keep words like "I" and "a",
+# e.g. for filler phrases like "I mean")
+def tokenize(text, min_len:int=2):
+    from gensim.utils import simple_preprocess
+    return [token for token in simple_preprocess(text, min_len=min_len)]   # (if token not in STOPWORDS)
 
-def get_tokens(transcript_filename:str):
+def get_tokens(transcript_filename:str, min_len:int=2):
     with open(transcript_filename) as file:
       text = file.read().strip('\n')
-      tokens = tokenize(str(text))
+      tokens = tokenize(str(text), min_len=min_len)
     return tokens
 
 
@@ -253,15 +513,22 @@ def get_audio_duration(filename:str='audio.wav'):
         duration = (frames / float(rate)) / 60
         return duration
 
-def get_speed_of_speech(transcript_filename:str, audio_filename:str):
+def get_speed_of_speech(transcript_filename:str, audio_filename:str=None,
+                        audio_buffer:AudioBuffer=None):
     tokens = get_tokens(transcript_filename=transcript_filename)
-    speed_of_speech = len(tokens) / get_audio_duration(filename=audio_filename)
+    if audio_buffer is not None:
+        duration = audio_buffer.duration / 60
+    else:
+        duration = get_audio_duration(filename=audio_filename)
+    speed_of_speech = len(tokens) / duration
     return speed_of_speech
 
 
 # FUNCTIONS FOR TEXT SENTIMENT ANALYSIS (ON TEXT TRANSCRIPT FROM AUDIO):
 
 def get_text_sentiment(file = 'audio_transcript.txt'):
+    from textblob import TextBlob
+
     with open(file, 'r') as f:
         text = f.read()
         sentiment = TextBlob(text).sentiment.polarity
@@ -270,17 +537,25 @@ def get_text_sentiment(file = 'audio_transcript.txt'):
 
 # Function that removes directories and files after we are done with them:
 
-def remove_files(specified_files_list=[], specified_folders_list=[]):
+def remove_files(specified_files_list=[], specified_folders_list=[], workspace=None):
     """
     Removes files and directories after they're no longer needed.
+
+    If a job workspace is given, removes that workspace (all of that job's
+    files and folders) and nothing else, so other jobs running in the same
+    process or container are not affected.
     """
+    if workspace is not None:
+        workspace.cleanup()
+        return
+
     files_to_remove = {'audio_transcript.txt', 'audio.wav'}
     folders_to_remove = {'audio_chunks', 'text_chunks', 'audio_sentiment'}
 
     # Add any specified files/folders (input params):
     for file in specified_files_list:
         files_to_remove.add(file)
-    for folders in specified_folders_list:
+    for folder in specified_folders_list:
         folders_to_remove.add(folder)
 
     # Add name of video file to remove:
@@ -312,14 +587,20 @@ def remove_files(specified_files_list=[], specified_folders_list=[]):
 
 # Main function to analyse the audio:
 
-def analyse_audio(audio_filename:str):
+def analyse_audio(audio_filename:str=None, audio_buffer:AudioBuffer=None,
+                  workspace=None):
+    # Decode the audio once and share it across all stages:
+    if audio_buffer is None:
+        audio_buffer = AudioBuffer.from_file(audio_filename)
+
     # Transcript:
-    transcript_filename = get_transcript_from_audio(audio_filename=audio_filename,
-                                                    save_transcript_as='audio_transcript.txt')
+    transcript_filename = get_transcript_from_audio(audio_buffer=audio_buffer,
+                                                    save_transcript_as='audio_transcript.txt',
+                                                    workspace=workspace)
     # Analysis:
-    audio_sentiment = get_audio_sentiment_analysis(audio_filename=audio_filename)
+    audio_sentiment = get_audio_sentiment_analysis(audio_buffer=audio_buffer)
     speed_of_speech = get_speed_of_speech(transcript_filename=transcript_filename,
-                                          audio_filename=audio_filename)
+                                          audio_buffer=audio_buffer)
     text_sentiment = get_text_sentiment(file=transcript_filename)
 
     return audio_sentiment, text_sentiment, speed_of_speech
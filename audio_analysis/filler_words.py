@@ -0,0 +1,260 @@
+#!python
+
+"""
+Module with a filler-word detector for TeamReel video transcripts: counts
+filler words and phrases ("um", "you know", "kind of", "I mean", ...) and
+translates their rate per minute into a 1-5 score for the
+'speaking_filler_words' column of our DB's videos_feedback table.
+
+The filler lexicon (FILLER_LEXICON, or a file of one phrase per line set by
+the FILLER_LEXICON_PATH env var) is compiled once per process into an
+Aho-Corasick automaton over words, which finds every lexicon phrase in one
+pass over a transcript's tokens -- linear in transcript length, however
+many phrases the lexicon has.
+
+Batch mode (e.g., to backfill stored transcripts):
+
+    python -m audio_analysis.filler_words transcripts/*.txt
+"""
+
+# Import external modules, packages, libraries we will use:
+import argparse
+from collections import deque
+from dotenv import load_dotenv
+import functools
+import json
+import os
+
+# Import internal modules, packages, libraries for this project:
+from .audio_functions import get_tokens, tokenize
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# Default filler lexicon (one phrase per entry; matched on tokenized words,
+# so case and punctuation do not matter). Single words that are usually
+# not fillers ("like", "actually", "basically", "literally", "totally",
+# "honestly": "I'd like to", "it actually worked") are left out, since
+# without punctuation we cannot tell the filler use from the real one:
+FILLER_LEXICON = ("um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "hmm", "mm",
+                  "you know", "you know what i mean", "i mean",
+                  "kind of", "kinda", "sort of", "sorta", "so yeah",
+                  "or something", "and stuff", "you see", "okay so",
+                  "i guess", "i suppose", "well um", "let me think")
+
+# Optional lexicon file (one phrase per line), replacing the default (e.g.,
+# to also count the ambiguous single words above):
+FILLER_LEXICON_PATH = os.getenv("FILLER_LEXICON_PATH")
+
+# Score thresholds (score: max filler words per minute), checked from best
+# to worst:
+FILLER_SCORE_THRESHOLDS = [(5, 1), (4, 3), (3, 6), (2, 10)]
+
+
+# -------------------------------------------------------------------------
+class FillerAutomaton:
+    """
+    Aho-Corasick automaton over words: finds all occurrences of a set of
+    phrases (tuples of words) in a token sequence in one pass.
+
+    Parameters:
+    phrases: Sequence of phrases, each a tuple of words
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        self._goto = [{}]       # state -> {word: next state}
+        self._fail = [0]        # state -> fallback state (longest proper suffix in the trie)
+        self._output = [None]   # state -> (phrase index, length) if a phrase ends at it
+        self._dict_link = [0]   # state -> nearest fallback state with an output (0 = none)
+
+        # Build the trie:
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for word in phrase:
+                if word not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._dict_link.append(0)
+                    self._goto[state][word] = len(self._goto) - 1
+                state = self._goto[state][word]
+            self._output[state] = (index, len(phrase))
+
+        # Set fail and dictionary links breadth-first (states one word deep
+        # fall back to the root):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(word, 0)
+                self._fail[next_state] = fail
+                self._dict_link[next_state] = fail if self._output[fail] is not None else self._dict_link[fail]
+                queue.append(next_state)
+
+    def _outputs(self, state):
+        """
+        Yields (phrase index, length) of the phrases ending at a state,
+        longest first.
+        """
+        if self._output[state] is not None:
+            yield self._output[state]
+        state = self._dict_link[state]
+        while state:
+            yield self._output[state]
+            state = self._dict_link[state]
+
+    def find(self, tokens):
+        """
+        Returns a list of (start index, phrase index) for non-overlapping
+        phrase matches in tokens, in order. At each position, the longest
+        phrase ending there is kept if it does not overlap the previous
+        match, or replaces earlier matches it fully contains (e.g., "you
+        know what I mean" replaces "you know"); else the next longest.
+        """
+        matches = []
+        state = 0
+        for position, word in enumerate(tokens):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+
+            for phrase_index, length in self._outputs(state):
+                start = position + 1 - length
+                # Earlier matches this one fully contains:
+                n_contained = 0
+                while n_contained < len(matches) and matches[-1 - n_contained][0] >= start:
+                    n_contained += 1
+                # Keep it unless it partly overlaps an earlier match:
+                previous_end = matches[-1 - n_contained][2] if n_contained < len(matches) else 0
+                if previous_end <= start:
+                    del matches[len(matches) - n_contained:]
+                    matches.append((start, phrase_index, position + 1))
+                    break
+        return [(start, phrase_index) for start, phrase_index, _ in matches]
+
+
+def load_filler_lexicon(lexicon_path:str=None):
+    """
+    Returns the filler lexicon: the phrases in lexicon_path (default:
+    FILLER_LEXICON_PATH env var; one per line, '#' for comments), else
+    FILLER_LEXICON.
+    """
+    lexicon_path = lexicon_path or FILLER_LEXICON_PATH
+    if not lexicon_path:
+        return FILLER_LEXICON
+
+    with open(lexicon_path, 'r') as infile:
+        return tuple(line.strip() for line in infile
+                     if line.strip() and not line.strip().startswith('#'))
+
+
+@functools.lru_cache(maxsize=8)
+def get_filler_automaton(lexicon:tuple=None):
+    """
+    Returns the compiled FillerAutomaton for a lexicon (a tuple of phrases;
+    default: load_filler_lexicon()), compiled once per process and lexicon.
+    """
+    if lexicon is None:
+        lexicon = tuple(load_filler_lexicon())
+
+    phrases = {}
+    for phrase in lexicon:
+        words = tuple(tokenize(phrase, min_len=1))
+        if words:
+            phrases.setdefault(words, phrase)
+    return FillerAutomaton(phrases.keys())
+
+
+# -------------------------------------------------------------------------
+def get_filler_words_score(filler_rate_per_minute:float):
+    """
+    Translates a filler words rate (per minute) to a score from 1-5 (5 =
+    few or no filler words).
+    """
+    for score, max_rate in FILLER_SCORE_THRESHOLDS:
+        if filler_rate_per_minute <= max_rate:
+            return score
+    return 1
+
+
+def count_filler_words(tokens, duration_minutes:float=None, lexicon:tuple=None):
+    """
+    Counts filler words/phrases in a transcript's tokens (from tokenize(...,
+    min_len=1) or get_tokens(..., min_len=1), or an ASR word list), and
+    returns a dict:
+
+    filler_count: Total number of filler words/phrases
+    filler_counts: {phrase: count}, for phrases found
+    filler_ratio: Filler words/phrases per token
+    filler_rate_per_minute: Filler words/phrases per minute of audio (None
+    without duration_minutes)
+    score: 1-5 score (from the rate per minute), or 0 ("not set" in our
+    DB) without duration_minutes or tokens
+    """
+    automaton = get_filler_automaton(lexicon)
+    tokens = [str(token).lower() for token in tokens]
+
+    filler_counts = {}
+    for _, phrase_index in automaton.find(tokens):
+        phrase = ' '.join(automaton.phrases[phrase_index])
+        filler_counts[phrase] = filler_counts.get(phrase, 0) + 1
+    filler_count = sum(filler_counts.values())
+
+    results = {'filler_count': filler_count,
+               'filler_counts': dict(sorted(filler_counts.items(), key=lambda item: -item[1])),
+               'filler_ratio': (filler_count / len(tokens)) if tokens else 0.0,
+               'filler_rate_per_minute': None,
+               'score': 0}
+
+    if duration_minutes and tokens:
+        results['filler_rate_per_minute'] = filler_count / duration_minutes
+        results['score'] = get_filler_words_score(results['filler_rate_per_minute'])
+    return results
+
+
+def get_filler_words(transcript:str, duration_minutes:float=None, lexicon:tuple=None):
+    """
+    Counts filler words/phrases in a transcript (text); see
+    count_filler_words.
+    """
+    return count_filler_words(tokenize(transcript, min_len=1),
+                              duration_minutes=duration_minutes,
+                              lexicon=lexicon)
+
+
+def get_filler_words_batch(transcripts, lexicon:tuple=None):
+    """
+    Batch mode, e.g. to backfill stored transcripts: takes an iterable of
+    (key, transcript text, duration in minutes or None) tuples and yields
+    (key, count_filler_words results), sharing one compiled automaton.
+    """
+    for key, transcript, duration_minutes in transcripts:
+        yield key, get_filler_words(transcript,
+                                    duration_minutes=duration_minutes,
+                                    lexicon=lexicon)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count filler words in transcript files (one JSON line per file).')
+    parser.add_argument('transcripts', nargs='+',
+                        help='Transcript .txt files')
+    parser.add_argument('--lexicon',
+                        help='Filler lexicon file, one phrase per line (default: FILLER_LEXICON_PATH or built-in)')
+    args = parser.parse_args()
+
+    lexicon = tuple(load_filler_lexicon(args.lexicon))
+    for filename in args.transcripts:
+        tokens = get_tokens(transcript_filename=filename, min_len=1)
+        results = count_filler_words(tokens, lexicon=lexicon)
+        print(json.dumps({'transcript': filename, **results}))
+
+if __name__ == '__main__':
+    main()
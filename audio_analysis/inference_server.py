@@ -0,0 +1,369 @@
+#!python
+
+"""
+Module with a local, micro-batching inference server for our audio
+sentiment (emotion) model.
+
+Concurrent get_audio_sentiment_analysis callers (threads in one process, or
+several worker processes on one node) send their feature windows to one
+server, which queues them, coalesces them into batches (up to
+max_batch_size windows, waiting at most max_wait_ms for a batch to fill),
+runs one predict call per batch on a single copy of the model, and returns
+each caller its own rows of the result. It also reports queue-depth and
+batch-size metrics.
+
+Two ways to run it (see AUDIO_INFERENCE_SERVER in audio_functions.py):
+
+- In-process: BatchingInferenceServer, shared by all threads of a worker.
+- Over a Unix socket: one server process per node, shared by all worker
+processes on that node:
+
+    python -m audio_analysis.inference_server --socket /tmp/teamreel-inference.sock
+
+and UnixSocketInferenceClient in each worker.
+"""
+
+# Import external modules, packages, libraries we will use:
+import argparse
+from concurrent.futures import Future
+import io
+import json
+import numpy as np
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Max seconds a caller waits for its outputs (in-process, or over the Unix
+# socket) before giving up with a timeout error:
+AUDIO_INFERENCE_TIMEOUT = float(os.getenv("AUDIO_INFERENCE_TIMEOUT", 60))
+
+
+# -------------------------------------------------------------------------
+class _Request:
+    """
+    One caller's feature windows, and the Future its results go to.
+    """
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+# -------------------------------------------------------------------------
+class BatchingInferenceServer:
+    """
+    Runs a model (anything with a Keras-style predict(x, batch_size,
+    verbose) method) on one background thread, coalescing requests from
+    all callers into batches.
+
+    Parameters:
+    model: The model to run (e.g., audio_functions.get_audio_model())
+    max_batch_size: Max number of windows per batch (a single larger
+    request is still run in one go, in chunks of max_batch_size)
+    max_wait_ms: Max time to wait for more requests to fill a batch
+    """
+
+    def __init__(self, model, max_batch_size:int=64, max_wait_ms:float=10):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'requests': 0,
+                         'windows': 0,
+                         'batches': 0,
+                         'max_queue_depth': 0,
+                         'total_wait_seconds': 0.0,
+                         'batch_size_histogram': {}}
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='audio-inference-server',
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """
+        Queues feature windows, shape (n_windows, ...), for inference, and
+        returns a concurrent.futures.Future for their outputs.
+        """
+        request = _Request(np.asarray(features, dtype=np.float32))
+        if len(request.features) == 0:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+
+        self._queue.put(request)
+        with self._metrics_lock:
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'],
+                                                   self._queue.qsize())
+        return request.future
+
+    def predict(self, features, batch_size:int=None, verbose:int=0, timeout:float=None):
+        """
+        Runs inference on feature windows (via the shared batching queue)
+        and returns the outputs, like a Keras model's predict, waiting up to
+        timeout seconds (default: AUDIO_INFERENCE_TIMEOUT). (batch_size and
+        verbose are accepted for compatibility, and ignored.)
+        """
+        if timeout is None:
+            timeout = AUDIO_INFERENCE_TIMEOUT
+        return self.submit(features).result(timeout=timeout)
+
+    def metrics(self):
+        """
+        Returns a dict of server metrics: current and max queue depth (in
+        requests), number of requests, windows and batches so far, mean
+        batch size, mean time requests waited in the queue, and a
+        histogram {batch size: number of batches}.
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+            metrics['batch_size_histogram'] = dict(self._metrics['batch_size_histogram'])
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['mean_batch_size'] = (metrics['windows'] / metrics['batches']) if metrics['batches'] else 0.0
+        metrics['mean_wait_ms'] = (1000 * metrics.pop('total_wait_seconds') / metrics['requests']) if metrics['requests'] else 0.0
+        return metrics
+
+    def stop(self):
+        """
+        Stops the server thread after the requests already queued.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self):
+        """
+        Blocks for the next request, then gathers more until the batch has
+        max_batch_size windows or max_wait has passed. Returns (requests,
+        stop), where stop is True if the server was asked to stop.
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        requests = [first]
+        n_windows = len(first.features)
+        deadline = time.monotonic() + self.max_wait
+
+        while n_windows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return requests, True
+            requests.append(request)
+            n_windows += len(request.features)
+
+        return requests, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            requests, stop = self._next_batch()
+            if not requests:
+                continue
+
+            # Any error (e.g., one request's windows have a different
+            # shape than the others') fails this batch's requests, not the
+            # server thread, which keeps serving the next batches:
+            started_at = time.monotonic()
+            try:
+                batch = np.concatenate([request.features for request in requests], axis=0)
+                outputs = self.model.predict(batch, batch_size=self.max_batch_size, verbose=0)
+                if len(outputs) != len(batch):
+                    raise ValueError(f"Model returned {len(outputs)} outputs for {len(batch)} windows")
+
+                # Return each caller its own rows of the batch's outputs:
+                start = 0
+                for request in requests:
+                    end = start + len(request.features)
+                    request.future.set_result(outputs[start:end])
+                    start = end
+            except Exception as e:
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            with self._metrics_lock:
+                self._metrics['requests'] += len(requests)
+                self._metrics['windows'] += len(batch)
+                self._metrics['batches'] += 1
+                self._metrics['total_wait_seconds'] += sum(started_at - request.enqueued_at
+                                                           for request in requests)
+                histogram = self._metrics['batch_size_histogram']
+                histogram[len(batch)] = histogram.get(len(batch), 0) + 1
+
+
+# -------------------------------------------------------------------------
+# UNIX SOCKET SERVER AND CLIENT:
+#
+# Protocol: each message is a 1-byte type + 8-byte big-endian payload
+# length + payload. Requests: b'P' (predict; payload: .npy array) or b'M'
+# (metrics; empty payload). Responses: b'O' (payload: .npy array), b'J'
+# (payload: JSON) or b'E' (payload: UTF-8 error message).
+
+def _send_message(sock, message_type:bytes, payload:bytes=b''):
+    sock.sendall(message_type + struct.pack('>Q', len(payload)) + payload)
+
+def _receive_exactly(sock, n_bytes:int):
+    chunks = []
+    while n_bytes > 0:
+        chunk = sock.recv(min(n_bytes, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Inference server connection closed")
+        chunks.append(chunk)
+        n_bytes -= len(chunk)
+    return b''.join(chunks)
+
+def _receive_message(sock):
+    header = _receive_exactly(sock, 9)
+    message_type = header[:1]
+    (length,) = struct.unpack('>Q', header[1:])
+    return message_type, _receive_exactly(sock, length)
+
+def _array_to_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+def _bytes_to_array(payload:bytes):
+    return np.load(io.BytesIO(payload), allow_pickle=False)
+
+
+class _InferenceRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Handles requests on one client connection, until the client closes it.
+    """
+
+    def handle(self):
+        inference_server = self.server.inference_server
+        while True:
+            try:
+                message_type, payload = _receive_message(self.request)
+            except ConnectionError:
+                return
+
+            try:
+                if message_type == b'P':
+                    outputs = inference_server.predict(_bytes_to_array(payload))
+                    _send_message(self.request, b'O', _array_to_bytes(outputs))
+                elif message_type == b'M':
+                    _send_message(self.request, b'J', json.dumps(inference_server.metrics()).encode())
+                else:
+                    _send_message(self.request, b'E', f"Unknown message type {message_type!r}".encode())
+            except Exception as e:
+                _send_message(self.request, b'E', str(e).encode())
+
+
+class _ThreadingUnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_unix_socket(socket_path:str, inference_server:BatchingInferenceServer):
+    """
+    Serves inference_server on a Unix socket at socket_path (one thread per
+    client connection; all connections share the one batching queue and
+    model), until interrupted.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    with _ThreadingUnixStreamServer(socket_path, _InferenceRequestHandler) as server:
+        server.inference_server = inference_server
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class UnixSocketInferenceClient:
+    """
+    Client for an inference server running on a Unix socket (see
+    serve_unix_socket). Has the same predict method as a Keras model, so it
+    can be used in place of one. Keeps one connection per calling thread,
+    and waits up to timeout seconds (default: AUDIO_INFERENCE_TIMEOUT) for
+    each response.
+    """
+
+    def __init__(self, socket_path:str, timeout:float=None):
+        self.socket_path = socket_path
+        self.timeout = AUDIO_INFERENCE_TIMEOUT if timeout is None else timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, message_type:bytes, payload:bytes=b''):
+        sock = self._connection()
+        try:
+            _send_message(sock, message_type, payload)
+            response_type, response = _receive_message(sock)
+        except (OSError, ConnectionError):
+            # Drop the broken connection, so the next call reconnects:
+            sock.close()
+            self._local.sock = None
+            raise
+
+        if response_type == b'E':
+            raise RuntimeError(f"Inference server error: {response.decode(errors='replace')}")
+        return response_type, response
+
+    def predict(self, features, batch_size:int=None, verbose:int=0):
+        """
+        Sends feature windows to the server and returns the outputs.
+        (batch_size and verbose are accepted for compatibility, and ignored.)
+        """
+        _, response = self._request(b'P', _array_to_bytes(np.asarray(features, dtype=np.float32)))
+        return _bytes_to_array(response)
+
+    def metrics(self):
+        """
+        Returns the server's metrics (see BatchingInferenceServer.metrics).
+        """
+        _, response = self._request(b'M')
+        return json.loads(response.decode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching inference server for the audio sentiment model.')
+    parser.add_argument('--socket', required=True,
+                        help='Path of the Unix socket to serve on')
+    parser.add_argument('--max-batch-size', type=int,
+                        default=int(os.getenv("AUDIO_INFERENCE_MAX_BATCH_SIZE", 64)),
+                        help='Max number of feature windows per batch')
+    parser.add_argument('--max-wait-ms', type=float,
+                        default=float(os.getenv("AUDIO_INFERENCE_MAX_WAIT_MS", 10)),
+                        help='Max time to wait for a batch to fill, in milliseconds')
+    args = parser.parse_args()
+
+    from .audio_functions import get_audio_model
+
+    inference_server = BatchingInferenceServer(model=get_audio_model(),
+                                               max_batch_size=args.max_batch_size,
+                                               max_wait_ms=args.max_wait_ms)
+    print(f"Serving audio sentiment model on {args.socket}")
+    serve_unix_socket(args.socket, inference_server)
+
+if __name__ == '__main__':
+    main()
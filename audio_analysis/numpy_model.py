@@ -0,0 +1,487 @@
+#!python
+
+"""
+Module with a lightweight, pure-NumPy inference engine for our audio
+sentiment (emotion) model, so workers can run the model's forward pass
+without loading TensorFlow/Keras.
+
+NumpySequentialModel reads the Keras JSON architecture
+(models/audio_analysis_model.json) and the Keras .h5 weights
+(models/audio_analysis_weights.h5) and runs the forward pass with
+vectorized NumPy, on batches of inputs. It supports the layers our model
+uses: Conv1D, BatchNormalization (folded into the preceding Conv1D's
+weights ahead of time), Activation, Dropout (a no-op at inference),
+MaxPooling1D, Flatten and Dense.
+
+It can also load the quantized (float16 or int8 per-channel) weights made
+by quantize_model.py: see NumpySequentialModel.from_npz. Quantized kernels
+are dequantized to float32 once, when the model is loaded, and then run
+exactly like the float32 weights: the gain is size only (smaller weights
+files to ship and read), not faster inference, since NumPy has no fast
+int8 matrix product.
+
+Run this module to check it against Keras (exits with an error if outputs
+differ by more than PARITY_TOLERANCE, or any predicted class differs) and
+to benchmark both engines:
+
+    python -m audio_analysis.numpy_model --parity --benchmark
+
+(tests/test_numpy_model.py runs the same check on a small model with
+BatchNormalization.)
+"""
+
+# Import external modules, packages, libraries we will use:
+import argparse
+import json
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Default model files: in the repo's 'models' folder (or MODELS_PATH env var):
+MODELS_PATH = os.getenv("MODELS_PATH",
+                        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'models', ''))
+MODEL_JSON_PATH = MODELS_PATH + 'audio_analysis_model.json'
+MODEL_WEIGHTS_PATH = MODELS_PATH + 'audio_analysis_weights.h5'
+
+# Max absolute difference allowed between NumPy engine and Keras outputs
+# (probabilities), for check_parity_with_keras:
+PARITY_TOLERANCE = 1e-5
+
+
+# -------------------------------------------------------------------------
+# ACTIVATIONS:
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+ACTIVATIONS = {'linear': lambda x: x,
+               'relu': _relu,
+               'softmax': _softmax,
+               'sigmoid': _sigmoid,
+               'tanh': np.tanh}
+
+
+# -------------------------------------------------------------------------
+# LAYERS:
+
+def _conv1d(x, kernel, bias, strides:int=1, padding:str='same'):
+    """
+    1-D convolution, channels last, like keras.layers.Conv1D.
+
+    x: (batch, length, in_channels); kernel: (kernel_size, in_channels,
+    filters); bias: (filters,). Computed as one matrix product per kernel tap (kernel_size products of
+    (batch*length, in_channels) x (in_channels, filters)), which avoids
+    building a large im2col copy.
+    """
+    kernel_size = kernel.shape[0]
+    length = x.shape[1]
+
+    if padding == 'same':
+        out_length = -(-length // strides)
+        pad_total = max((out_length - 1) * strides + kernel_size - length, 0)
+        pad_left = pad_total // 2
+        x = np.pad(x, ((0, 0), (pad_left, pad_total - pad_left), (0, 0)), mode='constant')
+    elif padding == 'valid':
+        out_length = (length - kernel_size) // strides + 1
+    else:
+        raise NotImplementedError(f"Conv1D padding '{padding}' is not supported")
+
+    span = (out_length - 1) * strides + 1
+    out = np.matmul(x[:, 0:span:strides, :], kernel[0])
+    for tap in range(1, kernel_size):
+        out += np.matmul(x[:, tap:tap + span:strides, :], kernel[tap])
+    out += bias
+    return out
+
+def _max_pooling1d(x, pool_size:int, strides:int):
+    """
+    1-D max pooling, channels last, 'valid' padding, like
+    keras.layers.MaxPooling1D.
+    """
+    batch, length, channels = x.shape
+    out_length = (length - pool_size) // strides + 1
+
+    if strides == pool_size:
+        x = x[:, :out_length * pool_size, :]
+        return x.reshape(batch, out_length, pool_size, channels).max(axis=2)
+
+    s0, s1, s2 = x.strides
+    windows = as_strided(x,
+                         shape=(batch, out_length, pool_size, channels),
+                         strides=(s0, s1 * strides, s1, s2),
+                         writeable=False)
+    return windows.max(axis=2)
+
+
+def _dequantize(kernel, kernel_scale=None):
+    # float16/int8 (quantized) kernels -> float32, once, at load time
+    # (int8: kernel ~= quantized * per-channel scale):
+    kernel = kernel.astype(np.float32)
+    if kernel_scale is not None:
+        kernel *= kernel_scale
+    return kernel
+
+
+# -------------------------------------------------------------------------
+def load_keras_h5_weights(weights_path:str):
+    """
+    Reads a Keras .h5 weights file (from model.save_weights() or
+    model.save()) and returns {layer_name: [weight arrays, in Keras order]}.
+    """
+    # Imported here, so h5py is only needed when loading from .h5:
+    import h5py
+
+    def decode(name):
+        return name.decode('utf8') if isinstance(name, bytes) else name
+
+    weights = {}
+    with h5py.File(weights_path, 'r') as f:
+        group = f['model_weights'] if 'model_weights' in f else f
+        for layer_name in group.attrs['layer_names']:
+            layer_name = decode(layer_name)
+            layer_group = group[layer_name]
+            weight_names = [decode(name) for name in layer_group.attrs['weight_names']]
+            weights[layer_name] = [np.asarray(layer_group[name], dtype=np.float32)
+                                   for name in weight_names]
+    return weights
+
+
+# -------------------------------------------------------------------------
+def load_npz_weights(npz_path:str):
+    """
+    Reads a weights file written by quantize_model.save_quantized_weights
+    and returns (weights, kernel_scales, precision): {layer_name: [weight
+    arrays]} with kernels kept in their stored dtype (float16 or int8),
+    {layer_name: per-channel scale} for int8 kernels, and the precision
+    ('float16' or 'int8').
+    """
+    weights = {}
+    kernel_scales = {}
+    with np.load(npz_path, allow_pickle=False) as data:
+        precision = str(data['precision'])
+        for key in data.files:
+            if key == 'precision':
+                continue
+            layer_name, index = key.rsplit('/', 1)
+            if index == 'kernel_scale':
+                kernel_scales[layer_name] = data[key].astype(np.float32)
+            else:
+                weights.setdefault(layer_name, {})[int(index)] = data[key]
+
+    weights = {layer_name: [arrays[i] for i in sorted(arrays)]
+               for layer_name, arrays in weights.items()}
+    return weights, kernel_scales, precision
+
+
+# -------------------------------------------------------------------------
+class NumpySequentialModel:
+    """
+    Runs a Keras Sequential model's forward pass in NumPy.
+
+    Build it with NumpySequentialModel.from_files(json_path, weights_path)
+    (defaults: our audio sentiment model), then call predict(x) like a
+    Keras model: x is (batch, length, channels) and the result is
+    (batch, n_classes).
+    """
+
+    def __init__(self, layer_configs, weights, kernel_scales=None):
+        """
+        layer_configs: The 'layers' list from the Keras JSON architecture
+        weights: {layer_name: [weight arrays]} (see load_keras_h5_weights)
+        kernel_scales: {layer_name: per-channel scale} for int8 kernels
+        (see load_npz_weights); quantized kernels are dequantized to
+        float32 here, once
+        """
+        self.ops = []
+        if kernel_scales is None:
+            kernel_scales = {}
+
+        for layer in layer_configs:
+            class_name = layer['class_name']
+            config = layer['config']
+            layer_weights = weights.get(config['name'], [])
+
+            if class_name == 'Conv1D':
+                if tuple(config.get('dilation_rate', [1])) != (1,):
+                    raise NotImplementedError("Conv1D dilation_rate other than 1 is not supported")
+                if config.get('data_format', 'channels_last') != 'channels_last':
+                    raise NotImplementedError("Conv1D data_format other than channels_last is not supported")
+                kernel = _dequantize(layer_weights[0], kernel_scales.get(config['name']))
+                bias = layer_weights[1] if config.get('use_bias', True) else np.zeros(kernel.shape[-1], dtype=np.float32)
+                self.ops.append({'op': 'conv1d',
+                                 'kernel': kernel,
+                                 'bias': bias,
+                                 'strides': config['strides'][0],
+                                 'padding': config['padding']})
+                self._add_activation(config.get('activation', 'linear'))
+
+            elif class_name == 'BatchNormalization':
+                self._add_batch_normalization(config, layer_weights)
+
+            elif class_name == 'Activation':
+                self._add_activation(config['activation'])
+
+            elif class_name == 'Dropout':
+                continue
+
+            elif class_name == 'MaxPooling1D':
+                if config.get('padding', 'valid') != 'valid':
+                    raise NotImplementedError("MaxPooling1D padding other than 'valid' is not supported")
+                self.ops.append({'op': 'max_pooling1d',
+                                 'pool_size': config['pool_size'][0],
+                                 'strides': (config.get('strides') or config['pool_size'])[0]})
+
+            elif class_name == 'Flatten':
+                self.ops.append({'op': 'flatten'})
+
+            elif class_name == 'Dense':
+                kernel = _dequantize(layer_weights[0], kernel_scales.get(config['name']))
+                bias = layer_weights[1] if config.get('use_bias', True) else np.zeros(kernel.shape[-1], dtype=np.float32)
+                self.ops.append({'op': 'dense',
+                                 'kernel': kernel,
+                                 'bias': bias})
+                self._add_activation(config.get('activation', 'linear'))
+
+            else:
+                raise NotImplementedError(f"Layer type '{class_name}' is not supported")
+
+    @classmethod
+    def from_files(cls, json_path:str=MODEL_JSON_PATH,
+                   weights_path:str=MODEL_WEIGHTS_PATH):
+        """
+        Builds the model from a Keras JSON architecture file and a Keras
+        .h5 weights file.
+        """
+        with open(json_path, 'r') as json_file:
+            architecture = json.load(json_file)
+
+        # Keras >= 2.2.3 nests the layers list under config['layers']:
+        layer_configs = architecture['config']
+        if isinstance(layer_configs, dict):
+            layer_configs = layer_configs['layers']
+
+        return cls(layer_configs=layer_configs,
+                   weights=load_keras_h5_weights(weights_path))
+
+    @classmethod
+    def from_npz(cls, json_path:str=MODEL_JSON_PATH, npz_path:str=None):
+        """
+        Builds the model from a Keras JSON architecture file and a
+        quantized weights file made by quantize_model.py (e.g.,
+        'models/audio_analysis_weights_int8.npz').
+        """
+        with open(json_path, 'r') as json_file:
+            architecture = json.load(json_file)
+
+        layer_configs = architecture['config']
+        if isinstance(layer_configs, dict):
+            layer_configs = layer_configs['layers']
+
+        weights, kernel_scales, precision = load_npz_weights(npz_path)
+        model = cls(layer_configs=layer_configs,
+                    weights=weights,
+                    kernel_scales=kernel_scales)
+        model.precision = precision
+        return model
+
+    def _add_activation(self, activation:str):
+        if activation not in ACTIVATIONS:
+            raise NotImplementedError(f"Activation '{activation}' is not supported")
+        if activation != 'linear':
+            self.ops.append({'op': 'activation', 'activation': activation})
+
+    def _add_batch_normalization(self, config, layer_weights):
+        """
+        Adds a BatchNormalization layer (over the last axis). If it directly
+        follows a Conv1D or Dense with no activation in between, it is
+        folded into that layer's kernel and bias ahead of time, so it costs
+        nothing at inference. Otherwise it is applied as a per-channel
+        scale and shift.
+        """
+        if config.get('axis', -1) not in (-1, 2, [-1], [2]):
+            raise NotImplementedError("BatchNormalization over an axis other than the last is not supported")
+
+        # Keras weight order: [gamma (if scale)], [beta (if center)],
+        # moving_mean, moving_variance:
+        layer_weights = list(layer_weights)
+        gamma = layer_weights.pop(0) if config.get('scale', True) else 1.0
+        beta = layer_weights.pop(0) if config.get('center', True) else 0.0
+        moving_mean, moving_variance = layer_weights
+
+        scale = (gamma / np.sqrt(moving_variance + config.get('epsilon', 1e-3))).astype(np.float32)
+        shift = (beta - moving_mean * scale).astype(np.float32)
+
+        previous = self.ops[-1] if self.ops else None
+        if previous is not None and previous['op'] in ('conv1d', 'dense'):
+            previous['kernel'] = (previous['kernel'] * scale).astype(np.float32)
+            previous['bias'] = (previous['bias'] * scale + shift).astype(np.float32)
+        else:
+            self.ops.append({'op': 'scale_shift', 'scale': scale, 'shift': shift})
+
+    def _forward(self, x):
+        for op in self.ops:
+            kind = op['op']
+            if kind == 'conv1d':
+                x = _conv1d(x, op['kernel'], op['bias'],
+                            strides=op['strides'], padding=op['padding'])
+            elif kind == 'activation':
+                x = ACTIVATIONS[op['activation']](x)
+            elif kind == 'max_pooling1d':
+                x = _max_pooling1d(x, pool_size=op['pool_size'], strides=op['strides'])
+            elif kind == 'flatten':
+                x = x.reshape(x.shape[0], -1)
+            elif kind == 'dense':
+                x = np.matmul(x, op['kernel'])
+                x += op['bias']
+            elif kind == 'scale_shift':
+                x = x * op['scale'] + op['shift']
+        return x
+
+    def predict(self, x, batch_size:int=64, verbose:int=0):
+        """
+        Runs the forward pass on x, shape (batch, length, channels), in
+        batches of batch_size, and returns the outputs (batch, n_classes).
+        (verbose is accepted for compatibility with Keras' predict.)
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if len(x) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        outputs = [self._forward(x[start:start + batch_size])
+                   for start in range(0, len(x), batch_size)]
+        return np.concatenate(outputs, axis=0)
+
+
+# -------------------------------------------------------------------------
+# PARITY CHECK AND BENCHMARK (vs. Keras):
+
+def check_parity_with_keras(json_path:str=MODEL_JSON_PATH,
+                            weights_path:str=MODEL_WEIGHTS_PATH,
+                            n_samples:int=64, seed:int=0,
+                            tolerance:float=PARITY_TOLERANCE):
+    """
+    Runs the NumPy engine and Keras on the same random inputs, and returns
+    the largest absolute difference in output probabilities, the share of
+    inputs where both pick the same class, and whether they match ('passed':
+    difference within tolerance and the same class for every input).
+    """
+    from keras.models import model_from_json
+
+    numpy_model = NumpySequentialModel.from_files(json_path, weights_path)
+    with open(json_path, 'r') as json_file:
+        keras_model = model_from_json(json_file.read())
+    keras_model.load_weights(weights_path)
+
+    input_shape = keras_model.input_shape[1:]
+    x = np.random.RandomState(seed).normal(size=(n_samples,) + tuple(input_shape)).astype(np.float32)
+
+    numpy_outputs = numpy_model.predict(x)
+    keras_outputs = keras_model.predict(x, batch_size=64, verbose=0)
+
+    max_abs_difference = float(np.max(np.abs(numpy_outputs - keras_outputs)))
+    same_class_share = float(np.mean(numpy_outputs.argmax(axis=1) == keras_outputs.argmax(axis=1)))
+    return {'max_abs_difference': max_abs_difference,
+            'same_class_share': same_class_share,
+            'tolerance': tolerance,
+            'passed': max_abs_difference <= tolerance and same_class_share == 1.0}
+
+def _peak_rss_mb():
+    # ru_maxrss is in KB on Linux (bytes on macOS):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def benchmark_engine(engine:str, json_path:str=MODEL_JSON_PATH,
+                     weights_path:str=MODEL_WEIGHTS_PATH,
+                     batch_sizes=(1, 16, 64), repeats:int=10):
+    """
+    Loads the model with the given engine ('numpy' or 'keras') in this
+    process, and returns its import+load time, mean predict latency per
+    batch size and this process's peak RSS.
+    """
+    start = time.perf_counter()
+    if engine == 'numpy':
+        model = NumpySequentialModel.from_files(json_path, weights_path)
+    elif engine == 'keras':
+        from keras.models import model_from_json
+        with open(json_path, 'r') as json_file:
+            model = model_from_json(json_file.read())
+        model.load_weights(weights_path)
+    else:
+        raise ValueError(f"Unknown engine '{engine}': use 'numpy' or 'keras'")
+    load_seconds = time.perf_counter() - start
+
+    with open(json_path, 'r') as json_file:
+        input_shape = json.load(json_file)['config']['layers'][0]['config']['batch_input_shape'][1:]
+
+    latency_ms = {}
+    for batch_size in batch_sizes:
+        x = np.random.RandomState(0).normal(size=[batch_size] + input_shape).astype(np.float32)
+        model.predict(x, batch_size=batch_size, verbose=0)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.predict(x, batch_size=batch_size, verbose=0)
+        latency_ms[batch_size] = round(1000 * (time.perf_counter() - start) / repeats, 3)
+
+    return {'engine': engine,
+            'load_seconds': round(load_seconds, 3),
+            'latency_ms_per_batch': latency_ms,
+            'peak_rss_mb': round(_peak_rss_mb(), 1)}
+
+def benchmark(engines=('numpy', 'keras')):
+    """
+    Benchmarks each engine in its own fresh Python process (so peak RSS
+    and load times are not mixed up between engines), and returns a list
+    of results (see benchmark_engine).
+    """
+    results = []
+    for engine in engines:
+        output = subprocess.run([sys.executable, '-m', 'audio_analysis.numpy_model',
+                                 '--benchmark-engine', engine],
+                                check=True, stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        results.append(json.loads(output.stdout.decode().strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NumPy inference engine for the audio sentiment model.')
+    parser.add_argument('--parity', action='store_true',
+                        help='Compare NumPy engine outputs with Keras outputs')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Benchmark latency and peak RSS of the NumPy and Keras engines')
+    parser.add_argument('--benchmark-engine', choices=['numpy', 'keras'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.benchmark_engine:
+        print(json.dumps(benchmark_engine(args.benchmark_engine)))
+        return
+
+    if args.parity:
+        parity = check_parity_with_keras()
+        print('Parity with Keras:', json.dumps(parity))
+    if args.benchmark:
+        for result in benchmark():
+            print('Benchmark:', json.dumps(result))
+    if args.parity and not parity['passed']:
+        sys.exit("NumPy engine does not match Keras")
+
+if __name__ == '__main__':
+    main()
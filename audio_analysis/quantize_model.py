@@ -0,0 +1,283 @@
+#!python
+
+"""
+Tool that makes quantized versions of our audio sentiment (emotion) model's
+weights -- float16, or int8 with one scale per output channel -- for the
+NumPy inference engine (numpy_model.py), with an accuracy regression gate.
+
+The quantized files are about 2x (float16) to 4x (int8) smaller than the
+float32 weights. That is the whole gain: the NumPy engine dequantizes them
+to float32 when it loads them, so inference speed is unchanged.
+
+Before writing a quantized weights file, it re-scores a labelled sample of
+our training data (audio_analysis/Notebooks/NormData_path.csv) with both the
+float32 model and the quantized model, and refuses to write the file if
+accuracy drops by more than max_accuracy_drop.
+
+Usage (data_root = the folder the CSV's 'path' column is relative to):
+
+    python -m audio_analysis.quantize_model --precision int8 --data-root <data_root>
+
+Then select the quantized weights in get_audio_sentiment_analysis with the
+AUDIO_MODEL_PRECISION env var ('float16' or 'int8').
+"""
+
+# Import external modules, packages, libraries we will use:
+import argparse
+import csv
+import json
+import numpy as np
+import os
+import pickle
+import random
+import sys
+
+# Import internal modules, packages, libraries for this project:
+from .numpy_model import MODELS_PATH, MODEL_JSON_PATH, MODEL_WEIGHTS_PATH
+from .numpy_model import NumpySequentialModel, load_keras_h5_weights
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+PRECISIONS = ('float16', 'int8')
+
+# Labelled evaluation data, and the model's class labels:
+EVALUATION_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   'Notebooks', 'NormData_path.csv')
+LABELS_PATH = MODELS_PATH + 'audio_analysis_labels'
+
+# Features: as in the training notebook (ML.ipynb): 4 seconds of audio
+# from 0.5 seconds in, at 44.1 kHz, mean of 13 MFCCs per frame:
+EVALUATION_OFFSET_SECONDS = 0.5
+EVALUATION_DURATION_SECONDS = 4
+EVALUATION_SAMPLE_RATE = 44100
+
+
+def get_quantized_weights_path(precision:str):
+    """
+    Returns the default path of the quantized weights file for a precision,
+    e.g. 'models/audio_analysis_weights_int8.npz'.
+    """
+    return MODELS_PATH + f'audio_analysis_weights_{precision}.npz'
+
+
+# -------------------------------------------------------------------------
+# QUANTIZATION:
+
+def _kernel_layer_names(json_path:str):
+    """
+    Returns the names of the layers with kernels (Conv1D, Dense): the only
+    weights we quantize. Biases and BatchNormalization weights are small,
+    and stay float32.
+    """
+    with open(json_path, 'r') as json_file:
+        layer_configs = json.load(json_file)['config']
+    if isinstance(layer_configs, dict):
+        layer_configs = layer_configs['layers']
+    return {layer['config']['name'] for layer in layer_configs
+            if layer['class_name'] in ('Conv1D', 'Dense')}
+
+def quantize_kernel_int8(kernel):
+    """
+    Symmetric int8 quantization with one scale per output channel (the
+    kernel's last axis): kernel ~= quantized * scale. Returns
+    (quantized int8 kernel, float32 scale per output channel).
+    """
+    reduce_axes = tuple(range(kernel.ndim - 1))
+    max_abs = np.max(np.abs(kernel), axis=reduce_axes)
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.round(kernel / scale), -127, 127).astype(np.int8)
+    return quantized, scale
+
+def quantize_weights(weights, precision:str, json_path:str=MODEL_JSON_PATH):
+    """
+    Quantizes the kernels in {layer_name: [weight arrays]} (see
+    numpy_model.load_keras_h5_weights) to the given precision ('float16'
+    or 'int8'). Returns (weights, kernel_scales), ready for
+    NumpySequentialModel(..., weights, kernel_scales) or
+    save_quantized_weights.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}': use one of {PRECISIONS}")
+
+    kernel_layers = _kernel_layer_names(json_path)
+    quantized_weights = {}
+    kernel_scales = {}
+
+    for layer_name, layer_weights in weights.items():
+        layer_weights = list(layer_weights)
+        if layer_name in kernel_layers:
+            if precision == 'float16':
+                layer_weights[0] = layer_weights[0].astype(np.float16)
+            else:
+                layer_weights[0], kernel_scales[layer_name] = quantize_kernel_int8(layer_weights[0])
+        quantized_weights[layer_name] = layer_weights
+
+    return quantized_weights, kernel_scales
+
+def save_quantized_weights(weights, kernel_scales, precision:str, npz_path:str):
+    """
+    Saves quantized weights to a compressed .npz file, readable by
+    numpy_model.load_npz_weights / NumpySequentialModel.from_npz.
+    """
+    arrays = {'precision': np.array(precision)}
+    for layer_name, layer_weights in weights.items():
+        for index, array in enumerate(layer_weights):
+            arrays[f'{layer_name}/{index}'] = array
+    for layer_name, scale in kernel_scales.items():
+        arrays[f'{layer_name}/kernel_scale'] = scale
+
+    # Write to a temp file first, so a failed write never leaves a
+    # half-written weights file where workers would load it:
+    temp_path = npz_path + '.tmp.npz'
+    np.savez_compressed(temp_path, **arrays)
+    os.replace(temp_path, npz_path)
+
+
+# -------------------------------------------------------------------------
+# EVALUATION HARNESS:
+
+def load_evaluation_sample(csv_path:str=EVALUATION_CSV_PATH, data_root:str='.',
+                           sample_size:int=500, seed:int=0):
+    """
+    Reads the labelled audio files list (columns: labels, source, path) and
+    returns a random sample of up to sample_size (label, full path) pairs
+    whose audio files exist under data_root.
+    """
+    with open(csv_path, newline='') as csv_file:
+        rows = [(row['labels'], os.path.join(data_root, row['path']))
+                for row in csv.DictReader(csv_file)]
+
+    rows = [row for row in rows if os.path.exists(row[1])]
+    random.Random(seed).shuffle(rows)
+    return rows[:sample_size]
+
+def get_evaluation_features(file_paths, input_length:int):
+    """
+    Computes the model's input features for each audio file, as in the
+    training notebook, zero-padded (or cut) to input_length frames.
+    Returns an array of shape (n_files, input_length, 1).
+    """
+    import librosa
+
+    features = np.zeros((len(file_paths), input_length, 1), dtype=np.float32)
+    for i, file_path in enumerate(file_paths):
+        data, sample_rate = librosa.load(file_path,
+                                         res_type='kaiser_fast',
+                                         duration=EVALUATION_DURATION_SECONDS,
+                                         sr=EVALUATION_SAMPLE_RATE,
+                                         offset=EVALUATION_OFFSET_SECONDS)
+        mfccs = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate, n_mfcc=13), axis=0)
+        mfccs = mfccs[:input_length]
+        features[i, :len(mfccs), 0] = mfccs
+    return features
+
+def get_accuracy(model, features, labels, class_labels):
+    """
+    Returns the share of samples where the model's predicted class label
+    matches the true label.
+    """
+    predictions = model.predict(features, batch_size=64).argmax(axis=1)
+    predicted_labels = np.asarray(class_labels)[predictions]
+    return float(np.mean(predicted_labels == np.asarray(labels)))
+
+
+# -------------------------------------------------------------------------
+def quantize_model(precision:str, data_root:str='.', npz_path:str=None,
+                   csv_path:str=EVALUATION_CSV_PATH, sample_size:int=500,
+                   max_accuracy_drop:float=0.01, seed:int=0,
+                   json_path:str=MODEL_JSON_PATH,
+                   weights_path:str=MODEL_WEIGHTS_PATH):
+    """
+    Makes quantized weights for our audio sentiment model at the given
+    precision ('float16' or 'int8'), scores the float32 and quantized
+    models on the same labelled sample, and writes the quantized weights
+    to npz_path (default: get_quantized_weights_path(precision)) only if
+    accuracy drops by no more than max_accuracy_drop.
+
+    Returns a report dict, with 'written' True if the file was written.
+    """
+    # Class labels (a fitted sklearn LabelEncoder):
+    with open(LABELS_PATH, 'rb') as infile:
+        class_labels = list(pickle.load(infile).classes_)
+
+    weights = load_keras_h5_weights(weights_path)
+    with open(json_path, 'r') as json_file:
+        layer_configs = json.load(json_file)['config']
+    if isinstance(layer_configs, dict):
+        layer_configs = layer_configs['layers']
+
+    baseline_model = NumpySequentialModel(layer_configs=layer_configs, weights=weights)
+    quantized_weights, kernel_scales = quantize_weights(weights, precision, json_path)
+    quantized_model = NumpySequentialModel(layer_configs=layer_configs,
+                                           weights=quantized_weights,
+                                           kernel_scales=kernel_scales)
+
+    sample = load_evaluation_sample(csv_path=csv_path, data_root=data_root,
+                                    sample_size=sample_size, seed=seed)
+    if not sample:
+        raise FileNotFoundError(f"No audio files from {csv_path} found under data root '{data_root}'")
+    labels, file_paths = zip(*sample)
+
+    input_length = layer_configs[0]['config']['batch_input_shape'][1]
+    features = get_evaluation_features(file_paths, input_length=input_length)
+
+    baseline_accuracy = get_accuracy(baseline_model, features, labels, class_labels)
+    quantized_accuracy = get_accuracy(quantized_model, features, labels, class_labels)
+    accuracy_drop = baseline_accuracy - quantized_accuracy
+
+    report = {'precision': precision,
+              'n_samples': len(sample),
+              'float32_accuracy': round(baseline_accuracy, 4),
+              'quantized_accuracy': round(quantized_accuracy, 4),
+              'accuracy_drop': round(accuracy_drop, 4),
+              'max_accuracy_drop': max_accuracy_drop,
+              'written': False}
+
+    if accuracy_drop > max_accuracy_drop:
+        return report
+
+    npz_path = npz_path or get_quantized_weights_path(precision)
+    save_quantized_weights(quantized_weights, kernel_scales, precision, npz_path)
+    report['written'] = True
+    report['npz_path'] = npz_path
+    report['size_bytes'] = os.path.getsize(npz_path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize the audio sentiment model, with an accuracy regression gate.')
+    parser.add_argument('--precision', choices=list(PRECISIONS) + ['all'], default='all',
+                        help='Quantized precision to produce (default: all)')
+    parser.add_argument('--data-root', default=os.getenv("AUDIO_EVALUATION_DATA_ROOT", '.'),
+                        help="Folder that the evaluation CSV's 'path' column is relative to")
+    parser.add_argument('--csv', default=EVALUATION_CSV_PATH,
+                        help='Labelled evaluation CSV (columns: labels, source, path)')
+    parser.add_argument('--sample-size', type=int, default=500,
+                        help='Number of labelled files to re-score')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Refuse to write the quantized model if accuracy drops by more than this')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the evaluation sample')
+    args = parser.parse_args()
+
+    precisions = PRECISIONS if args.precision == 'all' else [args.precision]
+    all_written = True
+    for precision in precisions:
+        report = quantize_model(precision=precision,
+                                data_root=args.data_root,
+                                csv_path=args.csv,
+                                sample_size=args.sample_size,
+                                max_accuracy_drop=args.max_accuracy_drop,
+                                seed=args.seed)
+        print(json.dumps(report))
+        if not report['written']:
+            print(f"Refused to write {precision} model: accuracy dropped by "
+                  f"{report['accuracy_drop']} (max {args.max_accuracy_drop}).", file=sys.stderr)
+            all_written = False
+
+    sys.exit(0 if all_written else 1)
+
+if __name__ == '__main__':
+    main()
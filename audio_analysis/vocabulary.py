@@ -0,0 +1,264 @@
+#!python
+
+"""
+Module with a vocabulary richness scorer for TeamReel video transcripts,
+for the 'speaking_vocabulary' column of our DB's videos_feedback table:
+
+- MATTR (moving-average type-token ratio): the share of distinct words in
+every window of MATTR_WINDOW words, averaged over the transcript (unlike
+the plain type-token ratio, it does not fall as answers get longer).
+- Rare-word share: the share of words that are not among the
+RARE_WORD_RANK most common English words.
+
+Word frequency ranks come from a precompiled table: a sorted array of
+fixed-width words plus their ranks, saved as .npy files and memory-mapped
+on first use (never at import), so it loads instantly, is looked up with
+vectorized binary search, and its pages are shared by all worker processes
+instead of each holding a large Python dict. Build it from a word counts
+file (one 'word count' pair per line) with:
+
+    python -m audio_analysis.vocabulary build --counts word_counts.txt
+
+No table ships with the repo (and none is built by our Docker image), so
+until one is built into models/ (or WORD_FREQUENCY_TABLE points to one),
+the rare-word share is None and the score comes from MATTR alone.
+"""
+
+# Import external modules, packages, libraries we will use:
+import argparse
+from dotenv import load_dotenv
+import numpy as np
+import os
+import threading
+
+# Import internal modules, packages, libraries for this project:
+from .audio_functions import MODELS_PATH, tokenize
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# Word frequency table: path prefix of its two .npy files
+# (<prefix>_words.npy, <prefix>_ranks.npy):
+WORD_FREQUENCY_TABLE = os.getenv("WORD_FREQUENCY_TABLE", MODELS_PATH + 'word_frequency')
+
+# Table words are fixed-width UTF-8 bytes (tokenize() keeps words of up to
+# 15 characters):
+WORD_WIDTH = 16
+
+MATTR_WINDOW = 50
+RARE_WORD_RANK = 10000
+UNKNOWN_WORD_RANK = np.iinfo(np.int32).max
+
+# Score thresholds (score: min MATTR), checked from best to worst, plus a
+# bonus point for a high rare-word share (max score 5):
+MATTR_SCORE_THRESHOLDS = [(5, 0.80), (4, 0.72), (3, 0.64), (2, 0.56)]
+RARE_SHARE_BONUS = 0.08
+
+# Minimum number of words to score a transcript:
+MIN_TOKENS = 10
+
+# The memory-mapped table, opened on first use (see get_word_frequency_table):
+_word_frequency_table = None
+_table_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------------
+def get_mattr(tokens, window:int=MATTR_WINDOW):
+    """
+    Returns the moving-average type-token ratio of a list of tokens: the
+    mean share of distinct tokens over all windows of window tokens (the
+    plain type-token ratio if there are fewer tokens than that), or None
+    without tokens.
+
+    Vectorized: each token counts as distinct in every window that starts
+    after its previous occurrence, so distinct counts for all windows come
+    from one difference array.
+    """
+    n_tokens = len(tokens)
+    if n_tokens == 0:
+        return None
+
+    _, ids = np.unique(np.asarray(tokens, dtype=object).astype(str), return_inverse=True)
+    if n_tokens <= window:
+        return float(len(np.unique(ids)) / n_tokens)
+
+    # Index of each token's previous occurrence (-1 if none):
+    order = np.argsort(ids, kind='stable')
+    previous = np.full(n_tokens, -1, dtype=np.int64)
+    same_as_previous = ids[order[1:]] == ids[order[:-1]]
+    previous[order[1:][same_as_previous]] = order[:-1][same_as_previous]
+
+    # Token i is distinct in windows starting in [first_start, i], within
+    # the valid window starts [0, n_windows):
+    n_windows = n_tokens - window + 1
+    positions = np.arange(n_tokens)
+    first_start = np.maximum(previous + 1, positions - window + 1)
+    last_start = np.minimum(positions, n_windows - 1)
+    valid = first_start <= last_start
+
+    changes = np.zeros(n_windows + 1, dtype=np.int64)
+    np.add.at(changes, first_start[valid], 1)
+    np.add.at(changes, last_start[valid] + 1, -1)
+    distinct_per_window = np.cumsum(changes[:-1])
+    return float(distinct_per_window.mean() / window)
+
+
+# -------------------------------------------------------------------------
+def get_word_frequency_table_files(table_prefix:str=None):
+    """
+    Returns the word frequency table's file paths (e.g., for the analysis
+    cache version, so replacing the table invalidates cached results).
+    """
+    table_prefix = table_prefix or WORD_FREQUENCY_TABLE
+    return [table_prefix + '_words.npy', table_prefix + '_ranks.npy']
+
+
+def get_word_frequency_table(table_prefix:str=None):
+    """
+    Returns the word frequency table as (words, ranks) memory-mapped arrays
+    (sorted fixed-width words, and each word's frequency rank, 1 = most
+    common), opened on the first call, or None if the table files do not
+    exist.
+    """
+    global _word_frequency_table
+    table_prefix = table_prefix or WORD_FREQUENCY_TABLE
+
+    with _table_lock:
+        if _word_frequency_table is None or _word_frequency_table[0] != table_prefix:
+            words_path, ranks_path = get_word_frequency_table_files(table_prefix)
+            if not (os.path.exists(words_path) and os.path.exists(ranks_path)):
+                return None
+            _word_frequency_table = (table_prefix,
+                                     np.load(words_path, mmap_mode='r'),
+                                     np.load(ranks_path, mmap_mode='r'))
+        return _word_frequency_table[1:]
+
+
+def get_word_ranks(tokens, table):
+    """
+    Looks up the frequency rank of each token in a word frequency table
+    (see get_word_frequency_table), with one vectorized binary search over
+    the distinct tokens. Returns an int array; tokens not in the table get
+    rank UNKNOWN_WORD_RANK (rarer than any word in the table).
+    """
+    words, ranks = table
+    if len(words) == 0 or len(tokens) == 0:
+        return np.full(len(tokens), UNKNOWN_WORD_RANK, dtype=np.int64)
+
+    unique_tokens, inverse = np.unique(np.asarray(tokens, dtype=object).astype(str),
+                                       return_inverse=True)
+    encoded = [token.encode('utf-8') for token in unique_tokens]
+    keys = np.array(encoded, dtype=f'S{WORD_WIDTH}')
+    fits = np.array([len(token) <= WORD_WIDTH for token in encoded], dtype=bool)
+
+    positions = np.minimum(np.searchsorted(words, keys), len(words) - 1)
+    found = fits & (words[positions] == keys)
+    unique_ranks = np.where(found, ranks[positions], UNKNOWN_WORD_RANK)
+    return unique_ranks[inverse]
+
+
+def get_rare_word_share(tokens, table=None, rare_word_rank:int=RARE_WORD_RANK):
+    """
+    Returns the share of tokens that are not among the rare_word_rank most
+    common words, or None without tokens or a word frequency table.
+    """
+    if table is None:
+        table = get_word_frequency_table()
+    if table is None or len(tokens) == 0:
+        return None
+    return float(np.mean(get_word_ranks(tokens, table) > rare_word_rank))
+
+
+def build_word_frequency_table(counts_filename:str, table_prefix:str=None,
+                               max_words:int=200000):
+    """
+    Builds the word frequency table from a word counts file (one 'word
+    count' pair per line, any order), keeping the max_words most common
+    words (tokenized the same way as transcripts), and saves it as
+    <table_prefix>_words.npy and <table_prefix>_ranks.npy.
+    """
+    table_prefix = table_prefix or WORD_FREQUENCY_TABLE
+
+    counts = {}
+    with open(counts_filename, 'r', encoding='utf-8') as infile:
+        for line in infile:
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            for word in tokenize(parts[0], min_len=1):
+                if len(word.encode('utf-8')) <= WORD_WIDTH:
+                    counts[word] = counts.get(word, 0) + int(parts[1])
+
+    most_common = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:max_words]
+    words = np.array([word.encode('utf-8') for word, _ in most_common], dtype=f'S{WORD_WIDTH}')
+    ranks = np.arange(1, len(words) + 1, dtype=np.int32)
+
+    order = np.argsort(words)
+    np.save(table_prefix + '_words.npy', words[order])
+    np.save(table_prefix + '_ranks.npy', ranks[order])
+    return len(words)
+
+
+# -------------------------------------------------------------------------
+def get_vocabulary_score(mattr:float, rare_word_share:float=None):
+    """
+    Translates MATTR (and the rare-word share, if known) to a vocabulary
+    score from 1-5 (5 = rich vocabulary).
+    """
+    score = 1
+    for threshold_score, min_mattr in MATTR_SCORE_THRESHOLDS:
+        if mattr >= min_mattr:
+            score = threshold_score
+            break
+    if rare_word_share is not None and rare_word_share >= RARE_SHARE_BONUS:
+        score = min(score + 1, 5)
+    return score
+
+
+def get_vocabulary_richness(tokens):
+    """
+    Returns vocabulary richness metrics for a transcript's tokens (from
+    tokenize or get_tokens):
+
+    n_tokens: Number of words
+    n_types: Number of distinct words
+    mattr: Moving-average type-token ratio
+    rare_word_share: Share of words outside the RARE_WORD_RANK most common
+    (None without a word frequency table)
+    score: 1-5 score, or 0 ("not set" in our DB) with fewer than MIN_TOKENS
+    words
+    """
+    tokens = [str(token).lower() for token in tokens]
+    results = {'n_tokens': len(tokens),
+               'n_types': len(set(tokens)),
+               'mattr': get_mattr(tokens),
+               'rare_word_share': get_rare_word_share(tokens),
+               'score': 0}
+
+    if len(tokens) >= MIN_TOKENS:
+        results['score'] = get_vocabulary_score(results['mattr'], results['rare_word_share'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vocabulary richness tools.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build the word frequency table')
+    build_parser.add_argument('--counts', required=True,
+                              help="Word counts file, one 'word count' pair per line")
+    build_parser.add_argument('--output', default=WORD_FREQUENCY_TABLE,
+                              help='Path prefix for the table .npy files')
+    build_parser.add_argument('--max-words', type=int, default=200000,
+                              help='Number of most common words to keep')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        n_words = build_word_frequency_table(args.counts, args.output, args.max_words)
+        print(f"Saved word frequency table ({n_words} words) to {args.output}_words.npy / _ranks.npy")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+#!python
+
+"""
+Module with a vectorized voice activity detector (VAD) for TeamReel videos:
+finds the stretches of the audio that contain speech, so speech recognition
+and the audio sentiment model only process speech, not dead air (silence
+before and after the answer, long pauses).
+
+Per-frame stats (loudness, speech-band energy, spectral flatness, peak
+level) are computed once per AudioBuffer, in blocks of frames with one FFT
+per block, and cached on the buffer, so every stage (and the acoustic
+metrics) shares them. Frames are speech if their spectrum is peaky (tonal,
+like voiced speech) rather than flat (like noise) and they are loud enough:
+above an absolute floor, and either well above the recording's own noise
+floor or loud in absolute terms (so a recording that is speech from start to
+finish, whose quietest frames are speech too, is not taken for noise). The
+frame decisions are smoothed into a speech-segment map:
+[(start_seconds, end_seconds), ...].
+
+If the detector finds implausibly little speech in a recording
+(has_enough_speech), callers fall back to analyzing the whole audio.
+"""
+
+# Import external modules, packages, libraries we will use:
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Analysis frames: 25 ms long, every 10 ms:
+VAD_FRAME_SECONDS = 0.025
+VAD_HOP_SECONDS = 0.010
+
+# Speech frequency band (for band energy and spectral flatness):
+VAD_SPEECH_BAND_HZ = (300, 3400)
+
+# Frame decision thresholds: speech-band energy at least this many dB above
+# the recording's noise floor (its quietest frames) or frame loudness of at
+# least VAD_SPEECH_LEVEL_DBFS (dBFS; plainly audible, whatever the noise
+# floor), frame loudness above an absolute floor (dBFS), and spectral
+# flatness (0 = tonal, 1 = white noise) below a max:
+VAD_NOISE_FLOOR_PERCENTILE = 10
+VAD_MIN_SNR_DB = 10
+VAD_SPEECH_LEVEL_DBFS = -35
+VAD_MIN_LEVEL_DBFS = -55
+VAD_MAX_FLATNESS = 0.45
+
+# Min share of a recording's duration in speech segments for the speech
+# segments to be trusted (our videos are answers to prompts, so less speech
+# than this means the detector missed it, not that nobody spoke):
+VAD_MIN_SPEECH_COVERAGE = 0.1
+
+# Smoothing: keep this much audio around speech (so word onsets and
+# unvoiced endings are not cut), fill shorter pauses, drop shorter blips:
+VAD_HANGOVER_SECONDS = 0.3
+VAD_MIN_SILENCE_SECONDS = 0.5
+VAD_MIN_SPEECH_SECONDS = 0.25
+
+# Number of frames per FFT block (bounds memory use for long videos):
+VAD_BLOCK_FRAMES = 2048
+
+
+# -------------------------------------------------------------------------
+class FrameStats:
+    """
+    Per-frame stats for an audio signal, one value per analysis frame
+    (frames start every hop_seconds):
+
+    rms_dbfs: Frame loudness (RMS level, in dB relative to full scale)
+    band_db: Speech-band (300-3400 Hz) spectral energy, in dB
+    flatness: Speech-band spectral flatness (0 = tonal, 1 = white noise)
+    peak: Max absolute sample value in the frame (for clipping detection)
+    """
+
+    def __init__(self, rms_dbfs, band_db, flatness, peak,
+                 frame_seconds:float, hop_seconds:float):
+        self.rms_dbfs = rms_dbfs
+        self.band_db = band_db
+        self.flatness = flatness
+        self.peak = peak
+        self.frame_seconds = frame_seconds
+        self.hop_seconds = hop_seconds
+
+    def __len__(self):
+        return len(self.rms_dbfs)
+
+
+def compute_frame_stats(samples, sample_rate:int,
+                        frame_seconds:float=VAD_FRAME_SECONDS,
+                        hop_seconds:float=VAD_HOP_SECONDS,
+                        block_frames:int=VAD_BLOCK_FRAMES):
+    """
+    Computes FrameStats for a 1-D array of float samples: the signal is
+    framed as a strided view (no copies), and each block of block_frames
+    frames is windowed and transformed with one batched FFT.
+    """
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    frame_length = int(round(frame_seconds * sample_rate))
+    hop_length = int(round(hop_seconds * sample_rate))
+
+    if len(samples) < frame_length:
+        empty = np.zeros(0, dtype=np.float32)
+        return FrameStats(empty, empty, empty, empty, frame_seconds, hop_seconds)
+
+    n_frames = 1 + (len(samples) - frame_length) // hop_length
+    frames = as_strided(samples,
+                        shape=(n_frames, frame_length),
+                        strides=(samples.strides[0] * hop_length, samples.strides[0]),
+                        writeable=False)
+
+    n_fft = 1 << (frame_length - 1).bit_length()
+    frequencies = np.fft.rfftfreq(n_fft, d=1.0 / sample_rate)
+    band = (frequencies >= VAD_SPEECH_BAND_HZ[0]) & (frequencies <= VAD_SPEECH_BAND_HZ[1])
+    window = np.hanning(frame_length).astype(np.float32)
+    eps = 1e-10
+
+    rms_dbfs = np.empty(n_frames, dtype=np.float32)
+    band_db = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+    peak = np.empty(n_frames, dtype=np.float32)
+
+    for start in range(0, n_frames, block_frames):
+        block = frames[start:start + block_frames]
+        end = start + len(block)
+
+        rms = np.sqrt(np.mean(np.square(block, dtype=np.float32), axis=1))
+        rms_dbfs[start:end] = 20 * np.log10(rms + eps)
+        peak[start:end] = np.max(np.abs(block), axis=1)
+
+        power = np.abs(np.fft.rfft(block * window, n=n_fft, axis=1)[:, band]) ** 2 + eps
+        mean_power = np.mean(power, axis=1)
+        band_db[start:end] = 10 * np.log10(mean_power)
+        flatness[start:end] = np.exp(np.mean(np.log(power), axis=1)) / mean_power
+
+    return FrameStats(rms_dbfs, band_db, flatness, peak, frame_seconds, hop_seconds)
+
+
+def concatenate_frame_stats(frame_stats_list):
+    """
+    Joins FrameStats of consecutive stretches of audio into one.
+    """
+    first = frame_stats_list[0]
+    return FrameStats(*(np.concatenate([getattr(stats, name) for stats in frame_stats_list])
+                        for name in ('rms_dbfs', 'band_db', 'flatness', 'peak')),
+                      frame_seconds=first.frame_seconds,
+                      hop_seconds=first.hop_seconds)
+
+
+def stream_frame_stats(blocks, sample_rate:int,
+                       frame_seconds:float=VAD_FRAME_SECONDS,
+                       hop_seconds:float=VAD_HOP_SECONDS):
+    """
+    Computes FrameStats from an iterable of consecutive 1-D sample blocks
+    (e.g., audio_buffer.stream_audio_from_video(...)), block by block,
+    giving the same frames as compute_frame_stats on the whole signal while
+    only holding one block of audio (plus one frame of overlap) in memory.
+    """
+    frame_length = int(round(frame_seconds * sample_rate))
+    hop_length = int(round(hop_seconds * sample_rate))
+
+    pending = np.zeros(0, dtype=np.float32)
+    frame_stats_list = [compute_frame_stats(pending, sample_rate, frame_seconds, hop_seconds)]
+    for block in blocks:
+        pending = np.concatenate([pending, np.asarray(block, dtype=np.float32)])
+        if len(pending) < frame_length:
+            continue
+        n_frames = (len(pending) - frame_length) // hop_length + 1
+        frame_stats_list.append(compute_frame_stats(pending[:(n_frames - 1) * hop_length + frame_length],
+                                                    sample_rate, frame_seconds, hop_seconds))
+        # Keep the samples the next frames still need:
+        pending = pending[n_frames * hop_length:]
+
+    return concatenate_frame_stats(frame_stats_list)
+
+
+def get_frame_stats(audio_buffer):
+    """
+    Returns the FrameStats for an AudioBuffer (at its native sample rate),
+    computed on the first call and cached on the buffer.
+    """
+    return audio_buffer.cached('frame_stats',
+                               lambda: compute_frame_stats(audio_buffer.samples,
+                                                           audio_buffer.sample_rate))
+
+
+# -------------------------------------------------------------------------
+def get_speech_frames(frame_stats:FrameStats):
+    """
+    Returns a boolean array: True for frames classified as speech, before
+    smoothing.
+    """
+    if len(frame_stats) == 0:
+        return np.zeros(0, dtype=bool)
+
+    noise_floor_db = np.percentile(frame_stats.band_db, VAD_NOISE_FLOOR_PERCENTILE)
+    return (((frame_stats.band_db >= noise_floor_db + VAD_MIN_SNR_DB)
+             | (frame_stats.rms_dbfs >= VAD_SPEECH_LEVEL_DBFS))
+            & (frame_stats.rms_dbfs >= VAD_MIN_LEVEL_DBFS)
+            & (frame_stats.flatness <= VAD_MAX_FLATNESS))
+
+
+def _runs(mask):
+    """
+    Returns (starts, ends) of the runs of True in a boolean array, as frame
+    indexes (ends exclusive).
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def smooth_speech_frames(speech_frames, hop_seconds:float,
+                         hangover_seconds:float=VAD_HANGOVER_SECONDS,
+                         min_silence_seconds:float=VAD_MIN_SILENCE_SECONDS,
+                         min_speech_seconds:float=VAD_MIN_SPEECH_SECONDS):
+    """
+    Smooths frame-level speech decisions into speech segments: drops speech
+    runs shorter than min_speech_seconds, pads each run by hangover_seconds
+    on both sides and fills pauses shorter than min_silence_seconds.
+    Returns (start_frames, end_frames) arrays (ends exclusive).
+    """
+    n_frames = len(speech_frames)
+    starts, ends = _runs(speech_frames)
+
+    keep = (ends - starts) * hop_seconds >= min_speech_seconds
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return starts, ends
+
+    hangover = int(round(hangover_seconds / hop_seconds))
+    starts = np.maximum(starts - hangover, 0)
+    ends = np.minimum(ends + hangover, n_frames)
+
+    # Merge segments separated by short pauses (or overlapping after padding):
+    min_silence = int(round(min_silence_seconds / hop_seconds))
+    new_segment = np.concatenate(([True], starts[1:] - ends[:-1] >= min_silence))
+    segment_ids = np.cumsum(new_segment) - 1
+    merged_starts = starts[new_segment]
+    merged_ends = np.zeros(len(merged_starts), dtype=ends.dtype)
+    np.maximum.at(merged_ends, segment_ids, ends)
+    return merged_starts, merged_ends
+
+
+def get_speech_mask(frame_stats:FrameStats):
+    """
+    Returns a boolean array: True for frames inside (smoothed) speech
+    segments.
+    """
+    starts, ends = smooth_speech_frames(get_speech_frames(frame_stats),
+                                        hop_seconds=frame_stats.hop_seconds)
+    mask = np.zeros(len(frame_stats), dtype=bool)
+    for start, end in zip(starts, ends):
+        mask[start:end] = True
+    return mask
+
+
+def get_speech_segments(audio_buffer):
+    """
+    Returns the speech-segment map for an AudioBuffer: a list of
+    (start_seconds, end_seconds) tuples, in order, computed on the first
+    call and cached on the buffer.
+    """
+    def compute():
+        frame_stats = get_frame_stats(audio_buffer)
+        starts, ends = smooth_speech_frames(get_speech_frames(frame_stats),
+                                            hop_seconds=frame_stats.hop_seconds)
+        hop = frame_stats.hop_seconds
+        # A frame starting at index i covers [i*hop, i*hop + frame_seconds]:
+        return [(float(start * hop),
+                 float(min((end - 1) * hop + frame_stats.frame_seconds, audio_buffer.duration)))
+                for start, end in zip(starts, ends)]
+
+    return audio_buffer.cached('speech_segments', compute)
+
+
+def has_enough_speech(audio_buffer, min_coverage:float=VAD_MIN_SPEECH_COVERAGE):
+    """
+    Returns True if the speech segments of an AudioBuffer cover at least
+    min_coverage (share) of its duration, i.e. if they can be trusted to
+    stand for the speech in it.
+    """
+    if audio_buffer.duration <= 0:
+        return False
+    speech_seconds = sum(end - start for start, end in get_speech_segments(audio_buffer))
+    return speech_seconds / audio_buffer.duration >= min_coverage
+
+
+# -------------------------------------------------------------------------
+def get_speech_chunk_bounds(audio_buffer, max_chunk_seconds:float,
+                            max_gap_seconds:float=1.0):
+    """
+    Returns (start_seconds, end_seconds) bounds of audio chunks for speech
+    recognition that follow speech boundaries: neighboring speech segments
+    less than max_gap_seconds apart are joined while the chunk stays within
+    max_chunk_seconds, and longer segments are split at their quietest
+    frame in the last quarter of each max_chunk_seconds stretch (so
+    words are not cut in half). Non-speech audio is left out.
+    """
+    bounds = []
+    for start, end in get_speech_segments(audio_buffer):
+        if bounds and start - bounds[-1][1] < max_gap_seconds and end - bounds[-1][0] <= max_chunk_seconds:
+            bounds[-1] = (bounds[-1][0], end)
+        else:
+            bounds.append((start, end))
+
+    frame_stats = get_frame_stats(audio_buffer)
+    hop = frame_stats.hop_seconds
+    chunk_bounds = []
+    for start, end in bounds:
+        while end - start > max_chunk_seconds:
+            first_frame = int((start + 0.75 * max_chunk_seconds) / hop)
+            last_frame = max(first_frame + 1, int((start + max_chunk_seconds) / hop))
+            split_frame = first_frame + int(np.argmin(frame_stats.rms_dbfs[first_frame:last_frame]))
+            split = split_frame * hop
+            chunk_bounds.append((start, split))
+            start = split
+        chunk_bounds.append((start, end))
+    return chunk_bounds
+
+
+def get_speech_window_starts(audio_buffer, window_seconds:float,
+                             min_remainder_seconds:float=1.0):
+    """
+    Returns the start times (in seconds) of fixed-length windows of
+    window_seconds that cover the speech segments: consecutive windows
+    within each segment, plus one last window ending at the segment's end
+    if at least min_remainder_seconds of speech would be left over. Windows
+    that would run past a segment (or short segments) are shifted back to
+    end at the segment's end, so every window is full length. Windows never
+    run past the audio's start or end.
+    """
+    duration = audio_buffer.duration
+    if duration < window_seconds:
+        return []
+
+    starts = []
+    for start, end in get_speech_segments(audio_buffer):
+        n_windows = int((end - start) // window_seconds)
+        starts.extend(start + window_seconds * np.arange(n_windows))
+        remainder = (end - start) - n_windows * window_seconds
+        if n_windows == 0 or remainder >= min_remainder_seconds:
+            starts.append(end - window_seconds)
+
+    starts = np.clip(np.asarray(starts, dtype=np.float64), 0, duration - window_seconds)
+    return [float(start) for start in starts]
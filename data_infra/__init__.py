@@ -7,8 +7,10 @@ to get and store videos and data about videos, prompts and users.
 from .data_pipelines import get_next_video
 from .postgresql_db_functions import get_feedback_for_user
 from .postgresql_db_functions import get_feedback_for_video, get_video_info
+from .postgresql_db_functions import get_video_info_batch
 
 __all__ = ["get_next_video",
            "get_feedback_for_user",
            "get_feedback_for_video",
-           "get_video_info"]
+           "get_video_info",
+           "get_video_info_batch"]
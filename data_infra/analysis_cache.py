@@ -0,0 +1,176 @@
+#!python
+
+"""
+Module with the AnalysisCache class: a content-addressed cache of video
+analysis results (the outputs of our ML functions: transcript, audio
+sentiment, speaking speed, text sentiment, facial metrics), so a video whose
+exact bytes were already analyzed -- an SQS redelivery, a duplicate upload,
+an unchanged re-record -- skips straight to updating our DB instead of
+re-running the whole ML pipeline.
+
+Each entry is keyed by the SHA-256 of the video file's bytes plus the
+analysis version (our analysis code version, the model files and the
+settings that change the results), and stored as a small JSON file in
+ANALYSIS_CACHE_DIR. The cache is bounded to ANALYSIS_CACHE_MAX_BYTES on
+disk, evicting the least recently used entries first. Several worker
+processes can share one cache directory.
+"""
+
+# Import libraries we will use:
+from dotenv import load_dotenv
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# Turn the cache on/off, where to keep it, and its max size on disk:
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR",
+                               os.path.join(tempfile.gettempdir(), 'teamreel-analysis-cache'))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Version of our analysis code: bump this whenever a change to our ML
+# functions changes their results, so results cached by older code are not
+# reused:
+ANALYSIS_CODE_VERSION = '10'
+
+
+# -------------------------------------------------------------------------
+def file_sha256(filename:str, block_size:int=1024 * 1024):
+    """
+    Returns the SHA-256 hex digest of a file's bytes, reading it in blocks
+    (so large videos are never loaded into memory all at once).
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as infile:
+        for block in iter(lambda: infile.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_analysis_version(file_paths=(), settings:dict=None):
+    """
+    Returns a short version string for our analysis: a hash of
+    ANALYSIS_CODE_VERSION, the name and SHA-256 of the contents of each
+    model file in file_paths (so replacing a model invalidates the cache,
+    however its modification time was set), and any settings that change
+    the results (e.g., {'ASR_BACKEND': ...}).
+
+    This reads every model file, so call it once per process (e.g., when
+    creating the AnalysisCache), not once per video.
+    """
+    digest = hashlib.sha256(ANALYSIS_CODE_VERSION.encode())
+    for file_path in file_paths:
+        if file_path and os.path.exists(file_path):
+            digest.update(f"{os.path.basename(file_path)}:{file_sha256(file_path)}".encode())
+    digest.update(json.dumps(settings or {}, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+# -------------------------------------------------------------------------
+class AnalysisCache:
+    """
+    A size-bounded, least-recently-used cache of analysis results (JSON-
+    serializable dicts), keyed by video content and analysis version:
+
+        cache = AnalysisCache(version=get_analysis_version(...))
+        key = cache.key_for_file(video_filename)
+        results = cache.get(key)
+        if results is None:
+            results = ...  # run the analysis
+            cache.put(key, results)
+
+    Parameters:
+    version: Analysis version (see get_analysis_version), part of every key
+    directory: Directory to keep the cache in (default: ANALYSIS_CACHE_DIR)
+    max_bytes: Max total size of the cache on disk (default:
+    ANALYSIS_CACHE_MAX_BYTES); least recently used entries are evicted first
+    """
+
+    def __init__(self, version:str, directory:str=None, max_bytes:int=None):
+        self.version = version
+        self.directory = directory or ANALYSIS_CACHE_DIR
+        self.max_bytes = ANALYSIS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key_for_file(self, filename:str):
+        """
+        Returns the cache key for a video file: the SHA-256 of its bytes,
+        combined with this cache's analysis version.
+        """
+        return hashlib.sha256(f"{file_sha256(filename)}:{self.version}".encode()).hexdigest()
+
+    def _entry_path(self, key:str):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key:str):
+        """
+        Returns the cached results for a key, or None if not cached.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as infile:
+                results = json.load(infile)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Mark as recently used (eviction goes by modification time):
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+        return results
+
+    def put(self, key:str, results:dict):
+        """
+        Caches the results for a key, then evicts least recently used
+        entries while the cache is over max_bytes.
+        """
+        # Write to a temp file first and move it into place, so other
+        # workers never read a half-written entry:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as outfile:
+                json.dump(results, outfile)
+            os.replace(temp_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache's total size is
+        at most max_bytes.
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            for _, size, entry_path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
@@ -27,19 +27,36 @@ AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION")
 
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 
-# Create an S3 Service Resource:
-s3 = boto3.resource('s3',
-                    aws_access_key_id=AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                    region_name=AWS_DEFAULT_REGION
-                   )
+# S3 Service Resource and S3 client: created on first use (see
+# get_s3_client), not at import time:
+s3 = None
+s3_client = None
 
-# Make an S3 client with boto3:
-s3_client = boto3.client('s3',
-                         aws_access_key_id=AWS_ACCESS_KEY_ID,
-                         aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                         region_name=AWS_DEFAULT_REGION
-                         )
+
+# -------------------------------------------------------------------------
+def get_s3_client():
+    """
+    Returns our S3 client (and Service Resource), creating them on the
+    first call.
+    """
+    global s3, s3_client
+
+    if s3_client is None:
+        # Create an S3 Service Resource:
+        s3 = boto3.resource('s3',
+                            aws_access_key_id=AWS_ACCESS_KEY_ID,
+                            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                            region_name=AWS_DEFAULT_REGION
+                           )
+
+        # Make an S3 client with boto3:
+        s3_client = boto3.client('s3',
+                                 aws_access_key_id=AWS_ACCESS_KEY_ID,
+                                 aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                                 region_name=AWS_DEFAULT_REGION
+                                 )
+
+    return s3_client
 
 
 # -------------------------------------------------------------------------
@@ -62,7 +79,7 @@ def s3_download_file(bucket, filename, key=None):
 
     # Upload the file to the specified S3 bucket:
     try:
-        response = s3_client.download_file(Bucket=bucket,
+        response = get_s3_client().download_file(Bucket=bucket,
                                            Filename=filename,
                                            Key=key)
     except ClientError as e:
@@ -91,7 +108,7 @@ def s3_upload_file(bucket, filename, key=None):
 
     # Upload the file to the specified S3 bucket:
     try:
-        response = s3_client.upload_file(Bucket=bucket,
+        response = get_s3_client().upload_file(Bucket=bucket,
                                          Filename=filename,
                                          Key=key)
     except ClientError as e:
@@ -25,22 +25,52 @@ AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION")
 
 SQS_QUEUE_NAME = os.getenv("SQS_QUEUE_NAME")
 
-# Create an SQS Service Resource:
-sqs = boto3.resource('sqs',
-                     aws_access_key_id=AWS_ACCESS_KEY_ID,
-                     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                     region_name=AWS_DEFAULT_REGION
-                    )
+# SQS Service Resource, SQS client and our queue: created on first use
+# (see get_sqs_queue), not at import time, since getting the queue is a
+# network call to AWS:
+sqs = None
+sqs_client = None
+queue = None
 
-# Create a client object for SQS, using the access keys in our .env file:
-sqs_client = boto3.client('sqs',
-                          aws_access_key_id=AWS_ACCESS_KEY_ID,
-                          aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                          region_name=AWS_DEFAULT_REGION
-                         )
 
-# Get our queue from SQS:
-queue = sqs.get_queue_by_name(QueueName=SQS_QUEUE_NAME)
+# -------------------------------------------------------------------------
+def get_sqs_client():
+    """
+    Returns our SQS client (and Service Resource), creating them on the
+    first call.
+    """
+    global sqs, sqs_client
+
+    if sqs_client is None:
+        # Create an SQS Service Resource:
+        sqs = boto3.resource('sqs',
+                             aws_access_key_id=AWS_ACCESS_KEY_ID,
+                             aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                             region_name=AWS_DEFAULT_REGION
+                            )
+
+        # Create a client object for SQS, using the access keys in our .env file:
+        sqs_client = boto3.client('sqs',
+                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
+                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                                  region_name=AWS_DEFAULT_REGION
+                                 )
+
+    return sqs_client
+
+
+def get_sqs_queue():
+    """
+    Returns our SQS queue, looking it up by name on the first call.
+    """
+    global queue
+
+    if queue is None:
+        get_sqs_client()
+        # Get our queue from SQS:
+        queue = sqs.get_queue_by_name(QueueName=SQS_QUEUE_NAME)
+
+    return queue
 
 
 # -------------------------------------------------------------------------
@@ -51,7 +81,7 @@ def sqs_queue_get_next_item():
 
     # Get next message from SQS queue
     # (messages are auto-added by our S3 bucket each time a new video is uploaded to our S3 bucket):
-    message = sqs_client.receive_message(QueueUrl=queue.url,
+    message = get_sqs_client().receive_message(QueueUrl=get_sqs_queue().url,
                                          MaxNumberOfMessages=1,
                                          MessageAttributeNames=['All']
                                         )
@@ -78,8 +108,8 @@ def sqs_delete_message_from_queue(receipt_handle:str):
     """
 
     # Delete message received from SQS queue:
-    sqs_client.delete_message(
-        QueueUrl=queue.url,
+    get_sqs_client().delete_message(
+        QueueUrl=get_sqs_queue().url,
         ReceiptHandle=receipt_handle
     )
 
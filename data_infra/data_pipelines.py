@@ -15,6 +15,7 @@ import os
 from .aws_sqs_functions import sqs_queue_get_next_item
 from .aws_sqs_functions import sqs_delete_message_from_queue
 from .aws_s3_functions import s3_download_file
+from .job_workspace import workspace_path
 from .postgresql_db_functions import get_video_info
 
 
@@ -28,16 +29,17 @@ S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 
 
 # -------------------------------------------------------------------------
-def get_next_video():
+def get_next_video(workspace=None):
     """
     Checks for newly uploaded videos (by our users) --> then downloads the
-    raw video file of the next-in-line video to the project directory, and
-    returns a dictionary with info about that video, prompt and user pulled
-    from our DB.
+    raw video file of the next-in-line video to the job's workspace (or, if
+    no workspace is given, to the project directory), and returns a
+    dictionary with info about that video, prompt and user pulled from our DB.
 
     (1) Checks our TeamReel AWS SQS queue for new messages from newly
     uploaded videos (our S3 bucket sends a notification for each new video);
-    (2) downloads the raw video file from S3 to your project directory;
+    (2) downloads the raw video file from S3 to the job's workspace (or
+    your project directory);
     (3) gets info about that video, prompt, and user from our PostgreSQL DB;
     (4) deletes the message from our queue after processing; and
     (5) returns a Python dictionary of the video info pulled from the DB.
@@ -70,9 +72,10 @@ def get_next_video():
 
         # -----------------------------------------------------------------------
 
-        # Downloads the raw video file from the S3 bucket to your project directory:
+        # Downloads the raw video file from the S3 bucket to the job's
+        # workspace (or your project directory):
         s3_download_file(bucket=S3_BUCKET_NAME,
-                         filename=video_s3_filename,
+                         filename=workspace_path(workspace, video_s3_filename),
                          key=video_s3_key)
 
         video_info = get_video_info(video_s3_key)
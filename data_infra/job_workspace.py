@@ -0,0 +1,101 @@
+#!python
+
+"""
+Module with the JobWorkspace class: a private, per-job directory for all of
+the intermediate files of one video analysis (downloaded video, audio,
+transcript, audio/text chunks), so several analyses can run at the same time
+in one process or container without overwriting each other's files.
+"""
+
+# Import libraries we will use:
+from dotenv import load_dotenv
+import os
+import shutil
+import tempfile
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# Directory to create job workspaces in (default: the system temp dir):
+WORKSPACE_ROOT = os.getenv("TEAMREEL_WORKSPACE_ROOT")
+
+# Put job workspaces on a RAM filesystem (if available), unless
+# TEAMREEL_WORKSPACE_ROOT says otherwise:
+WORKSPACE_USE_RAM = os.getenv("TEAMREEL_WORKSPACE_USE_RAM", "false").lower() in ("1", "true", "yes")
+RAM_FILESYSTEM_ROOT = '/dev/shm'
+
+
+# -------------------------------------------------------------------------
+class JobWorkspace:
+    """
+    A uniquely-named temporary directory for one analysis job.
+
+    Use it as a context manager, so the directory and everything written to
+    it is removed when the job ends, whether it succeeded or raised:
+
+        with JobWorkspace(job_id='video-42') as workspace:
+            audio_filename = workspace.path('audio.wav')
+            ...
+
+    Parameters:
+    job_id: Optional label included in the directory name (for debugging)
+    root: Directory to create the workspace in (default: TEAMREEL_WORKSPACE_ROOT
+    env var, else /dev/shm if use_ram and available, else the system temp dir)
+    use_ram: Back the workspace with a RAM filesystem (/dev/shm) if available
+    (default: TEAMREEL_WORKSPACE_USE_RAM env var)
+    """
+
+    def __init__(self, job_id:str=None, root:str=None, use_ram:bool=None):
+        if use_ram is None:
+            use_ram = WORKSPACE_USE_RAM
+        if root is None:
+            root = WORKSPACE_ROOT
+        if root is None and use_ram and os.path.isdir(RAM_FILESYSTEM_ROOT):
+            root = RAM_FILESYSTEM_ROOT
+
+        prefix = f"teamreel-{job_id}-" if job_id is not None else "teamreel-"
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=root)
+
+    def path(self, *parts):
+        """
+        Returns the path of a file (or folder) inside this workspace.
+        """
+        return os.path.join(self.directory, *parts)
+
+    def makedirs(self, *parts):
+        """
+        Creates a folder inside this workspace (if it does not exist yet)
+        and returns its path, ending in '/'.
+        """
+        folder = self.path(*parts)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, '')
+
+    def cleanup(self):
+        """
+        Removes the workspace directory and everything in it.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+
+# -------------------------------------------------------------------------
+def workspace_path(workspace, *parts):
+    """
+    Returns the path of a file inside the given JobWorkspace, or (if
+    workspace is None) relative to the current working directory, which is
+    where our functions have always written their files.
+    """
+    if workspace is None:
+        return os.path.join(*parts)
+    return workspace.path(*parts)
@@ -2,44 +2,63 @@
 # Author: Chris Huskey
 
 """
-Module of functions for working with our TeamReel PostgreSQL DB.
+Module of functions for working with our TeamReel PostgreSQL DB. Every
+query runs on a connection checked out from our connection pool (see
+postgresql_pool.py), so these functions are safe to call from many threads
+at once, and is a named, parameterized statement (see
+prepared_statements.py), prepared once per connection.
 """
 
 # Import libraries we will use:
-from dotenv import load_dotenv
-import os
 import pandas as pd
-import psycopg2
+from psycopg2.extras import execute_values
+
+# Import internal modules for this project:
+from .postgresql_pool import pg_cursor
+from .prepared_statements import STATEMENTS
 
 
 # -------------------------------------------------------------------------
-# SETUP:
+def _load_dataframe(statement_name:str, key):
+    """
+    Runs a registered statement with one parameter and returns its results
+    as a DataFrame.
+    """
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, statement_name, (key,))
+        column_names = [column_name[0] for column_name in cursor.description]
+        rows = cursor.fetchall()
+
+    return pd.DataFrame(data=rows, columns=column_names)
 
-# Get access info from .env file:
-load_dotenv()
 
-# PostgreSQL DB info:
-PG_DB_HOST = os.getenv("PG_DB_HOST")
-PG_DB_PORT = os.getenv("PG_DB_PORT")
-PG_DB_NAME = os.getenv("PG_DB_NAME")
-PG_DB_USER = os.getenv("PG_DB_USER")
-PG_DB_PW = os.getenv("PG_DB_PW")
-PG_DB_URI = os.getenv("PG_DB_URI")
+def _load_row(statement_name:str, key):
+    """
+    Runs a registered statement with one parameter and returns its first
+    row as a {column name: value} dict, or None if there are no results.
+    """
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, statement_name, (key,))
+        results = cursor.fetchall()
+        column_names = [column_name[0] for column_name in cursor.description]
 
-# Open a connection to our PostgreSQL DB:
-pg_conn = psycopg2.connect(
-    host = PG_DB_HOST,
-    port = PG_DB_PORT,
-    database = PG_DB_NAME,
-    user = PG_DB_USER,
-    password = PG_DB_PW
-)
+    # Check to make sure results are not empty (i.e., no data in this table):
+    if results == []:
+        return None
 
-# Instantiate a cursor using this connection:
-pg_cursor = pg_conn.cursor()
+    return dict(zip(column_names, results[0]))
 
 
 # -------------------------------------------------------------------------
+STATEMENTS.register('feedback_for_user', """
+    SELECT fb.id, fb.post, fb.video_id, fb.created_at, fb.updated_at,
+           fb.overall_performance, fb.delivery_and_presentation,
+           fb.response_quality, fb.audio_quality, fb.visual_environment
+    FROM feedback AS fb, videos AS vds
+    WHERE (fb.video_id = vds.id AND vds.owner_id = $1);
+""")
+
+
 def get_feedback_for_user(user_id:int):
     """
     Using the user's user_id in our database (= 'owner_id' in the 'feedback' table),
@@ -50,16 +69,14 @@ def get_feedback_for_user(user_id:int):
     if type(user_id) is not int:
         raise ValueError('Invalid user_id')
 
-    # Get all feedback for the given video from our PostgreSQL DB:
-    pg_cursor.execute(f"SELECT fb.id, fb.post, fb.video_id, fb.created_at, fb.updated_at, fb.overall_performance, fb.delivery_and_presentation, fb.response_quality, fb.audio_quality, fb.visual_environment FROM feedback as fb, videos as vds WHERE (fb.video_id = vds.id AND vds.owner_id={user_id});")
-    column_names = [column_name[0] for column_name in pg_cursor.description]
+    # Get all feedback for the given user from our PostgreSQL DB:
+    return _load_dataframe('feedback_for_user', user_id)
 
-    feedback_dataframe = pd.DataFrame(data=pg_cursor.fetchall(), columns=column_names)
 
-    return feedback_dataframe
+# -------------------------------------------------------------------------
+STATEMENTS.register('feedback_for_video', "SELECT * FROM feedback WHERE video_id = $1;")
 
 
-# -------------------------------------------------------------------------
 def get_feedback_for_video(video_id:int):
     """
     Using the video's video_id in our database, looks up and
@@ -71,20 +88,82 @@ def get_feedback_for_video(video_id:int):
         raise ValueError('Invalid video_id')
 
     # Get all feedback for the given video from our PostgreSQL DB:
-    pg_cursor.execute(f"SELECT * FROM feedback WHERE video_id={video_id};")
-    column_names = [column_name[0] for column_name in pg_cursor.description]
+    return _load_dataframe('feedback_for_video', video_id)
+
 
-    feedback_dataframe = pd.DataFrame(data=pg_cursor.fetchall(), columns=column_names)
+# -------------------------------------------------------------------------
+# Video, user and prompt info for videos, in one round-trip: only the
+# columns get_video_info returns, from 'videos' LEFT JOINed with 'users' and
+# 'prompts' (so a video is found even if its user or prompt is not). Each
+# S3 key's first video (lowest id) is used.
+VIDEO_INFO_COLUMNS = """
+    v.video_url, v.id AS video_id, v.title, v.created_at, v.updated_at,
+    v.owner_id, v.prompt_id,
+    u.id IS NOT NULL AS user_found, u.first_name, u.last_name, u.username,
+    p.id IS NOT NULL AS prompt_found, p.question"""
+VIDEO_INFO_TABLES = """
+    videos AS v
+    LEFT JOIN users AS u ON u.id = v.owner_id
+    LEFT JOIN prompts AS p ON p.id = v.prompt_id"""
+STATEMENTS.register('video_info', f"""
+    SELECT {VIDEO_INFO_COLUMNS}
+    FROM {VIDEO_INFO_TABLES}
+    WHERE v.video_url = $1
+    ORDER BY v.id
+    LIMIT 1;
+""")
+STATEMENTS.register('video_info_batch', f"""
+    SELECT DISTINCT ON (v.video_url) {VIDEO_INFO_COLUMNS}
+    FROM {VIDEO_INFO_TABLES}
+    WHERE v.video_url = ANY($1)
+    ORDER BY v.video_url, v.id;
+""")
+
+
+def _video_info_from_row(row:dict):
+    """
+    Builds get_video_info's dict from one row of the 'video_info' statement
+    (as a {column name: value} dict), or its empty dict if there is no row.
+    """
+    video_info = {'video': {},
+                  'prompt': {},
+                  'user': {}}
+    if row is None:
+        return video_info
+
+    # Video info:
+    s3_key = row['video_url']
+    video_info['video']['video_id'] = row['video_id']
+    video_info['video']['title'] = row['title']
+    video_info['video']['s3_key'] = s3_key
+    video_info['video']['s3_filename'] = s3_key.split('/')[-1]
+    video_info['video']['created_at'] = row['created_at']
+    video_info['video']['updated_at'] = row['updated_at']
+
+    video_info['user']['user_id'] = row['owner_id']
+    video_info['prompt']['prompt_id'] = row['prompt_id']
+
+    # User info (from DB table 'users'):
+    if row['user_found']:
+        first_name = row['first_name'].capitalize()
+        last_name = row['last_name'].capitalize()
+        video_info['user']['first_name'] = first_name
+        video_info['user']['last_name'] = last_name
+        video_info['user']['name'] = first_name + " " + last_name
+        video_info['user']['username'] = row['username']
+
+    # Prompt info (from DB table 'prompts'):
+    if row['prompt_found']:
+        video_info['prompt']['question'] = row['question']
 
-    return feedback_dataframe
+    return video_info
 
 
-# -------------------------------------------------------------------------
 def get_video_info(video_s3_key:str):
     """
     Using the video's S3 key, looks up info for that video, user and prompt
-    in our PostgreSQL database, and returns all info in a dictionary with
-    the following top-level keys:
+    in our PostgreSQL database (in one query), and returns all info in a
+    dictionary with the following top-level keys:
     {
         'video': {
             info for the video itself
@@ -102,66 +181,55 @@ def get_video_info(video_s3_key:str):
     if type(video_s3_key) is not str:
         raise ValueError('Invalid video_s3_key')
 
-    video_info = {'video': {},
-                  'prompt': {},
-                  'user': {}}
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, 'video_info', (video_s3_key,))
+        column_names = [column_name[0] for column_name in cursor.description]
+        row = cursor.fetchone()
 
-    # Lookup info for this video and user in our DB:
-
-    # From DB table: 'videos'
-    lookup_table_videos = lookup_in_videos_table(video_s3_key)
-    if lookup_table_videos != "No data for this key in this table.":
-        # Video info: Add video info to the video_info dict we will return:
-        video_info['video']['video_id'] = lookup_table_videos['id']
-        video_info['video']['title'] = lookup_table_videos['title']
-        s3_key = lookup_table_videos['video_url']
-        video_info['video']['s3_key'] = s3_key
-        video_info['video']['s3_filename'] = s3_key.split('/')[-1]
-        video_info['video']['created_at'] = lookup_table_videos['created_at']
-        video_info['video']['updated_at'] = lookup_table_videos['updated_at']
-
-        video_info['user']['user_id'] = lookup_table_videos['owner_id']
-        video_info['prompt']['prompt_id'] = lookup_table_videos['prompt_id']
-
-        # From DB table: 'users'
-        lookup_table_users = lookup_in_users_table(video_info['user']['user_id'])
-        if lookup_table_users != "No data for this key in this table.":
-            # User info: Add user info to the video_info dict we will return:
-            first_name = lookup_table_users['first_name'].capitalize()
-            last_name = lookup_table_users['last_name'].capitalize()
-            video_info['user']['first_name'] = first_name
-            video_info['user']['last_name'] = last_name
-            video_info['user']['name'] = first_name + " " + last_name
-            video_info['user']['username'] = lookup_table_users['username']
-
-        # From DB table: 'prompts'
-        lookup_table_prompts = lookup_in_prompts_table(video_info['prompt']['prompt_id'])
-        if lookup_table_prompts != "No data for this key in this table.":
-            # Prompt info: Add prompt/question info to the the video_info dict:
-            video_info['prompt']['question'] = lookup_table_prompts['question']
+    return _video_info_from_row(dict(zip(column_names, row)) if row is not None else None)
 
-    return video_info
+
+def get_video_info_batch(video_s3_keys):
+    """
+    Batch version of get_video_info: looks up info for many videos by their
+    S3 keys, in one query, and returns a dict of {S3 key: video info dict
+    (as from get_video_info)}, in the order of video_s3_keys (with empty
+    info for keys not in our DB).
+    """
+    video_s3_keys = list(video_s3_keys)
+    if any(type(video_s3_key) is not str for video_s3_key in video_s3_keys):
+        raise ValueError('Invalid video_s3_key')
+    if not video_s3_keys:
+        return {}
+
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, 'video_info_batch', (list(dict.fromkeys(video_s3_keys)),))
+        column_names = [column_name[0] for column_name in cursor.description]
+        rows = {row['video_url']: row for row in (dict(zip(column_names, values))
+                                                 for values in cursor.fetchall())}
+
+    return {video_s3_key: _video_info_from_row(rows.get(video_s3_key))
+            for video_s3_key in video_s3_keys}
 
 
 # -------------------------------------------------------------------------
+STATEMENTS.register('lookup_video', "SELECT * FROM videos WHERE video_url = $1;")
+STATEMENTS.register('lookup_user', "SELECT * FROM users WHERE id = $1;")
+STATEMENTS.register('lookup_prompt', "SELECT * FROM prompts WHERE id = $1;")
+
+
 def lookup_in_videos_table(video_s3_key):
     """
     Using an S3 key for a video (e.g., from a message in our SQS queue),
     get the info for this video from our DB table 'videos' and return it as a dict.
     """
 
-    pg_cursor.execute(f"SELECT * FROM videos WHERE video_url='{video_s3_key}';")
-    results = pg_cursor.fetchall()
+    results = _load_row('lookup_video', video_s3_key)
 
     # Check to make sure results are not empty (i.e., no data in this table):
-    if results == []:
+    if results is None:
         return "No data for this key in this table."
 
-    # If there is data for this user_id in this table, return it:
-    values = results[0]
-    column_names = [column_name[0] for column_name in pg_cursor.description]
-    results = dict(zip(column_names, values))
-
     return results
 
 
@@ -172,38 +240,113 @@ def lookup_in_users_table(user_id):
     get the info for this user from our DB table 'users' and return it as a dict.
     """
 
-    pg_cursor.execute(f"SELECT * FROM users WHERE id={user_id};")
-    results = pg_cursor.fetchall()
+    results = _load_row('lookup_user', user_id)
 
     # Check to make sure results are not empty (i.e., no data in this table):
-    if results == []:
+    if results is None:
         return "No data for this key in this table."
 
     # If there is data for this user_id in this table, return it:
-    values = results[0]
-    column_names = [column_name[0] for column_name in pg_cursor.description]
-    results = dict(zip(column_names, values))
-
     return results
 
 
 # -------------------------------------------------------------------------
 def lookup_in_prompts_table(prompt_id):
     """
-    Using a user_id in our TeamReel production DB (= owner_id in the 'users' table),
-    get the info for this user from our DB table 'users' and return it as a dict.
+    Using a prompt_id in our TeamReel production DB (= id in the 'prompts' table),
+    get the info for this prompt from our DB table 'prompts' and return it as a dict.
     """
 
-    pg_cursor.execute(f"SELECT * FROM prompts WHERE id={prompt_id};")
-    results = pg_cursor.fetchall()
+    results = _load_row('lookup_prompt', prompt_id)
 
     # Check to make sure results are not empty (i.e., no data in this table):
-    if results == []:
+    if results is None:
         return "No data for this key in this table."
 
-    # If there is data for this user_id in this table, return it:
-    values = results[0]
-    column_names = [column_name[0] for column_name in pg_cursor.description]
-    results = dict(zip(column_names, values))
-
+    # If there is data for this prompt_id in this table, return it:
     return results
+
+
+# -------------------------------------------------------------------------
+# Columns of our DB's 'videos_feedback' table that our video analysis
+# writes, one row per video (video_id has a unique constraint). Both upsert
+# statements are built from this one list:
+VIDEOS_FEEDBACK_COLUMNS = ('video_id',
+                           'overall_performance',
+                           'delivery_and_presentation',
+                           'response_quality',
+                           'audio_quality',
+                           'visual_environment',
+                           'attitude',
+                           'sentiment_visual',
+                           'sentiment_visual_details',
+                           'sentiment_audio',
+                           'sentiment_audio_details',
+                           'speaking_confidence',
+                           'speaking_volume',
+                           'speaking_vocabulary',
+                           'speaking_speed',
+                           'speaking_filler_words',
+                           'background_visual_environment',
+                           'background_noise',
+                           'appearance_facial_centering',
+                           'appearance_posture',
+                           'appearance_gesticulation',
+                           'human_overall_performance',
+                           'human_delivery_and_presentation',
+                           'human_response_quality',
+                           'human_audio_quality',
+                           'human_visual_environment')
+
+
+def _videos_feedback_upsert_query(values_sql:str):
+    """
+    Returns an INSERT ... ON CONFLICT (video_id) DO UPDATE statement for
+    VIDEOS_FEEDBACK_COLUMNS, with values_sql as its VALUES.
+    """
+    updates = ',\n        '.join(f"{column} = EXCLUDED.{column}"
+                                  for column in VIDEOS_FEEDBACK_COLUMNS if column != 'video_id')
+    return f"""
+    INSERT INTO videos_feedback ({', '.join(VIDEOS_FEEDBACK_COLUMNS)})
+    VALUES {values_sql}
+    ON CONFLICT (video_id) DO UPDATE SET
+        {updates};
+    """
+
+
+STATEMENTS.register('videos_feedback_upsert', _videos_feedback_upsert_query(
+    '(' + ', '.join(f"${number}" for number in range(1, len(VIDEOS_FEEDBACK_COLUMNS) + 1)) + ')'))
+VIDEOS_FEEDBACK_BULK_UPSERT = _videos_feedback_upsert_query('%s')
+
+
+def upsert_video_feedback(values:dict):
+    """
+    Adds a video's analysis to our DB's 'videos_feedback' table, or updates
+    its row if the video already has one, in one atomic statement (no race
+    between workers analyzing the same video). values is a dict with a
+    value for each of VIDEOS_FEEDBACK_COLUMNS.
+    """
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, 'videos_feedback_upsert',
+                           [values[column] for column in VIDEOS_FEEDBACK_COLUMNS])
+
+
+def upsert_videos_feedback_batch(rows, page_size:int=None):
+    """
+    Bulk version of upsert_video_feedback (e.g., for backfills and batched
+    workers): adds or updates many videos' analyses -- an iterable of dicts
+    like upsert_video_feedback's values -- with one multi-row statement per
+    page_size rows (default: all rows in one statement), in one
+    transaction. If a video_id is in rows more than once, its last row
+    wins. Returns the number of rows written.
+    """
+    rows_by_video_id = {}
+    for row in rows:
+        rows_by_video_id[row['video_id']] = tuple(row[column] for column in VIDEOS_FEEDBACK_COLUMNS)
+    if not rows_by_video_id:
+        return 0
+
+    with pg_cursor() as cursor:
+        execute_values(cursor, VIDEOS_FEEDBACK_BULK_UPSERT, list(rows_by_video_id.values()),
+                       page_size=page_size or len(rows_by_video_id))
+    return len(rows_by_video_id)
@@ -0,0 +1,343 @@
+#!python
+
+"""
+Module with a thread-safe connection pool for our TeamReel PostgreSQL DB,
+shared by every DB helper in this project (postgresql_db_functions.py and
+the videos_feedback writer in application.py), so threaded web workers and
+concurrent jobs each get their own connection instead of sharing one
+cursor:
+
+    with pg_cursor() as cursor:
+        cursor.execute("SELECT ... WHERE id = %s;", (user_id,))
+        rows = cursor.fetchall()
+
+A connection is checked out for the duration of the with block, committed
+on success (rolled back on error) and returned to the pool. The pool opens
+PG_POOL_MIN connections up front and more on demand, up to PG_POOL_MAX, and
+keeps every connection it opens (idle, for the next checkout) instead of
+closing it when it is returned, so busy workers don't reconnect on every
+query (and statements prepared on a connection, see
+prepared_statements.py, are reused). Callers wait (up to
+PG_POOL_CHECKOUT_TIMEOUT seconds) when all are in use. Connections that
+have been idle for a while are health-checked on checkout, and broken
+connections are discarded and replaced, so one dropped connection never
+takes the process down. Every connection has a statement timeout
+(PG_STATEMENT_TIMEOUT_MS); a statement that times out is rolled back, and
+its connection kept.
+"""
+
+# Import libraries we will use:
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import os
+import psycopg2
+from psycopg2.pool import PoolError
+import threading
+import time
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get access info from .env file:
+load_dotenv()
+
+# PostgreSQL DB info:
+PG_DB_HOST = os.getenv("PG_DB_HOST")
+PG_DB_PORT = os.getenv("PG_DB_PORT")
+PG_DB_NAME = os.getenv("PG_DB_NAME")
+PG_DB_USER = os.getenv("PG_DB_USER")
+PG_DB_PW = os.getenv("PG_DB_PW")
+PG_DB_URI = os.getenv("PG_DB_URI")
+
+# Pool size (connections opened up front / max open at once; all opened
+# connections are kept open), how long to wait for a free connection
+# (seconds), and the max run time of any statement (milliseconds; 0 = no
+# limit):
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", 1))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", 10))
+PG_POOL_CHECKOUT_TIMEOUT = float(os.getenv("PG_POOL_CHECKOUT_TIMEOUT", 30))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", 30000))
+
+# Check connections idle longer than this (seconds) with a 'SELECT 1'
+# before handing them out, and how many times to try (re)connecting:
+PG_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("PG_POOL_HEALTH_CHECK_SECONDS", 30))
+PG_CONNECT_ATTEMPTS = 3
+PG_CONNECT_TIMEOUT = 10
+
+# Errors that mean a connection is broken (not just a failed statement):
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# Errors that subclass OperationalError but only fail the statement (e.g.,
+# a statement timeout, a deadlock), leaving the connection usable once the
+# transaction is rolled back:
+STATEMENT_ERRORS = (psycopg2.extensions.QueryCanceledError,
+                    psycopg2.extensions.TransactionRollbackError)
+
+# This process's pool, created on first use (see get_pg_pool):
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------------
+class PostgreSQLPool:
+    """
+    Thread-safe pool of connections to our PostgreSQL DB, with blocking
+    checkout, health checks and reconnects. Returned connections are kept
+    on an idle list and reused (most recently used first), never closed
+    unless broken. (psycopg2's own pools close any connection returned
+    while min_connections are already idle, which would mean a new
+    connection for nearly every checkout under concurrent load.)
+
+        with pool.connection() as conn:   # or pool.cursor()
+            ...
+
+    Parameters:
+    min_connections, max_connections: Pool size (default: PG_POOL_MIN,
+    PG_POOL_MAX)
+    statement_timeout_ms: Statement timeout for every connection (default:
+    PG_STATEMENT_TIMEOUT_MS; 0 = no limit)
+    checkout_timeout: Max seconds to wait for a free connection (default:
+    PG_POOL_CHECKOUT_TIMEOUT)
+    connect_kwargs: Connection params for psycopg2.connect (default: our
+    DB, from the PG_DB_* env vars)
+    """
+
+    def __init__(self, min_connections:int=None, max_connections:int=None,
+                 statement_timeout_ms:int=None, checkout_timeout:float=None,
+                 **connect_kwargs):
+        self.min_connections = PG_POOL_MIN if min_connections is None else min_connections
+        self.max_connections = max_connections or PG_POOL_MAX
+        self.statement_timeout_ms = PG_STATEMENT_TIMEOUT_MS if statement_timeout_ms is None else statement_timeout_ms
+        self.checkout_timeout = PG_POOL_CHECKOUT_TIMEOUT if checkout_timeout is None else checkout_timeout
+
+        self.connect_kwargs = connect_kwargs or {'host': PG_DB_HOST,
+                                                 'port': PG_DB_PORT,
+                                                 'database': PG_DB_NAME,
+                                                 'user': PG_DB_USER,
+                                                 'password': PG_DB_PW}
+        self.connect_kwargs.setdefault('connect_timeout', PG_CONNECT_TIMEOUT)
+        if self.statement_timeout_ms:
+            self.connect_kwargs['options'] = (self.connect_kwargs.get('options', '')
+                                              + f" -c statement_timeout={self.statement_timeout_ms}").strip()
+
+        # Checkouts wait on this for one of max_connections to be free:
+        self._available = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []        # Idle connections, most recently used last
+        self._last_used = {}   # id(connection) -> when it was last returned, for open connections
+        self._n_open = 0
+        self._lock = threading.Lock()
+        self.n_checkouts = 0
+        self.n_connects = 0
+        self.n_reconnects = 0
+
+        for _ in range(self.min_connections):
+            self._idle.append(self._connect())
+
+    def _retry(self, connect):
+        """
+        Calls connect() up to PG_CONNECT_ATTEMPTS times, backing off between
+        attempts while the DB is unreachable.
+        """
+        for attempt in range(PG_CONNECT_ATTEMPTS):
+            try:
+                return connect()
+            except psycopg2.OperationalError:
+                if attempt == PG_CONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
+    def _connect(self):
+        """
+        Opens a new connection (retrying while the DB is unreachable).
+        """
+        conn = self._retry(lambda: psycopg2.connect(**self.connect_kwargs))
+        with self._lock:
+            self._n_open += 1
+            self.n_connects += 1
+            self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def _is_healthy(self, conn):
+        """
+        Returns whether a connection is open and, if it has been idle for
+        over PG_POOL_HEALTH_CHECK_SECONDS, answers a 'SELECT 1'.
+        """
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < PG_POOL_HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        """
+        Closes a connection and forgets it (the pool opens a new one when
+        needed).
+        """
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+            self._n_open -= 1
+        try:
+            conn.close()
+        except CONNECTION_ERRORS:
+            pass
+
+    def getconn(self):
+        """
+        Checks out a healthy connection, waiting up to checkout_timeout
+        seconds for one to be free (PoolError if none is), and replacing
+        broken connections. Return it with putconn.
+        """
+        if not self._available.acquire(timeout=self.checkout_timeout):
+            raise PoolError(f"No free DB connection after {self.checkout_timeout} seconds "
+                            f"({self.max_connections} in use)")
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    # No idle connection (and, with the semaphore acquired,
+                    # fewer than max_connections open): open one:
+                    conn = self._connect()
+                elif not self._is_healthy(conn):
+                    # Broken (e.g., the DB restarted): close it, and try
+                    # the next idle one (or a new one):
+                    self._discard(conn)
+                    with self._lock:
+                        self.n_reconnects += 1
+                    continue
+                with self._lock:
+                    self.n_checkouts += 1
+                return conn
+        except BaseException:
+            self._available.release()
+            raise
+
+    def putconn(self, conn, close:bool=False):
+        """
+        Returns a checked-out connection to the pool (closing it if close,
+        or if it is broken).
+        """
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                    self._idle.append(conn)
+        finally:
+            self._available.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager: checks out a connection for the with block, then
+        commits (or rolls back, on an error) and returns it to the pool.
+        Connections that broke during the block are closed and replaced.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except STATEMENT_ERRORS:
+            # (Checked before CONNECTION_ERRORS, which they subclass)
+            broken = not self._rollback(conn)
+            raise
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        except BaseException:
+            broken = not self._rollback(conn)
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def _rollback(self, conn):
+        """
+        Rolls back a connection's transaction after a failed statement, and
+        returns whether the connection is still usable.
+        """
+        if conn.closed:
+            return False
+        try:
+            conn.rollback()
+        except CONNECTION_ERRORS:
+            return False
+        return True
+
+    @contextmanager
+    def cursor(self):
+        """
+        Context manager: a cursor on a checked-out connection (see
+        connection), closed after the with block.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+
+    def stats(self):
+        """
+        Returns pool stats: size limits, open and idle connections, and
+        checkouts, connections opened and reconnects (broken connections
+        replaced) so far.
+        """
+        with self._lock:
+            return {'min_connections': self.min_connections,
+                    'max_connections': self.max_connections,
+                    'n_open': self._n_open,
+                    'n_idle': len(self._idle),
+                    'n_checkouts': self.n_checkouts,
+                    'n_connects': self.n_connects,
+                    'n_reconnects': self.n_reconnects}
+
+    def close(self):
+        """
+        Closes the pool's idle connections (checked-out connections are
+        closed when they are returned).
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+# -------------------------------------------------------------------------
+def get_pg_pool():
+    """
+    Returns this process's connection pool for our PostgreSQL DB, created
+    on the first call (and again in a forked child process, which must not
+    share its parent's connections).
+    """
+    global _pg_pool
+    with _pg_pool_lock:
+        if _pg_pool is None or _pg_pool[0] != os.getpid():
+            _pg_pool = (os.getpid(), PostgreSQLPool())
+        return _pg_pool[1]
+
+
+@contextmanager
+def pg_connection():
+    """
+    Context manager: a pooled connection to our PostgreSQL DB for the with
+    block (see PostgreSQLPool.connection).
+    """
+    with get_pg_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def pg_cursor():
+    """
+    Context manager: a cursor on a pooled connection to our PostgreSQL DB
+    for the with block (see PostgreSQLPool.cursor).
+    """
+    with get_pg_pool().cursor() as cursor:
+        yield cursor
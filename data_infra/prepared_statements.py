@@ -0,0 +1,162 @@
+#!python
+
+"""
+Module with a registry of named, parameterized SQL statements for our
+TeamReel PostgreSQL DB. Each statement is prepared (PREPARE) once per
+pooled connection, the first time it runs on that connection, and then
+executed by name (EXECUTE), so Postgres parses and plans it once instead
+of on every call, and values are always passed as parameters, never pasted
+into the SQL:
+
+    STATEMENTS.register('lookup_user', "SELECT * FROM users WHERE id = $1;")
+    ...
+    with pg_cursor() as cursor:
+        STATEMENTS.execute(cursor, 'lookup_user', (user_id,))
+        row = cursor.fetchone()
+
+Statements use Postgres' $1, $2, ... parameters. The registry keeps call
+counts and latency per statement (see StatementRegistry.stats). Set
+PG_PREPARED_STATEMENTS=false (e.g., behind a connection pooler in
+transaction mode, where session-level prepared statements don't work) to
+run the same statements as plain parameterized queries instead.
+"""
+
+# Import libraries we will use:
+from dotenv import load_dotenv
+import os
+import re
+import threading
+import time
+import weakref
+
+
+# -------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# Prepare statements on each connection (true), or run them as plain
+# parameterized queries (false):
+PG_PREPARED_STATEMENTS = os.getenv("PG_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes")
+
+_PARAMETER = re.compile(r'\$(\d+)')
+_STATEMENT_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+# -------------------------------------------------------------------------
+class PreparedStatement:
+    """
+    One named statement in a StatementRegistry, with its call stats.
+
+    Parameters:
+    name: Statement name (lowercase letters, digits and underscores)
+    sql: The statement, with $1, $2, ... parameters
+    """
+
+    def __init__(self, name:str, sql:str):
+        if not _STATEMENT_NAME.match(name):
+            raise ValueError(f"Invalid statement name: {name}")
+        self.name = name
+        self.sql = sql.strip().rstrip(';')
+
+        # Parameter numbers in the order they appear, for the plain
+        # (not prepared) query version, which uses psycopg2's %s parameters:
+        self.parameter_order = [int(number) - 1 for number in _PARAMETER.findall(self.sql)]
+        self.n_params = max(self.parameter_order) + 1 if self.parameter_order else 0
+        self.plain_sql = _PARAMETER.sub('%s', self.sql.replace('%', '%%'))
+        self.execute_sql = (f"EXECUTE {name} (" + ', '.join(['%s'] * self.n_params) + ")"
+                            if self.n_params else f"EXECUTE {name}")
+
+        self.n_calls = 0
+        self.n_prepares = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class StatementRegistry:
+    """
+    Registry of named, parameterized statements (see module docstring):
+    register them once (e.g., at import), then execute them by name on any
+    cursor. Thread-safe.
+
+    Parameters:
+    prepare: Prepare statements on each connection (default:
+    PG_PREPARED_STATEMENTS), or run them as plain parameterized queries
+    """
+
+    def __init__(self, prepare:bool=None):
+        self.prepare = PG_PREPARED_STATEMENTS if prepare is None else prepare
+        self._statements = {}
+        # Names of the statements prepared on each connection (forgotten
+        # with the connection, e.g. when the pool replaces a broken one):
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def register(self, name:str, sql:str):
+        """
+        Registers a statement (sql, with $1, $2, ... parameters) under name,
+        and returns the name.
+        """
+        with self._lock:
+            if name in self._statements and self._statements[name].sql != sql.strip().rstrip(';'):
+                raise ValueError(f"Statement already registered with different SQL: {name}")
+            self._statements.setdefault(name, PreparedStatement(name, sql))
+        return name
+
+    def _prepare(self, cursor, statement:PreparedStatement):
+        """
+        Prepares statement on the cursor's connection, if it is not yet.
+        """
+        connection = cursor.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(connection, set())
+            if statement.name in prepared:
+                return
+        cursor.execute(f"PREPARE {statement.name} AS {statement.sql}")
+        with self._lock:
+            prepared.add(statement.name)
+            statement.n_prepares += 1
+
+    def execute(self, cursor, name:str, params=()):
+        """
+        Executes the statement registered under name on cursor, with params
+        (a sequence, for $1, $2, ...); fetch results from the cursor as
+        usual.
+        """
+        statement = self._statements[name]
+        params = tuple(params)
+        if len(params) != statement.n_params:
+            raise ValueError(f"Statement {name} takes {statement.n_params} parameters, got {len(params)}")
+
+        start = time.perf_counter()
+        if self.prepare:
+            self._prepare(cursor, statement)
+            cursor.execute(statement.execute_sql, params)
+        else:
+            cursor.execute(statement.plain_sql, [params[i] for i in statement.parameter_order])
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            statement.n_calls += 1
+            statement.total_seconds += elapsed
+            statement.max_seconds = max(statement.max_seconds, elapsed)
+
+    def stats(self):
+        """
+        Returns {statement name: {'calls', 'prepares' (connections it was
+        prepared on), 'total_ms', 'mean_ms', 'max_ms'}}, for every
+        registered statement.
+        """
+        with self._lock:
+            return {name: {'calls': statement.n_calls,
+                           'prepares': statement.n_prepares,
+                           'total_ms': statement.total_seconds * 1000,
+                           'mean_ms': (statement.total_seconds * 1000 / statement.n_calls
+                                       if statement.n_calls else None),
+                           'max_ms': statement.max_seconds * 1000}
+                    for name, statement in self._statements.items()}
+
+
+# Our registry, shared by all data_infra modules:
+STATEMENTS = StatementRegistry()
@@ -1,5 +1,23 @@
 """
-[?? To add description ??]
+Module with functions for facial alignment and centering analysis of
+TeamReel videos: finds the speaker's face (dlib HOG face detector and
+68-point facial landmarks predictor) in frames sampled from the video,
+checks whether it is inside the target (central) region of the frame and
+upright, and scores facial centering from 1-5 for the
+'appearance_facial_centering' column of our DB's videos_feedback table:
+
+ 5: face centered for more than 90% of the video
+ 4: face centered for 80 - 90% of the video
+ 3: face centered for 70 - 80% of the video
+ 2: face centered for 60 - 70% of the video
+ 1: face centered for less than 60% of the video
+
+Runs headless (no windows), so it can run on our servers. By default it
+detects the face with the (expensive) HOG detector only on keyframes, on a
+downscaled frame, and follows it between keyframes with dlib's (cheap)
+correlation tracker; see FaceFinder and benchmark_face_tracking. Each
+face's landmarks are converted once to a NumPy array, and centering stats
+are computed for all frames of a video at once (see landmark_geometry.py).
 """
 
 
@@ -7,87 +25,543 @@
 # Import libraries/modules/functions we will use:
 
 # External (third-party) libraries:
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import cv2
+from dotenv import load_dotenv
 import numpy as np
 import dlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# Internal for our project:
+from .facial_settings import FACE_DETECTION_SCALE, FACE_KEYFRAME_INTERVAL, FACE_TRACKING
+from .facial_settings import FACIAL_SAMPLE_FPS, FACIAL_WORKERS, SHAPE_PREDICTOR_PATH
+from .video_functions import get_video_properties
+from .landmark_geometry import get_landmark_geometry, landmarks_to_array, stack_landmarks
+from .video_functions import iter_video_frames, run_on_video_segments
+from .visual_emotion import align_face_crop
 
 # video_filename = 'ALPACAVID-r7tjBJgdj.mp4'
 
 
 # ----------------------------------------------------------------------------
-def get_facial_alignment(video_filename:str):
-    vid = cv2.VideoCapture(video_filename)
-
-    if not cap.isOpened():
-        print(f"Error: Cannot open video file {video_filename}.")
-        exit()
-
-    # Load pre-trained dlib facial landmarks detector from pre-trained model:
-    detector = dlib.get_frontal_face_detector()
-
-    # Initialize facial landmarks predictor using the above model:
-    predictor = dlib.shape_predictor("./models/dlib_shape_predictor_68_face_landmarks.dat")
-
-    # Get video frames:
-    total_frames = vid.get(cv2.CAP_PROP_FRAME_COUNT)
-    frame_width = vid.get(cv2.CAP_PROP_FRAME_WIDTH)
-    frame_height = vid.get(cv2.CAP_PROP_FRAME_HEIGHT)
-    print(f"Frame width x height: {frame_width} x {frame_height}")
-
-    # Analyze each frame in the video: get facial landmarks -> determine facial
-    # alignment:
-    while True:
-        returned, frame = vid.read()
-
-        if not returned:
-            print("Video stream has ended (cannot receive next frame). Exiting.")
-            break
-
-        # # Resize the frame to a smaller size:
-        # frame = cv2.resize(frame,
-        #                   None,
-        #                   fx = 0.80,
-        #                   fy = 0.80,
-        #                   interpolation = cv2.INTER_AREA)
-
-        # Convert frame to grayscale for optimal processing:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        for face in faces:
-            # The face landmarks code begins from here
-            x1 = face.left()
-            y1 = face.top()
-            w = face.right()
-            h = face.bottom()
-            # Then we can also do
-            # cv2.rectangle function (frame, (x1, y1), (x2, y2), (0, 255, 0), 3)
-            cv2.rectangle(frame, (x1, y1), (w, h), (0, 255, 0), 3)
-            cv2.rectangle(frame,
-                          (int(0.25*frame_width), int(0.15*frame_height)),
-                          (int(frame_width - 0.25*frame_width), int(frame_height - 0.15*frame_height)),
-                          (0, 0, 255),
-                          3)
-
-            landmarks = predictor(gray, face)
-            # We are then accesing the landmark points
-            for n in range(0, 68):
-                x = landmarks.part(n).x
-                y = landmarks.part(n).y
-                cv2.circle(frame, (x, y), 2, (255, 255, 0), -1)
-
-        cv2.imshow("Frame", frame)
-
-        # # Use the 'esc' key to terminate:
-        # key = cv2.waitKey(1)
-        # if key == 27:
-        #     break # press esc the frame is destroyed
-
-        # Use the "q" key as the quit command:
-        # waitKey(0 or <= 0): waits for a key event infinitely
-        # waitKey(x:int): waits for a key event for x milliseconds (when x > 0)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    # Release the video capture object & close OpenCV windows:
-    vid.release()
-    cv2.destroyAllWindows()
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# (Model files, FACIAL_SAMPLE_FPS, the frames analyzed per second of video,
+# and FACIAL_WORKERS, the number of worker processes analyzing segments of
+# a video in parallel, are set in facial_settings.py.)
+
+# Target (central) region of the frame: the frame minus 25% of its width on
+# the left and right and 15% of its height at the top and bottom:
+TARGET_MARGIN_X = 0.25
+TARGET_MARGIN_Y = 0.15
+
+# Detect-then-track (FACE_TRACKING, FACE_DETECTION_SCALE and
+# FACE_KEYFRAME_INTERVAL are set in facial_settings.py): also run the face
+# detector when the tracker's confidence drops below this:
+FACE_TRACKER_MIN_CONFIDENCE = 7.0
+
+# Face is upright if the nose bridge (landmarks 27 -> 30) is within this
+# many degrees of vertical:
+MAX_TILT_DEGREES = 15
+
+# Score thresholds (score: min share of sampled frames with face centered),
+# checked from best to worst:
+CENTERING_SCORE_THRESHOLDS = [(5, 0.90), (4, 0.80), (3, 0.70), (2, 0.60)]
+
+# dlib face detector and landmarks predictor, loaded once per process on
+# first use (see get_face_models):
+_face_models = None
+_face_models_lock = threading.Lock()
+
+# Worker process pools for segment-parallel analysis (one per pool size),
+# created on first use and reused across videos, so each worker loads the
+# dlib models only once:
+_segment_pools = {}
+_segment_pools_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------------------
+def get_face_models():
+    """
+    Returns the (face detector, 68-point facial landmarks predictor) dlib
+    models, loading them on the first call.
+    """
+    global _face_models
+    with _face_models_lock:
+        if _face_models is None:
+            if not os.path.exists(SHAPE_PREDICTOR_PATH):
+                raise FileNotFoundError(f"dlib facial landmarks model not found: {SHAPE_PREDICTOR_PATH}")
+
+            # Load pre-trained dlib facial landmarks detector from pre-trained model:
+            detector = dlib.get_frontal_face_detector()
+
+            # Initialize facial landmarks predictor using the above model:
+            predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
+            _face_models = (detector, predictor)
+    return _face_models
+
+
+def get_target_rectangle(frame_width:int, frame_height:int):
+    """
+    Returns the target (central) region of a frame as (left, top, right,
+    bottom) pixel coordinates.
+    """
+    return (int(TARGET_MARGIN_X * frame_width),
+            int(TARGET_MARGIN_Y * frame_height),
+            int(frame_width - TARGET_MARGIN_X * frame_width),
+            int(frame_height - TARGET_MARGIN_Y * frame_height))
+
+
+# ----------------------------------------------------------------------------
+def detect_face(gray, detector, scale:float=1.0):
+    """
+    Runs the face detector on a grayscale frame downscaled by scale (faster
+    for scale < 1) and returns the largest face as a dlib rectangle in
+    full-resolution coordinates, or None if there is no face.
+    """
+    if scale != 1.0:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    faces = detector(small)
+    if len(faces) == 0:
+        return None
+
+    face = max(faces, key=lambda face: face.area())
+    if scale == 1.0:
+        return face
+    return dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                          int(face.right() / scale), int(face.bottom() / scale))
+
+
+class FaceFinder:
+    """
+    Finds the speaker's face in consecutive (sampled) frames of one video.
+
+    With tracking (default: FACE_TRACKING), the face detector runs only on
+    keyframes -- the first frame, every keyframe_interval-th frame after
+    the last detection, and whenever the tracker's confidence drops below
+    FACE_TRACKER_MIN_CONFIDENCE or there is no face to track -- and a dlib
+    correlation tracker follows the face box in between. Without tracking,
+    the detector runs on every frame.
+
+    Parameters:
+    detector: dlib face detector (see get_face_models)
+    tracking: Detect-then-track (True) or detect on every frame (False)
+    detection_scale: Downscale frames by this before detection (default:
+    FACE_DETECTION_SCALE)
+    keyframe_interval: Max frames between detections (default:
+    FACE_KEYFRAME_INTERVAL)
+    """
+
+    def __init__(self, detector, tracking:bool=None, detection_scale:float=None,
+                 keyframe_interval:int=None):
+        self.detector = detector
+        self.tracking = FACE_TRACKING if tracking is None else tracking
+        self.detection_scale = detection_scale or FACE_DETECTION_SCALE
+        self.keyframe_interval = keyframe_interval or FACE_KEYFRAME_INTERVAL
+        self._tracker = None
+        self._frames_since_detection = 0
+        self.n_detections = 0
+
+    def _detect(self, gray):
+        self.n_detections += 1
+        self._frames_since_detection = 0
+        face = detect_face(gray, self.detector, scale=self.detection_scale)
+
+        if self.tracking and face is not None:
+            self._tracker = dlib.correlation_tracker()
+            self._tracker.start_track(gray, face)
+        else:
+            self._tracker = None
+        return face
+
+    def find(self, gray):
+        """
+        Returns the face in the next frame (grayscale) as a dlib rectangle,
+        or None if there is no face.
+        """
+        if not self.tracking or self._tracker is None or self._frames_since_detection >= self.keyframe_interval:
+            return self._detect(gray)
+
+        confidence = self._tracker.update(gray)
+        if confidence < FACE_TRACKER_MIN_CONFIDENCE:
+            return self._detect(gray)
+
+        self._frames_since_detection += 1
+        position = self._tracker.get_position()
+        return dlib.rectangle(int(position.left()), int(position.top()),
+                              int(position.right()), int(position.bottom()))
+
+
+# ----------------------------------------------------------------------------
+def find_face_landmarks(gray, models=None, face_finder:FaceFinder=None):
+    """
+    Finds the speaker's face (the largest face) in a grayscale frame -- with
+    face_finder, if given (e.g., to track the face across frames), else
+    with the detector -- and returns (box, landmarks): the face box as a
+    (left, top, right, bottom) float32 array and its 68 facial landmarks as
+    a (68, 2) float32 array, or (None, None) if there is no face.
+    """
+    detector, predictor = models or get_face_models()
+
+    if face_finder is not None:
+        face = face_finder.find(gray)
+    else:
+        face = detect_face(gray, detector)
+    if face is None:
+        return None, None
+
+    box = np.array([face.left(), face.top(), face.right(), face.bottom()], dtype=np.float32)
+    return box, landmarks_to_array(predictor(gray, face))
+
+
+def analyze_faces(boxes, landmarks, frame_width:int, frame_height:int):
+    """
+    Returns centering stats for faces -- face boxes of shape (..., 4) and
+    landmarks of shape (..., 68, 2), for one frame or all frames of a video
+    (NaN for frames without a face) -- as a dict of arrays, computed for all
+    frames at once: the landmark geometry (see get_landmark_geometry), plus
+
+    inside_target: Face box is inside the target rectangle
+    upright: Nose bridge tilt is within MAX_TILT_DEGREES of vertical
+    centered: inside_target and upright
+    """
+    boxes = np.asarray(boxes, dtype=np.float32)
+    stats = get_landmark_geometry(landmarks, boxes, frame_width, frame_height)
+
+    target_left, target_top, target_right, target_bottom = get_target_rectangle(frame_width, frame_height)
+    with np.errstate(invalid='ignore'):
+        inside_target = (stats['face_found']
+                         & (boxes[..., 0] >= target_left) & (boxes[..., 1] >= target_top)
+                         & (boxes[..., 2] <= target_right) & (boxes[..., 3] <= target_bottom))
+        upright = np.abs(stats['tilt_degrees']) <= MAX_TILT_DEGREES
+
+    stats['inside_target'] = inside_target
+    stats['upright'] = upright
+    stats['centered'] = inside_target & upright
+    return stats
+
+
+def analyze_frame(gray, models=None, face_finder:FaceFinder=None):
+    """
+    Analyzes one grayscale frame (e.g., for demos): finds the speaker's face
+    (see find_face_landmarks) and returns its centering stats (see
+    analyze_faces) as plain values, with the face 'box' and its 'landmarks'
+    ((68, 2) array), or {'face_found': False, 'centered': False} if there is
+    no face.
+    """
+    box, landmarks = find_face_landmarks(gray, models, face_finder)
+    if box is None:
+        return {'face_found': False, 'centered': False}
+
+    frame_height, frame_width = gray.shape[:2]
+    stats = analyze_faces(box, landmarks, frame_width, frame_height)
+    return {**{key: value.item() for key, value in stats.items()},
+            'box': [int(value) for value in box],
+            'landmarks': landmarks}
+
+
+def get_centering_score(centered_ratio:float):
+    """
+    Translates the share of frames with the face centered to a score from
+    1-5.
+    """
+    for score, min_ratio in CENTERING_SCORE_THRESHOLDS:
+        if centered_ratio > min_ratio:
+            return score
+    return 1
+
+
+def summarize_facial_centering(face_stats:dict):
+    """
+    Summarizes per-frame stats (arrays from analyze_faces) into centering
+    results for a video: score (1-5, or 0 -- "not set" in our DB -- without
+    frames), share of frames with the face centered, found, inside the
+    target region and upright, mean absolute eye line tilt and yaw and mean
+    face height (over frames with a face; None without any), and the number
+    of frames analyzed.
+    """
+    n_frames = len(face_stats['centered'])
+    if n_frames == 0:
+        return {'score': 0, 'centered_ratio': None, 'face_found_ratio': None,
+                'inside_target_ratio': None, 'upright_ratio': None,
+                'mean_abs_eye_line_degrees': None, 'mean_abs_yaw': None,
+                'mean_face_height': None, 'n_frames': 0}
+
+    face_found = face_stats['face_found']
+
+    def ratio(key):
+        return float(np.mean(face_stats[key]))
+
+    def face_mean(values):
+        values = values[face_found & np.isfinite(values)]
+        return float(np.mean(values)) if len(values) else None
+
+    centered_ratio = ratio('centered')
+    return {'score': get_centering_score(centered_ratio),
+            'centered_ratio': centered_ratio,
+            'face_found_ratio': ratio('face_found'),
+            'inside_target_ratio': ratio('inside_target'),
+            'upright_ratio': ratio('upright'),
+            'mean_abs_eye_line_degrees': face_mean(np.abs(face_stats['eye_line_degrees'])),
+            'mean_abs_yaw': face_mean(np.abs(face_stats['yaw'])),
+            'mean_face_height': face_mean(face_stats['face_height']),
+            'n_frames': n_frames}
+
+
+# ----------------------------------------------------------------------------
+def get_segment_pool(n_workers:int):
+    """
+    Returns a pool of n_workers worker processes for analyze_video_segment
+    (created on the first call), whose workers load the dlib models once,
+    when they start.
+    """
+    with _segment_pools_lock:
+        if n_workers not in _segment_pools:
+            # 'spawn' (not fork), so workers don't inherit our threads and
+            # locks (e.g., from the Flask app):
+            _segment_pools[n_workers] = ProcessPoolExecutor(max_workers=n_workers,
+                                                            mp_context=multiprocessing.get_context('spawn'),
+                                                            initializer=get_face_models)
+        return _segment_pools[n_workers]
+
+
+def drop_segment_pool(n_workers:int, pool:ProcessPoolExecutor):
+    """
+    Drops a (broken) pool of n_workers worker processes, so the next
+    get_segment_pool call creates a new one. Only drops it if it is still
+    the current pool (another thread may already have replaced it).
+    """
+    with _segment_pools_lock:
+        if _segment_pools.get(n_workers) is pool:
+            del _segment_pools[n_workers]
+    pool.shutdown(wait=False)
+
+
+def analyze_video_segment(video_filename:str, start_frame:int, end_frame:int,
+                          stride:int, tracking:bool=None,
+                          detection_scale:float=None, face_crop_size:int=None):
+    """
+    Finds the face in every stride-th frame of one segment of a video (from
+    start_frame up to end_frame) and returns compact per-frame arrays:
+    'frame_index', 'timestamp' (seconds), 'boxes' ((frames, 4)) and
+    'landmarks' ((frames, 68, 2)), NaN for frames without a face, plus the
+    'frame_size' (width, height) and 'n_detections' (number of face detector
+    runs). With face_crop_size, also returns 'face_crops': an aligned
+    face_crop_size x face_crop_size crop of each face found (see
+    align_face_crop), as one (faces, size, size) uint8 array. Runs in a
+    worker process for segment-parallel analysis (see get_facial_alignment).
+    """
+    models = get_face_models()
+    face_finder = FaceFinder(detector=models[0], tracking=tracking,
+                             detection_scale=detection_scale)
+
+    frame_indexes, timestamps, boxes, face_landmarks, face_crops = [], [], [], [], []
+    frame_size = None
+    # Grayscale frames for optimal processing, streamed in memory:
+    for frame in iter_video_frames(video_filename, stride=stride,
+                                   start_frame=start_frame, end_frame=end_frame,
+                                   grayscale=True):
+        frame_size = (frame.image.shape[1], frame.image.shape[0])
+        box, landmarks = find_face_landmarks(frame.image, models, face_finder)
+        frame_indexes.append(frame.index)
+        timestamps.append(frame.timestamp)
+        boxes.append(box if box is not None else np.full(4, np.nan, dtype=np.float32))
+        face_landmarks.append(landmarks)
+        if face_crop_size and box is not None:
+            face_crops.append(align_face_crop(frame.image, box, landmarks, size=face_crop_size))
+
+    results = {'frame_index': np.array(frame_indexes, dtype=np.int64),
+               'timestamp': np.array(timestamps, dtype=np.float64),
+               'boxes': np.array(boxes, dtype=np.float32).reshape(-1, 4),
+               'landmarks': stack_landmarks(face_landmarks),
+               'frame_size': frame_size,
+               'n_detections': face_finder.n_detections}
+    if face_crop_size:
+        results['face_crops'] = np.array(face_crops, dtype=np.uint8).reshape(-1, face_crop_size, face_crop_size)
+    return results
+
+
+def get_facial_alignment(video_filename:str, sample_fps:float=None,
+                         tracking:bool=None, detection_scale:float=None,
+                         n_workers:int=None, face_crop_size:int=None):
+    """
+    Analyzes facial alignment and centering in a video, headless: samples
+    frames at sample_fps (default: FACIAL_SAMPLE_FPS), finds the speaker's
+    face (see FaceFinder for tracking and detection_scale) and landmarks in
+    each, and returns the centering summary (see
+    summarize_facial_centering), with the number of face detector runs
+    under 'n_detections' and per-frame arrays under 'frames': frame_index,
+    timestamp (seconds), boxes ((frames, 4)), landmarks ((frames, 68, 2)
+    float32) and the analyze_faces stats, all computed for the whole video
+    at once. With face_crop_size, 'frames' also has 'face_crops': aligned
+    crops of the faces found, for visual emotion recognition (see
+    analyze_video_segment).
+
+    With n_workers > 1 (default: FACIAL_WORKERS), the video is split into
+    time segments that are analyzed in parallel by a pool of worker
+    processes, and their results are merged in order.
+    """
+    sample_fps = sample_fps or FACIAL_SAMPLE_FPS
+    n_workers = n_workers or FACIAL_WORKERS
+
+    # Fail fast on a missing model file (the models themselves are loaded
+    # where the segments are analyzed: in the worker processes, or in this
+    # process for one segment):
+    if not os.path.exists(SHAPE_PREDICTOR_PATH):
+        raise FileNotFoundError(f"dlib facial landmarks model not found: {SHAPE_PREDICTOR_PATH}")
+
+    properties = get_video_properties(video_filename)
+    stride = max(1, int(round(properties['fps'] / sample_fps)))
+
+    def run_segments(executor=None):
+        return run_on_video_segments(video_filename, analyze_video_segment,
+                                     n_workers=n_workers,
+                                     stride=stride,
+                                     executor=executor,
+                                     tracking=tracking,
+                                     detection_scale=detection_scale,
+                                     face_crop_size=face_crop_size)
+
+    if n_workers > 1:
+        pool = get_segment_pool(n_workers)
+        try:
+            segment_results = run_segments(pool)
+        except BrokenProcessPool:
+            # A worker process died (e.g., killed for running out of
+            # memory), which breaks the whole pool for good: replace it
+            # and try once more:
+            print("Facial analysis worker pool broke -> retrying on a new pool.")
+            drop_segment_pool(n_workers, pool)
+            pool = get_segment_pool(n_workers)
+            try:
+                segment_results = run_segments(pool)
+            except BrokenProcessPool:
+                drop_segment_pool(n_workers, pool)
+                raise
+    else:
+        segment_results = run_segments()
+
+    frame_width, frame_height = next((segment['frame_size'] for segment in segment_results
+                                      if segment['frame_size']),
+                                     (properties['width'], properties['height']))
+    frames = {key: np.concatenate([segment[key] for segment in segment_results])
+              for key in ('frame_index', 'timestamp', 'boxes', 'landmarks')}
+    if face_crop_size:
+        frames['face_crops'] = np.concatenate([segment['face_crops'] for segment in segment_results])
+    frames.update(analyze_faces(frames['boxes'], frames['landmarks'], frame_width, frame_height))
+
+    results = summarize_facial_centering(frames)
+    results['n_detections'] = sum(segment['n_detections'] for segment in segment_results)
+    results['frames'] = frames
+    return results
+
+
+def _box_iou(boxes_a, boxes_b):
+    """
+    Intersection over union of pairs of (left, top, right, bottom) boxes,
+    for arrays of boxes of shape (..., 4).
+    """
+    width = np.maximum(0, np.minimum(boxes_a[..., 2], boxes_b[..., 2]) - np.maximum(boxes_a[..., 0], boxes_b[..., 0]))
+    height = np.maximum(0, np.minimum(boxes_a[..., 3], boxes_b[..., 3]) - np.maximum(boxes_a[..., 1], boxes_b[..., 1]))
+    intersection = width * height
+    area_a = (boxes_a[..., 2] - boxes_a[..., 0]) * (boxes_a[..., 3] - boxes_a[..., 1])
+    area_b = (boxes_b[..., 2] - boxes_b[..., 0]) * (boxes_b[..., 3] - boxes_b[..., 1])
+    union = area_a + area_b - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def benchmark_face_tracking(video_filename:str, sample_fps:float=None,
+                            n_workers:int=1):
+    """
+    Compares detect-then-track (with downscaled detection) against the
+    baseline (full-resolution detection on every analyzed frame) on one
+    video: analyzed frames per second for each, speedup, whether the
+    centering scores agree, the share of frames with the same centered
+    decision, and the mean face box IoU on frames where both found a face.
+    Both run with n_workers processes (default: 1, so frames per second are
+    per CPU core).
+    """
+    get_face_models()
+    runs = {}
+    for name, options in (('baseline', {'tracking': False, 'detection_scale': 1.0}),
+                          ('tracking', {'tracking': True})):
+        start = time.perf_counter()
+        results = get_facial_alignment(video_filename, sample_fps=sample_fps,
+                                       n_workers=n_workers, **options)
+        elapsed = time.perf_counter() - start
+        runs[name] = (results, elapsed)
+
+    baseline, baseline_seconds = runs['baseline']
+    tracking, tracking_seconds = runs['tracking']
+    both_found = baseline['frames']['face_found'] & tracking['frames']['face_found']
+    ious = _box_iou(baseline['frames']['boxes'][both_found], tracking['frames']['boxes'][both_found])
+    n_frames = baseline['n_frames']
+
+    return {'n_frames': n_frames,
+            'baseline_fps': baseline['n_frames'] / baseline_seconds if baseline_seconds else None,
+            'tracking_fps': tracking['n_frames'] / tracking_seconds if tracking_seconds else None,
+            'speedup': baseline_seconds / tracking_seconds if tracking_seconds else None,
+            'baseline_detections': baseline['n_detections'],
+            'tracking_detections': tracking['n_detections'],
+            'baseline_score': baseline['score'],
+            'tracking_score': tracking['score'],
+            'score_agreement': baseline['score'] == tracking['score'],
+            'centered_agreement': (float(np.mean(baseline['frames']['centered'] == tracking['frames']['centered']))
+                                   if n_frames else None),
+            'mean_box_iou': float(np.mean(ious)) if len(ious) else None}
+
+
+# ----------------------------------------------------------------------------
+def draw_facial_alignment(frame, frame_stats:dict, landmarks=None):
+    """
+    Draws one frame's analysis on it, for debugging/demos: the face box
+    (green), the target rectangle (red) and the facial landmarks (a (68, 2)
+    array, if given).
+    """
+    frame_height, frame_width = frame.shape[:2]
+    target_left, target_top, target_right, target_bottom = get_target_rectangle(frame_width, frame_height)
+    cv2.rectangle(frame, (target_left, target_top), (target_right, target_bottom), (0, 0, 255), 3)
+
+    if frame_stats.get('face_found'):
+        left, top, right, bottom = [int(value) for value in frame_stats['box']]
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 3)
+    if landmarks is not None:
+        for x, y in np.round(landmarks).astype(int):
+            cv2.circle(frame, (int(x), int(y)), 2, (255, 255, 0), -1)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Facial centering analysis of a video.')
+    parser.add_argument('video_filename', help='Video file to analyze')
+    parser.add_argument('--sample-fps', type=float, default=None,
+                        help='Frames analyzed per second of video')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: FACIAL_WORKERS; 1 for --benchmark)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare detect-then-track against detecting on every frame')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark_face_tracking(args.video_filename, sample_fps=args.sample_fps,
+                                                 n_workers=args.workers or 1)))
+    else:
+        results = get_facial_alignment(args.video_filename, sample_fps=args.sample_fps,
+                                       n_workers=args.workers)
+        results.pop('frames')
+        print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
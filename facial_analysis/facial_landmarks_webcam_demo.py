@@ -52,11 +52,11 @@ while True:
                       3)
 
         landmarks = predictor(gray, face)
-        # We are then accesing the landmark points
-        for n in range(0, 68):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            cv2.circle(frame, (x, y), 2, (255, 255, 0), -1)
+        # We are then accesing the landmark points, converted once to a
+        # (68, 2) array:
+        points = np.array([(point.x, point.y) for point in landmarks.parts()], dtype=np.int32)
+        for x, y in points:
+            cv2.circle(frame, (int(x), int(y)), 2, (255, 255, 0), -1)
     cv2.imshow("Frame", frame)
 
     # # Use 'esc' key to terminate:
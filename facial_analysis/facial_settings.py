@@ -0,0 +1,48 @@
+"""
+Module with the settings of our facial analysis (model files and the
+env var settings that change its results), kept free of OpenCV and dlib so
+they can be read without loading those (e.g., by application.py, for the
+analysis cache version, even on workers without OpenCV or dlib).
+"""
+
+
+# ----------------------------------------------------------------------------
+# Import libraries/modules/functions we will use:
+
+# External (third-party) libraries:
+from dotenv import load_dotenv
+import os
+
+
+# ----------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# File path for models: the repo's 'models' folder (or MODELS_PATH env var):
+MODELS_PATH = os.getenv("MODELS_PATH",
+                        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'models', ''))
+SHAPE_PREDICTOR_PATH = os.getenv("DLIB_SHAPE_PREDICTOR",
+                                 MODELS_PATH + 'dlib_shape_predictor_68_face_landmarks.dat')
+EMOTION_MODEL_PATH = os.getenv("EMOTION_MODEL", MODELS_PATH + 'emotion_ferplus.onnx')
+
+# Frames analyzed per second of video (the rest are skipped):
+FACIAL_SAMPLE_FPS = float(os.getenv("FACIAL_SAMPLE_FPS", 2))
+
+# Detect-then-track: run the face detector on frames downscaled by
+# FACE_DETECTION_SCALE, only every FACE_KEYFRAME_INTERVAL analyzed frames
+# (or when the tracker loses the face; see facial_alignment.FaceFinder),
+# and track the face between keyframes:
+FACE_TRACKING = os.getenv("FACE_TRACKING", "true").lower() in ("1", "true", "yes")
+FACE_DETECTION_SCALE = float(os.getenv("FACE_DETECTION_SCALE", 0.5))
+FACE_KEYFRAME_INTERVAL = int(os.getenv("FACE_KEYFRAME_INTERVAL", 10))
+
+# Number of worker processes analyzing segments of a video in parallel
+# (1 = no worker processes). Every web server worker process (e.g., each
+# gunicorn worker) keeps its own pool, each worker holding its own copy of
+# the dlib models, so the default is at most 2; raise it on machines with
+# few web server workers and many cores. Part of the analysis version,
+# since each segment starts its own face tracking:
+FACIAL_WORKERS = int(os.getenv("FACIAL_WORKERS", min(2, os.cpu_count() or 1)))
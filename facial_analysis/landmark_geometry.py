@@ -0,0 +1,170 @@
+"""
+Module with vectorized facial landmark geometry for TeamReel videos.
+
+Each face's 68 dlib facial landmarks are converted once into a (68, 2)
+float32 NumPy array of (x, y) pixel coordinates, and a video's faces are
+stacked into one (frames, 68, 2) array (all NaN for frames without a face).
+Head pose, eye line tilt, face size and centering offsets are then computed
+for all frames at once with array operations; every function here takes
+landmarks of shape (..., 68, 2), so it works on one face or a whole video.
+
+68-point landmark layout (dlib / iBUG 300-W): jaw 0-16 (chin: 8), eyebrows
+17-26, nose bridge 27-30, lower nose 31-35, eyes 36-41 and 42-47, mouth
+48-67.
+"""
+
+# ----------------------------------------------------------------------------
+# Import libraries/modules/functions we will use:
+
+# External (third-party) libraries:
+import numpy as np
+
+
+# ----------------------------------------------------------------------------
+# SETUP:
+
+N_LANDMARKS = 68
+
+# Landmark indices:
+JAW_LEFT = 0
+JAW_RIGHT = 16
+CHIN = 8
+NOSE_BRIDGE_TOP = 27
+NOSE_TIP = 30
+LEFT_EYE = slice(36, 42)    # Left in the image (the speaker's right eye)
+RIGHT_EYE = slice(42, 48)
+
+
+# ----------------------------------------------------------------------------
+def landmarks_to_array(shape):
+    """
+    Converts dlib facial landmarks (a full_object_detection) to a (68, 2)
+    float32 array of (x, y) pixel coordinates. Call it once per face, then
+    work on the array.
+    """
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=np.float32)
+
+
+def stack_landmarks(face_landmarks, n_landmarks:int=N_LANDMARKS):
+    """
+    Stacks per-frame landmark arrays ((68, 2) arrays, or None for frames
+    without a face) into one (frames, 68, 2) float32 array, with NaN for
+    frames without a face.
+    """
+    stacked = np.full((len(face_landmarks), n_landmarks, 2), np.nan, dtype=np.float32)
+    for i, landmarks in enumerate(face_landmarks):
+        if landmarks is not None:
+            stacked[i] = landmarks
+    return stacked
+
+
+# ----------------------------------------------------------------------------
+def get_face_found(landmarks):
+    """
+    Returns whether each face has landmarks (False for all-NaN frames).
+    """
+    return ~np.isnan(landmarks[..., NOSE_TIP, 0])
+
+
+def get_nose_tilt(landmarks):
+    """
+    Returns the angle of the nose bridge (landmarks 27 -> 30) from vertical,
+    in degrees (0 = upright; positive = tip to the right in the image).
+    """
+    bridge = landmarks[..., NOSE_TIP, :] - landmarks[..., NOSE_BRIDGE_TOP, :]
+    return np.degrees(np.arctan2(bridge[..., 0], bridge[..., 1]))
+
+
+def get_eye_centers(landmarks):
+    """
+    Returns the centers of the left and right (in the image) eyes, each of
+    shape (..., 2).
+    """
+    return (landmarks[..., LEFT_EYE, :].mean(axis=-2),
+            landmarks[..., RIGHT_EYE, :].mean(axis=-2))
+
+
+def get_eye_line_tilt(landmarks):
+    """
+    Returns the angle of the line between the eye centers from horizontal,
+    in degrees (head roll; 0 = level).
+    """
+    left_eye, right_eye = get_eye_centers(landmarks)
+    eye_line = right_eye - left_eye
+    return np.degrees(np.arctan2(eye_line[..., 1], eye_line[..., 0]))
+
+
+def get_head_pose(landmarks):
+    """
+    Returns (yaw, pitch) head pose proxies from the 2-D landmarks:
+
+    yaw: Nose tip's horizontal position between the jaw's left and right
+    ends, from -1 (at the left end) to 1 (at the right end); 0 = facing
+    the camera
+    pitch: Nose tip's vertical position between the eye line and the chin,
+    as a share of that distance (about 0.4 facing the camera; larger =
+    looking down, smaller = looking up)
+    """
+    nose_tip = landmarks[..., NOSE_TIP, :]
+    jaw_left = landmarks[..., JAW_LEFT, 0]
+    jaw_right = landmarks[..., JAW_RIGHT, 0]
+    left_eye, right_eye = get_eye_centers(landmarks)
+    eyes_y = (left_eye[..., 1] + right_eye[..., 1]) / 2
+    chin_y = landmarks[..., CHIN, 1]
+
+    # NaN (not inf) for degenerate faces:
+    jaw_width = np.where(jaw_right != jaw_left, jaw_right - jaw_left, np.nan)
+    eyes_to_chin = np.where(chin_y != eyes_y, chin_y - eyes_y, np.nan)
+    yaw = 2 * (nose_tip[..., 0] - jaw_left) / jaw_width - 1
+    pitch = (nose_tip[..., 1] - eyes_y) / eyes_to_chin
+    return yaw, pitch
+
+
+def get_face_size(landmarks, frame_width:int, frame_height:int):
+    """
+    Returns the width and height of the landmarks' bounding box, as shares
+    of the frame width and height.
+    """
+    extent = landmarks.max(axis=-2) - landmarks.min(axis=-2)
+    return extent[..., 0] / frame_width, extent[..., 1] / frame_height
+
+
+def get_centering_offsets(boxes, frame_width:int, frame_height:int):
+    """
+    Returns the offsets of face box centers (boxes of shape (..., 4), as
+    (left, top, right, bottom)) from the frame center, as shares of frame
+    width and height (-0.5 to 0.5; 0 = centered).
+    """
+    offset_x = (boxes[..., 0] + boxes[..., 2]) / 2 / frame_width - 0.5
+    offset_y = (boxes[..., 1] + boxes[..., 3]) / 2 / frame_height - 0.5
+    return offset_x, offset_y
+
+
+def get_landmark_geometry(landmarks, boxes, frame_width:int, frame_height:int):
+    """
+    Computes all geometry metrics for faces' landmarks (..., 68, 2) and face
+    boxes (..., 4), in one vectorized pass, as a dict of arrays (NaN for
+    frames without a face):
+
+    face_found: Face (landmarks) found
+    offset_x, offset_y: Face box center's offset from the frame center
+    tilt_degrees: Nose bridge angle from vertical
+    eye_line_degrees: Eye line angle from horizontal (head roll)
+    yaw, pitch: Head pose proxies (see get_head_pose)
+    face_width, face_height: Face size, as shares of the frame size
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    boxes = np.asarray(boxes, dtype=np.float32)
+
+    offset_x, offset_y = get_centering_offsets(boxes, frame_width, frame_height)
+    yaw, pitch = get_head_pose(landmarks)
+    face_width, face_height = get_face_size(landmarks, frame_width, frame_height)
+    return {'face_found': get_face_found(landmarks),
+            'offset_x': offset_x,
+            'offset_y': offset_y,
+            'tilt_degrees': get_nose_tilt(landmarks),
+            'eye_line_degrees': get_eye_line_tilt(landmarks),
+            'yaw': yaw,
+            'pitch': pitch,
+            'face_width': face_width,
+            'face_height': face_height}
@@ -1,14 +1,22 @@
 """
-Module with functions for working with videos for the TeamReel product.
+Module with functions for working with videos for the TeamReel product:
+streaming frames in memory (see iter_video_frames; writing frames to disk
+is an explicit opt-in, see save_frames_from_video), and splitting a video
+into segments of frames that can be processed in parallel, each by its own
+worker process (see run_on_video_segments).
 """
 
 # ----------------------------------------------------------------------------
 # Import libraries/modules/functions we will use:
 
 # External (third-party):
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 # import dlib
 # from imutils import paths
+import math
+import multiprocessing
 import numpy as np
 import os
 # import tensorflow as tf
@@ -18,66 +26,235 @@ import os
 
 
 # ----------------------------------------------------------------------------
-def get_frames_from_video(video_filename:str):
+# SETUP:
+
+# Max number of worker processes for segment-parallel video processing
+# (default: number of CPU cores):
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", os.cpu_count() or 1))
+
+# Don't split videos into segments shorter than this (seeking and starting
+# a segment has a cost):
+MIN_SEGMENT_SECONDS = 10
+
+
+# ----------------------------------------------------------------------------
+def get_video_properties(video_filename:str):
     """
-    Saves all frames from the specified video in subdirectory 'video_frames'.
+    Returns a dict with a video file's frame_count, fps, width and height.
     """
-
-    # Start capturing the video from the video file:
-    # cv2.VideoCapture(0): From first camera or webcam
-    # cv2.VideoCapture(1):  From second camera or webcam
-    # cv2.VideoCapture("file name.mp4"): From video file
     vid = cv2.VideoCapture(video_filename)
+    if not vid.isOpened():
+        raise IOError(f"Error: Cannot open video file {video_filename}.")
+    try:
+        return {'frame_count': int(vid.get(cv2.CAP_PROP_FRAME_COUNT)),
+                'fps': vid.get(cv2.CAP_PROP_FPS) or 30,
+                'width': int(vid.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(vid.get(cv2.CAP_PROP_FRAME_HEIGHT))}
+    finally:
+        vid.release()
 
-    # Exit if the video capture did not start successfully:
+
+def split_video_into_segments(frame_count:int, fps:float, n_segments:int,
+                              stride:int=1,
+                              min_segment_seconds:float=MIN_SEGMENT_SECONDS):
+    """
+    Splits a video's frames into up to n_segments consecutive time segments
+    of about equal length (none shorter than min_segment_seconds, except
+    the last), as a list of (start_frame, end_frame) tuples (end
+    exclusive). Segment starts are multiples of stride, so processing every
+    stride-th frame of each segment gives the same frames as processing
+    every stride-th frame of the whole video.
+    """
+    if frame_count <= 0:
+        return []
+
+    min_segment_frames = max(stride, int(min_segment_seconds * fps))
+    n_segments = max(1, min(n_segments, frame_count // min_segment_frames))
+    segment_frames = math.ceil(frame_count / n_segments / stride) * stride
+
+    return [(start, min(start + segment_frames, frame_count))
+            for start in range(0, frame_count, segment_frames)]
+
+
+class VideoFrame:
+    """
+    One frame from iter_video_frames:
+
+    index: Frame index in the video
+    timestamp: Time of the frame in the video (seconds)
+    image: The frame (BGR, or grayscale; downscaled if asked for)
+    lookback: Tuple of the previously yielded VideoFrames, oldest first (up
+    to iter_video_frames' lookback; empty without lookback)
+    """
+
+    __slots__ = ('index', 'timestamp', 'image', 'lookback')
+
+    def __init__(self, index:int, timestamp:float, image, lookback=()):
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+        self.lookback = lookback
+
+
+def iter_video_frames(video_filename:str, stride:int=1,
+                      start_frame:int=None, end_frame:int=None,
+                      start_seconds:float=None, end_seconds:float=None,
+                      grayscale:bool=False, scale:float=None,
+                      lookback:int=0):
+    """
+    Generator that streams frames from a video file, in memory, as
+    VideoFrames (frame index, timestamp and image), without writing
+    anything to disk. Every vision feature should read video through this.
+
+    Parameters:
+    stride: Yield every stride-th frame (counted from the first frame
+    yielded); frames in between are skipped without being decoded
+    start_frame, end_frame: Frame window (end exclusive; default: the whole
+    video), or
+    start_seconds, end_seconds: Time window, in seconds (frame numbers win
+    if both are given)
+    grayscale: Yield grayscale images instead of BGR
+    scale: Downscale images by this factor (e.g., 0.5), if given
+    lookback: Keep the last lookback yielded frames in a bounded ring
+    buffer, passed along with each frame as its lookback tuple (e.g., for
+    motion between frames), without re-reading the video
+
+    Seeks straight to the first frame (CAP_PROP_POS_FRAMES).
+    """
+    vid = cv2.VideoCapture(video_filename)
     if not vid.isOpened():
-        print("Error: Cannot open video file.")
-        exit()
+        raise IOError(f"Error: Cannot open video file {video_filename}.")
 
-    # Make temp directory 'video_frames' to put the frames in:
-    dir_name = 'video_frames'
-    if not os.path.exists('video_frames'):
-        os.makedirs('video_frames')
+    try:
+        fps = vid.get(cv2.CAP_PROP_FPS) or 30
+        if start_frame is None:
+            start_frame = int(math.ceil(start_seconds * fps)) if start_seconds else 0
+        if end_frame is None and end_seconds is not None:
+            end_frame = int(math.ceil(end_seconds * fps))
+        if start_frame > 0:
+            vid.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
 
-    # Get frames:
-    current_frame = 0
-    total_frames = vid.get(cv2.CAP_PROP_FRAME_COUNT)
+        history = deque(maxlen=lookback) if lookback > 0 else None
+        frame_index = start_frame
+        while end_frame is None or frame_index < end_frame:
+            if not vid.grab():
+                break
+            if (frame_index - start_frame) % stride == 0:
+                returned, image = vid.retrieve()
+                if not returned:
+                    break
+                if grayscale:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                if scale and scale != 1.0:
+                    image = cv2.resize(image, None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
 
-    print(f"Total frames: {total_frames}")
-    frame_width = vid.get(cv2.CAP_PROP_FRAME_WIDTH)
-    frame_height = vid.get(cv2.CAP_PROP_FRAME_HEIGHT)
-    print(f"Frame width x height: {frame_width} x {frame_height}")
-    fps = vid.get(cv2.CAP_PROP_FPS)
-    print(f"Frames per second (FPS): {fps}")
+                frame = VideoFrame(frame_index, frame_index / fps, image)
+                if history is None:
+                    yield frame
+                else:
+                    yield VideoFrame(frame.index, frame.timestamp, image, tuple(history))
+                    # Buffer frames without their own lookback, so memory
+                    # stays bounded to lookback frames:
+                    history.append(frame)
+            frame_index += 1
+    finally:
+        # Release the video capture object:
+        vid.release()
 
-    while current_frame <= (total_frames - 1):
-        # Get the next frame in the video:
-        returned, frame = vid.read()
 
-        if not returned:
-            print("Video stream has ended (cannot receive next frame). Exiting.")
-            break
+def run_on_video_segments(video_filename:str, segment_function, n_workers:int=None,
+                          stride:int=1, initializer=None, executor=None,
+                          **kwargs):
+    """
+    Processes a video in parallel: splits it into time segments (see
+    split_video_into_segments), runs segment_function(video_filename,
+    start_frame, end_frame, stride, **kwargs) on each segment in a pool of
+    n_workers processes (default: VIDEO_WORKERS), and returns the segment
+    results, in order.
 
-        # # Resize the frame:
-        # frame = cv2.resize(frame,
-        #                   None,
-        #                   fx = 0.80,
-        #                   fy = 0.80,
-        #                   interpolation = cv2.INTER_AREA)
+    segment_function must be a module-level function (so it can be sent to
+    worker processes), and should return compact results. initializer runs
+    once in each new worker (e.g., to load models once per worker). Pass an
+    existing ProcessPoolExecutor as executor to reuse its workers across
+    videos. Short videos (one segment) run in this process.
+    """
+    n_workers = n_workers or VIDEO_WORKERS
+    properties = get_video_properties(video_filename)
+    segments = split_video_into_segments(frame_count=properties['frame_count'],
+                                         fps=properties['fps'],
+                                         n_segments=n_workers,
+                                         stride=stride)
 
-        # # Convert frame from BGR color to grayscale:
-        # frame_grayscale = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if len(segments) <= 1:
+        end_frame = segments[0][1] if segments else None
+        return [segment_function(video_filename, 0, end_frame, stride, **kwargs)]
 
-        # Save frame as image in 'video_frames' directory:
-        filename = f"./{dir_name}/frame_{str(current_frame)}.jpg"
-        print(f"Creating {filename}")  # [?? To do -- remove ??]
-        cv2.imwrite(filename, frame)
+    if executor is not None:
+        futures = [executor.submit(segment_function, video_filename, start, end, stride, **kwargs)
+                   for start, end in segments]
+        return [future.result() for future in futures]
 
-        current_frame += 1
+    # 'spawn' (not fork), so workers don't inherit our threads and locks
+    # (e.g., from the Flask app):
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(segments)),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=initializer) as pool:
+        futures = [pool.submit(segment_function, video_filename, start, end, stride, **kwargs)
+                   for start, end in segments]
+        return [future.result() for future in futures]
 
-    # Release the video capture object & close OpenCV windows:
-    vid.release()
-    cv2.destroyAllWindows()
+
+# ----------------------------------------------------------------------------
+def _save_frames_segment(video_filename:str, start_frame:int, end_frame:int,
+                         stride:int, dir_name:str, **options):
+    """
+    Saves the frames of one segment of a video as images in dir_name (see
+    save_frames_from_video), and returns the number of frames saved.
+    """
+    n_saved = 0
+    for frame in iter_video_frames(video_filename, stride=stride,
+                                   start_frame=start_frame, end_frame=end_frame,
+                                   **options):
+        cv2.imwrite(os.path.join(dir_name, f"frame_{frame.index}.jpg"), frame.image)
+        n_saved += 1
+    return n_saved
+
+
+def get_frames_from_video(video_filename:str, **options):
+    """
+    Returns a generator of the specified video's frames, in memory (see
+    iter_video_frames for options: stride, time window, grayscale, scale,
+    lookback). Nothing is written to disk; use save_frames_from_video for
+    that.
+    """
+    return iter_video_frames(video_filename, **options)
+
+
+def save_frames_from_video(video_filename:str, dir_name:str='video_frames',
+                           n_workers:int=1, **options):
+    """
+    Saves frames from the specified video as JPEG images
+    (frame_<index>.jpg) in subdirectory dir_name, and returns the number of
+    frames saved. Only for debugging/inspection: analysis should stream
+    frames with iter_video_frames instead. Takes the same options as
+    iter_video_frames (except lookback). With n_workers > 1, segments of
+    the video are saved in parallel, by n_workers processes.
+    """
+    os.makedirs(dir_name, exist_ok=True)
+
+    if n_workers > 1 and not any(key in options for key in ('start_frame', 'end_frame',
+                                                              'start_seconds', 'end_seconds')):
+        stride = options.pop('stride', 1)
+        return sum(run_on_video_segments(video_filename, _save_frames_segment,
+                                         n_workers=n_workers, stride=stride,
+                                         dir_name=dir_name, **options))
+
+    n_saved = 0
+    for frame in iter_video_frames(video_filename, **options):
+        cv2.imwrite(os.path.join(dir_name, f"frame_{frame.index}.jpg"), frame.image)
+        n_saved += 1
+    return n_saved
 
 
 # ----------------------------------------------------------------------------
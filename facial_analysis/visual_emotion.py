@@ -0,0 +1,243 @@
+"""
+Module with visual emotion (facial expression) recognition for TeamReel
+videos, for the 'sentiment_visual' and 'sentiment_visual_details' columns
+of our DB's videos_feedback table.
+
+Faces are cropped and aligned (rotated so the eyes are level) from the
+frames that facial alignment already samples and finds faces in (see
+get_facial_alignment's face_crop_size), so no frame is read or searched
+twice. All of a video's face crops are then classified together, in
+fixed-size batches, by a CPU emotion classifier: the FER+ ONNX model
+(64x64 grayscale faces -> 8 emotions), run with OpenCV's DNN module.
+Classifying many faces per forward pass, instead of one face at a time,
+is what makes this affordable on CPU-only nodes. Models exported with a
+fixed batch size of 1 (like the common FER+ export, whose Reshape has a
+constant shape) are found when loaded and fed one face at a time.
+
+OpenCV is imported inside the functions that use it, so this module (e.g.,
+get_visual_emotions, which returns empty results without face crops) can
+be imported on workers without OpenCV.
+
+FER+ emotions are reported under our 8 emotion names (see
+FERPLUS_TO_EMOTION), as mean probabilities over all faces, and translated
+to a 1-5 score by their valence (see EMOTION_VALENCE).
+"""
+
+
+# ----------------------------------------------------------------------------
+# Import libraries/modules/functions we will use:
+
+# External (third-party) libraries:
+from dotenv import load_dotenv
+import numpy as np
+import os
+import threading
+
+# Internal for our project:
+from .facial_settings import EMOTION_MODEL_PATH
+from .landmark_geometry import get_eye_line_tilt
+
+
+# ----------------------------------------------------------------------------
+# SETUP:
+
+# Get settings from .env file:
+load_dotenv()
+
+# (The model file, EMOTION_MODEL_PATH, is set in facial_settings.py.)
+
+# Model input: square grayscale face crops of this size (pixels), and the
+# number of crops per forward pass (the last batch is padded, so the model
+# always sees the same input shape; 1 for models that only take batches of
+# 1, see get_max_batch_size):
+EMOTION_INPUT_SIZE = 64
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", 32))
+
+# Face crops are this many times the face box width, around its center:
+EMOTION_CROP_SCALE = 1.1
+
+# FER+ output classes, in model output order, and our name for each:
+FERPLUS_LABELS = ('neutral', 'happiness', 'surprise', 'sadness',
+                  'anger', 'disgust', 'fear', 'contempt')
+FERPLUS_TO_EMOTION = {'neutral': 'calm',
+                      'happiness': 'happy',
+                      'surprise': 'surprised',
+                      'sadness': 'sad',
+                      'anger': 'angry',
+                      'disgust': 'disgusted',
+                      'fear': 'fear',
+                      'contempt': 'confused'}
+
+# Our 8 emotions (as in sentiment_visual_details), and how positive each
+# is, from -1 to 1 (the score is 3 + 2 x mean valence):
+EMOTIONS = ('sad', 'calm', 'fear', 'angry', 'happy', 'confused', 'disgusted', 'surprised')
+EMOTION_VALENCE = {'sad': -0.75, 'calm': 0.5, 'fear': -0.75, 'angry': -1.0,
+                   'happy': 1.0, 'confused': -0.25, 'disgusted': -1.0, 'surprised': 0.25}
+
+# Model output columns -> EMOTIONS order:
+_EMOTION_COLUMNS = [FERPLUS_LABELS.index(label)
+                    for emotion in EMOTIONS
+                    for label, name in FERPLUS_TO_EMOTION.items() if name == emotion]
+
+# The emotion model and its max batch size (None = any), loaded once per
+# process on first use (see get_emotion_model):
+_emotion_model = None
+_emotion_model_max_batch_size = None
+_emotion_model_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------------------
+def has_emotion_model():
+    """
+    Returns whether the emotion model file exists (so callers can skip
+    cropping faces without it).
+    """
+    return os.path.exists(EMOTION_MODEL_PATH)
+
+
+def get_emotion_model():
+    """
+    Returns the emotion classifier (an OpenCV DNN network, on CPU), loading
+    it on the first call.
+    """
+    global _emotion_model, _emotion_model_max_batch_size
+    with _emotion_model_lock:
+        if _emotion_model is None:
+            if not has_emotion_model():
+                raise FileNotFoundError(f"Emotion model not found: {EMOTION_MODEL_PATH}")
+            import cv2
+
+            model = cv2.dnn.readNetFromONNX(EMOTION_MODEL_PATH)
+            model.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            model.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            _emotion_model_max_batch_size = get_max_batch_size(model)
+            _emotion_model = model
+    return _emotion_model
+
+
+def get_max_batch_size(model, size:int=EMOTION_INPUT_SIZE):
+    """
+    Returns the max batch size an emotion classifier takes: None (any) if
+    it classifies a batch of 2 face crops, else 1. ONNX models exported with
+    a fixed batch size of 1 either fail on larger batches (cv2.error, e.g.
+    from a Reshape to a constant shape) or do not give one row per face.
+    """
+    import cv2
+
+    model.setInput(np.zeros((2, 1, size, size), dtype=np.float32))
+    try:
+        output = model.forward()
+    except cv2.error:
+        return 1
+    return None if output.shape[0] == 2 else 1
+
+
+def align_face_crop(gray, box, landmarks, size:int=EMOTION_INPUT_SIZE):
+    """
+    Crops a face from a grayscale frame as a size x size uint8 image: a
+    square of EMOTION_CROP_SCALE x the face box (left, top, right, bottom)
+    width around the box center, rotated so the eye line (from the face's
+    (68, 2) landmarks) is level. One affine warp does the rotation, crop and
+    resize.
+    """
+    import cv2
+
+    center_x = float(box[0] + box[2]) / 2
+    center_y = float(box[1] + box[3]) / 2
+    side = max(float(box[2] - box[0]), 1.0) * EMOTION_CROP_SCALE
+
+    transform = cv2.getRotationMatrix2D((center_x, center_y),
+                                        float(get_eye_line_tilt(landmarks)),
+                                        size / side)
+    transform[0, 2] += size / 2 - center_x
+    transform[1, 2] += size / 2 - center_y
+    return cv2.warpAffine(gray, transform, (size, size),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+# ----------------------------------------------------------------------------
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def classify_face_crops(face_crops, batch_size:int=None, model=None):
+    """
+    Classifies face crops ((faces, size, size) uint8 array, from
+    align_face_crop) in batches of batch_size (default:
+    EMOTION_BATCH_SIZE; 1 if the model only takes batches of 1, see
+    get_max_batch_size) and returns a (faces, 8) array of emotion
+    probabilities, in EMOTIONS order.
+    """
+    n_faces = len(face_crops)
+    probabilities = np.zeros((n_faces, len(EMOTIONS)), dtype=np.float32)
+    if n_faces == 0:
+        return probabilities
+
+    size = face_crops.shape[1]
+    if model is None:
+        model = get_emotion_model()
+        max_batch_size = _emotion_model_max_batch_size
+    else:
+        max_batch_size = get_max_batch_size(model, size=size)
+    batch_size = batch_size or EMOTION_BATCH_SIZE
+    if max_batch_size:
+        batch_size = min(batch_size, max_batch_size)
+    batch = np.zeros((batch_size, 1, size, size), dtype=np.float32)
+    for start in range(0, n_faces, batch_size):
+        crops = face_crops[start:start + batch_size]
+        # Fixed-size input: copy this batch's crops in and zero the rest:
+        batch[:len(crops), 0] = crops
+        batch[len(crops):] = 0
+        model.setInput(batch)
+        logits = model.forward().reshape(batch_size, -1)[:len(crops)]
+        probabilities[start:start + len(crops)] = _softmax(logits)[:, _EMOTION_COLUMNS]
+    return probabilities
+
+
+def get_visual_sentiment_score(emotions:dict):
+    """
+    Translates mean emotion probabilities to a visual sentiment score from
+    1-5 (5 = positive expressions), by their valence.
+    """
+    valence = sum(EMOTION_VALENCE[emotion] * probability
+                  for emotion, probability in emotions.items())
+    return float(np.clip(3 + 2 * valence, 1, 5))
+
+
+def get_visual_emotions(face_crops=None, batch_size:int=None):
+    """
+    Recognizes the speaker's facial expressions in a video's face crops (see
+    align_face_crop and get_facial_alignment's face_crop_size) and returns:
+
+    emotions: {emotion: mean probability over all faces}, for our 8 emotions
+    dominant_emotion: Emotion with the highest mean probability
+    n_faces: Number of faces classified
+    score: Visual sentiment score (1-5), or 0 ("not set" in our DB)
+    without faces or the emotion model
+    """
+    results = {'emotions': {emotion: 0.0 for emotion in EMOTIONS},
+               'dominant_emotion': None,
+               'n_faces': 0,
+               'score': 0}
+    if face_crops is None or len(face_crops) == 0:
+        return results
+
+    try:
+        import cv2
+        probabilities = classify_face_crops(np.asarray(face_crops), batch_size=batch_size)
+    except (ImportError, FileNotFoundError) as e:
+        print(f"Skipping visual emotions: {e}")
+        return results
+    except cv2.error as e:
+        # (e.g., a model that does not take our input shape)
+        print(f"Skipping visual emotions, the emotion model failed: {e}")
+        return results
+
+    mean_probabilities = probabilities.mean(axis=0)
+    results['emotions'] = {emotion: float(probability)
+                           for emotion, probability in zip(EMOTIONS, mean_probabilities)}
+    results['dominant_emotion'] = EMOTIONS[int(np.argmax(mean_probabilities))]
+    results['n_faces'] = len(probabilities)
+    results['score'] = get_visual_sentiment_score(results['emotions'])
+    return results
@@ -0,0 +1,60 @@
+"""
+Tests for the analysis results cache (data_infra/analysis_cache.py): the
+analysis version follows the contents of the model files and the settings,
+and the cache evicts its least recently used entries when over max_bytes.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import os
+
+from data_infra.analysis_cache import AnalysisCache, get_analysis_version
+
+
+def test_analysis_version_follows_model_contents_not_mtime(tmp_path):
+    model_path = tmp_path / 'model.bin'
+    model_path.write_bytes(b'weights v1')
+    version = get_analysis_version(file_paths=[str(model_path)], settings={'A': 1})
+
+    # Same contents, new modification time: same version:
+    os.utime(str(model_path), (1, 1))
+    assert get_analysis_version(file_paths=[str(model_path)], settings={'A': 1}) == version
+
+    # New contents (same size), or new settings: new version:
+    assert get_analysis_version(file_paths=[str(model_path)], settings={'A': 2}) != version
+    model_path.write_bytes(b'weights v2')
+    assert get_analysis_version(file_paths=[str(model_path)], settings={'A': 1}) != version
+
+    # Missing and unset files are skipped:
+    assert get_analysis_version(file_paths=[None, str(tmp_path / 'missing.bin')]) == get_analysis_version()
+
+
+def test_keys_follow_file_contents_and_version(tmp_path):
+    video_path = tmp_path / 'video.mp4'
+    video_path.write_bytes(b'video bytes')
+    cache = AnalysisCache(version='a', directory=str(tmp_path / 'cache'))
+
+    assert cache.key_for_file(str(video_path)) == cache.key_for_file(str(video_path))
+    assert AnalysisCache(version='b', directory=str(tmp_path / 'cache')).key_for_file(str(video_path)) \
+        != cache.key_for_file(str(video_path))
+
+
+def test_put_get_and_least_recently_used_eviction(tmp_path):
+    cache = AnalysisCache(version='v', directory=str(tmp_path), max_bytes=10 ** 6)
+    results = {'transcript': 'x' * 100}
+    entry_size = None
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, results)
+        os.utime(cache._entry_path(key), (i, i))
+        entry_size = os.path.getsize(cache._entry_path(key))
+    assert cache.get('a') == results
+    assert cache.get('missing') is None
+
+    # 'a' was just read, so 'b' is now the least recently used; make room
+    # for two entries only:
+    os.utime(cache._entry_path('c'), (10 ** 9, 10 ** 9))
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert cache.get('b') is None
+    assert cache.get('a') == results
+    assert cache.get('c') == results
@@ -0,0 +1,80 @@
+"""
+Tests for filler words counting (audio_analysis/filler_words.py): the
+Aho-Corasick automaton's overlap resolution, the default lexicon, and that
+failed speech recognition chunks never reach the transcript.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from audio_analysis.asr_backends import ASRBackend
+from audio_analysis.audio_functions import get_text_from_chunks
+from audio_analysis.filler_words import FILLER_LEXICON, FillerAutomaton
+
+
+def _find(phrases, text):
+    automaton = FillerAutomaton([tuple(phrase.split()) for phrase in phrases])
+    return [(start, ' '.join(automaton.phrases[index]))
+            for start, index in automaton.find(text.split())]
+
+
+def test_longest_match_replaces_the_matches_it_contains():
+    assert _find(["you know", "i mean", "you know what i mean"],
+                 "so you know what i mean right") == [(1, "you know what i mean")]
+
+
+def test_partly_overlapping_matches_keep_the_first():
+    # "sort of" ends before "of course" could, so "of course" is dropped:
+    assert _find(["sort of", "of course"], "sort of course") == [(0, "sort of")]
+
+
+def test_shorter_suffix_match_when_the_longest_overlaps():
+    # "well um" partly overlaps "i mean well", but its suffix "um" does not:
+    assert _find(["i mean well", "well um", "um"], "i mean well um") == [(0, "i mean well"), (3, "um")]
+
+
+def test_repeated_and_adjacent_matches_are_all_counted():
+    assert _find(["um", "uh"], "um uh um the um") == [(0, "um"), (1, "uh"), (2, "um"), (4, "um")]
+    assert _find(["um"], "") == []
+
+
+def test_default_lexicon_leaves_out_ambiguous_single_words():
+    pytest.importorskip('gensim')
+    from audio_analysis.filler_words import get_filler_words
+
+    for word in ("like", "actually", "basically", "literally", "totally", "honestly"):
+        assert word not in FILLER_LEXICON
+
+    results = get_filler_words("I'd like to say it actually worked, um, you know",
+                               duration_minutes=1.0)
+    assert results['filler_counts'] == {'um': 1, 'you know': 1}
+
+
+class FlakyASRBackend(ASRBackend):
+    """
+    Stand-in ASR backend: fails (gives "") on chunks whose first sample is
+    negative.
+    """
+
+    def transcribe(self, samples, sample_rate):
+        return "" if samples[0] < 0 else f"chunk {int(samples[0])}"
+
+
+def test_failed_asr_chunks_are_left_out_of_the_transcript():
+    chunks = [np.full(10, value, dtype=np.float32) for value in (1, -1, 2, -1)]
+    texts = get_text_from_chunks(chunks, sample_rate=16000,
+                                 asr_backend=FlakyASRBackend(), max_workers=2)
+    assert texts == ["chunk 1", "chunk 2"]
+
+
+def test_google_asr_failures_give_no_text(monkeypatch):
+    sr = pytest.importorskip('speech_recognition')
+    from audio_analysis.asr_backends import GoogleASRBackend
+
+    def fail(self, audio_data, **kwargs):
+        raise sr.UnknownValueError()
+
+    monkeypatch.setattr(sr.Recognizer, 'recognize_google', fail)
+    assert GoogleASRBackend().transcribe(np.zeros(160, dtype=np.float32), 16000) == ""
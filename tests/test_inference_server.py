@@ -0,0 +1,83 @@
+"""
+Tests for the micro-batching inference server
+(audio_analysis/inference_server.py): requests are coalesced into batches,
+each caller gets its own rows back, and an error fails only its own batch,
+not the server thread.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from audio_analysis.inference_server import BatchingInferenceServer
+
+
+class SumModel:
+    """
+    Stand-in model: one output per window (the sum of its features), and
+    the batch sizes it was called with.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.batch_sizes.append(len(x))
+        return x.reshape(len(x), -1).sum(axis=1, keepdims=True)
+
+
+@pytest.fixture
+def server():
+    server = BatchingInferenceServer(SumModel(), max_batch_size=64, max_wait_ms=50)
+    yield server
+    server.stop()
+
+
+def test_concurrent_requests_are_batched_and_split_per_caller(server):
+    results = {}
+
+    def call(i):
+        results[i] = server.predict(np.full((i + 1, 3), i, dtype=np.float32))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(4):
+        np.testing.assert_array_equal(results[i], np.full((i + 1, 1), 3 * i))
+    assert sum(server.model.batch_sizes) == 1 + 2 + 3 + 4
+    assert len(server.model.batch_sizes) < 4
+    assert server.metrics()['requests'] == 4
+
+
+def test_mismatched_request_fails_its_batch_but_not_the_server(server):
+    good = server.submit(np.ones((2, 3)))
+    bad = server.submit(np.ones((2, 4)))
+
+    # (Both land in one batch, whose concatenation fails, unless the first
+    # batch was already closed, in which case the good request succeeds:)
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    try:
+        np.testing.assert_array_equal(good.result(timeout=5), np.full((2, 1), 3))
+    except ValueError:
+        pass
+
+    # The server thread is still serving later requests:
+    assert server._thread.is_alive()
+    np.testing.assert_array_equal(server.predict(np.ones((3, 3)), timeout=5), np.full((3, 1), 3))
+
+
+def test_model_errors_are_raised_to_callers(server):
+    def fail(x, batch_size=None, verbose=0):
+        raise RuntimeError("model failed")
+
+    server.model.predict = fail
+    with pytest.raises(RuntimeError, match="model failed"):
+        server.predict(np.ones((1, 3)), timeout=5)
+    assert server._thread.is_alive()
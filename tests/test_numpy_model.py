@@ -0,0 +1,112 @@
+"""
+Tests for the pure-NumPy inference engine (audio_analysis/numpy_model.py):
+its outputs must match Keras' within PARITY_TOLERANCE, with the same
+predicted class, including BatchNormalization folded into the weights of
+the layer before it.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from audio_analysis.numpy_model import PARITY_TOLERANCE, NumpySequentialModel
+from audio_analysis.numpy_model import _conv1d, check_parity_with_keras
+
+
+INPUT_LENGTH = 40
+N_CHANNELS = 2
+
+
+def _conv1d_config(name, filters, kernel_size, padding='same', activation='linear'):
+    return {'class_name': 'Conv1D',
+            'config': {'name': name, 'filters': filters, 'kernel_size': [kernel_size],
+                       'strides': [1], 'padding': padding, 'activation': activation}}
+
+
+def _batch_normalization_config(name, epsilon=1e-3):
+    return {'class_name': 'BatchNormalization',
+            'config': {'name': name, 'axis': -1, 'epsilon': epsilon}}
+
+
+def _batch_normalization_weights(random, n_channels):
+    # gamma, beta, moving_mean, moving_variance (not the identity, so
+    # folding them in matters):
+    return [random.uniform(0.5, 1.5, n_channels).astype(np.float32),
+            random.normal(size=n_channels).astype(np.float32),
+            random.normal(size=n_channels).astype(np.float32),
+            random.uniform(0.5, 2.0, n_channels).astype(np.float32)]
+
+
+def test_batch_normalization_is_folded_into_conv1d():
+    random = np.random.RandomState(0)
+    kernel = random.normal(size=(3, N_CHANNELS, 4)).astype(np.float32)
+    bias = random.normal(size=4).astype(np.float32)
+    gamma, beta, mean, variance = _batch_normalization_weights(random, 4)
+
+    model = NumpySequentialModel(layer_configs=[_conv1d_config('conv', 4, 3),
+                                                _batch_normalization_config('bn')],
+                                 weights={'conv': [kernel, bias],
+                                          'bn': [gamma, beta, mean, variance]})
+    assert [op['op'] for op in model.ops] == ['conv1d']
+
+    x = random.normal(size=(5, INPUT_LENGTH, N_CHANNELS)).astype(np.float32)
+    expected = (_conv1d(x, kernel, bias) - mean) / np.sqrt(variance + 1e-3) * gamma + beta
+    np.testing.assert_allclose(model.predict(x), expected, atol=PARITY_TOLERANCE, rtol=0)
+
+
+def test_parity_with_keras(tmp_path):
+    keras = pytest.importorskip('keras')
+    from keras.layers import Activation, BatchNormalization, Conv1D, Dense
+    from keras.layers import Dropout, Flatten, MaxPooling1D
+
+    keras_model = keras.models.Sequential([
+        Conv1D(8, 5, padding='same', input_shape=(INPUT_LENGTH, N_CHANNELS)),
+        BatchNormalization(),
+        Activation('relu'),
+        Dropout(0.1),
+        MaxPooling1D(pool_size=4),
+        Conv1D(4, 3, padding='same'),
+        BatchNormalization(),
+        Activation('relu'),
+        Flatten(),
+        Dense(3),
+        Activation('softmax')])
+
+    # Give the BatchNormalization layers non-trivial moving stats:
+    random = np.random.RandomState(1)
+    for layer in keras_model.layers:
+        if isinstance(layer, BatchNormalization):
+            layer.set_weights(_batch_normalization_weights(random, layer.get_weights()[0].shape[0]))
+
+    json_path = str(tmp_path / 'model.json')
+    weights_path = str(tmp_path / 'weights.h5')
+    with open(json_path, 'w') as json_file:
+        json_file.write(keras_model.to_json())
+    keras_model.save_weights(weights_path)
+
+    numpy_model = NumpySequentialModel.from_files(json_path, weights_path)
+    assert 'scale_shift' not in [op['op'] for op in numpy_model.ops]
+
+    parity = check_parity_with_keras(json_path, weights_path, n_samples=32)
+    assert parity['max_abs_difference'] < PARITY_TOLERANCE
+    assert parity['same_class_share'] == 1.0
+    assert parity['passed']
+
+
+def test_int8_kernels_are_dequantized_once_at_load():
+    from audio_analysis.quantize_model import quantize_kernel_int8
+
+    random = np.random.RandomState(2)
+    kernel = random.normal(size=(3, N_CHANNELS, 4)).astype(np.float32)
+    bias = random.normal(size=4).astype(np.float32)
+    quantized, scale = quantize_kernel_int8(kernel)
+
+    model = NumpySequentialModel(layer_configs=[_conv1d_config('conv', 4, 3)],
+                                 weights={'conv': [quantized, bias]},
+                                 kernel_scales={'conv': scale})
+    assert model.ops[0]['kernel'].dtype == np.float32
+
+    x = random.normal(size=(5, INPUT_LENGTH, N_CHANNELS)).astype(np.float32)
+    expected = _conv1d(x, quantized.astype(np.float32) * scale, bias)
+    np.testing.assert_allclose(model.predict(x), expected, atol=PARITY_TOLERANCE, rtol=0)
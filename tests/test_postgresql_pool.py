@@ -0,0 +1,143 @@
+"""
+Tests for the PostgreSQL connection pool (data_infra/postgresql_pool.py):
+connections are reused across checkouts, broken connections are replaced,
+a statement timeout keeps its connection, and checkouts wait for a free
+connection. Runs against stand-in connections (no DB needed).
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+import pytest
+
+from data_infra import postgresql_pool
+from data_infra.postgresql_pool import PostgreSQLPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.dropped:
+            self.conn.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.conn.executed.append(sql)
+
+
+class FakeConnection:
+    """
+    Stand-in psycopg2 connection; set dropped to make it act as if the DB
+    had closed it.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = 0
+        self.dropped = False
+        self.executed = []
+        self.n_commits = 0
+        self.n_rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.n_commits += 1
+
+    def rollback(self):
+        if self.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.n_rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    connections = []
+
+    def connect(**kwargs):
+        connections.append(FakeConnection(**kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(postgresql_pool.psycopg2, 'connect', connect)
+    return connections
+
+
+def _pool(**kwargs):
+    kwargs.setdefault('min_connections', 0)
+    kwargs.setdefault('max_connections', 2)
+    return PostgreSQLPool(statement_timeout_ms=1000, checkout_timeout=0.1, database='test', **kwargs)
+
+
+def test_connections_are_reused(connections):
+    pool = _pool(min_connections=1)
+    assert 'statement_timeout=1000' in connections[0].kwargs['options']
+
+    for _ in range(3):
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+    assert len(connections) == 1
+    assert connections[0].n_commits == 3
+    assert pool.stats()['n_checkouts'] == 3
+    assert pool.stats()['n_idle'] == 1
+
+
+def test_broken_connection_is_replaced(connections):
+    pool = _pool()
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.cursor() as cursor:
+            connections[0].dropped = True
+            cursor.execute("SELECT 1;")
+    assert connections[0].closed
+    assert pool.stats()['n_open'] == 0
+
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1;")
+    assert len(connections) == 2
+    assert pool.stats()['n_open'] == 1
+
+
+def test_idle_connection_dropped_by_the_db_is_replaced_on_checkout(connections, monkeypatch):
+    monkeypatch.setattr(postgresql_pool, 'PG_POOL_HEALTH_CHECK_SECONDS', 0)
+    pool = _pool(min_connections=1)
+    connections[0].dropped = True
+
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    stats = pool.stats()
+    assert stats['n_reconnects'] == 1
+    assert stats['n_open'] == 1 and stats['n_idle'] == 1
+
+
+def test_statement_timeout_keeps_the_connection(connections):
+    pool = _pool()
+    with pytest.raises(psycopg2.extensions.QueryCanceledError):
+        with pool.connection():
+            raise psycopg2.extensions.QueryCanceledError("canceling statement due to statement timeout")
+    assert not connections[0].closed
+    assert connections[0].n_rollbacks == 1
+
+    with pool.connection() as conn:
+        assert conn is connections[0]
+    assert len(connections) == 1
+
+
+def test_checkout_waits_for_a_free_connection(connections):
+    pool = _pool(max_connections=1)
+    conn = pool.getconn()
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+    pool.putconn(conn)
+    assert pool.getconn() is conn
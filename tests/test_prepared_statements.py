@@ -0,0 +1,80 @@
+"""
+Tests for the prepared statements registry (data_infra/prepared_statements.py):
+$n parameters become %s parameters in the right order for plain queries,
+statements are prepared once per connection, and call stats are kept.
+Runs against stand-in cursors (no DB needed).
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import pytest
+
+from data_infra.prepared_statements import PreparedStatement, StatementRegistry
+
+
+class FakeConnection:
+    pass
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+
+def test_parameters_are_reordered_for_plain_queries():
+    statement = PreparedStatement('find', "SELECT * FROM t WHERE a = $2 AND b = $1 AND c = $2 AND d LIKE 'x%';")
+    assert statement.plain_sql == "SELECT * FROM t WHERE a = %s AND b = %s AND c = %s AND d LIKE 'x%%'"
+    assert statement.parameter_order == [1, 0, 1]
+    assert statement.n_params == 2
+    assert statement.execute_sql == "EXECUTE find (%s, %s)"
+
+    registry = StatementRegistry(prepare=False)
+    registry.register('find', statement.sql)
+    cursor = FakeCursor(FakeConnection())
+    registry.execute(cursor, 'find', ('first', 'second'))
+    assert cursor.executed == [(statement.plain_sql, ['second', 'first', 'second'])]
+
+
+def test_statements_are_prepared_once_per_connection():
+    registry = StatementRegistry(prepare=True)
+    registry.register('lookup', "SELECT * FROM users WHERE id = $1;")
+    first = FakeCursor(FakeConnection())
+    second = FakeCursor(FakeConnection())
+
+    registry.execute(first, 'lookup', (1,))
+    registry.execute(first, 'lookup', (2,))
+    registry.execute(second, 'lookup', (3,))
+    assert first.executed == [("PREPARE lookup AS SELECT * FROM users WHERE id = $1", None),
+                              ("EXECUTE lookup (%s)", (1,)),
+                              ("EXECUTE lookup (%s)", (2,))]
+    assert second.executed[0] == ("PREPARE lookup AS SELECT * FROM users WHERE id = $1", None)
+
+    stats = registry.stats()['lookup']
+    assert stats['calls'] == 3 and stats['prepares'] == 2
+    assert stats['mean_ms'] is not None and stats['max_ms'] >= stats['mean_ms']
+
+
+def test_statements_without_parameters():
+    registry = StatementRegistry(prepare=True)
+    registry.register('count_users', "SELECT COUNT(*) FROM users;")
+    cursor = FakeCursor(FakeConnection())
+    registry.execute(cursor, 'count_users')
+    assert cursor.executed[-1] == ("EXECUTE count_users", ())
+    assert registry.stats()['count_users']['calls'] == 1
+
+
+def test_invalid_registrations_and_calls():
+    registry = StatementRegistry(prepare=True)
+    registry.register('lookup', "SELECT * FROM users WHERE id = $1;")
+    registry.register('lookup', "SELECT * FROM users WHERE id = $1")   # same SQL: fine
+    with pytest.raises(ValueError):
+        registry.register('lookup', "SELECT * FROM prompts WHERE id = $1;")
+    with pytest.raises(ValueError):
+        registry.register('drop table', "SELECT 1;")
+    with pytest.raises(ValueError):
+        registry.execute(FakeCursor(FakeConnection()), 'lookup', (1, 2))
+    assert registry.stats()['lookup']['mean_ms'] is None
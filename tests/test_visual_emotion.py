@@ -0,0 +1,96 @@
+"""
+Tests for visual emotion recognition (facial_analysis/visual_emotion.py):
+face crops are classified in batches by models that take any batch size,
+one at a time by models exported with a fixed batch size of 1 (like the
+common FER+ export), and a failing model skips visual emotions instead of
+failing the analysis.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from facial_analysis import visual_emotion
+from facial_analysis.visual_emotion import EMOTION_INPUT_SIZE, EMOTIONS
+from facial_analysis.visual_emotion import classify_face_crops, get_max_batch_size, get_visual_emotions
+
+
+def _save_onnx_model(path, batch, reshape_to):
+    """
+    Saves a stand-in emotion classifier: input (batch, 1, 64, 64) ->
+    Reshape to the constant shape reshape_to -> MatMul -> 8 logits.
+    """
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper, numpy_helper
+
+    n_pixels = EMOTION_INPUT_SIZE * EMOTION_INPUT_SIZE
+    weights = np.random.RandomState(0).normal(size=(n_pixels, 8)).astype(np.float32) / n_pixels
+    graph = helper.make_graph(
+        [helper.make_node('Reshape', ['x', 'shape'], ['flat']),
+         helper.make_node('MatMul', ['flat', 'weights'], ['logits'])],
+        'emotion',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [batch, 1, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE])],
+        [helper.make_tensor_value_info('logits', TensorProto.FLOAT, [batch, 8])],
+        initializer=[numpy_helper.from_array(np.array(reshape_to, dtype=np.int64), 'shape'),
+                     numpy_helper.from_array(weights, 'weights')])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 11)])
+    model.ir_version = 6
+    onnx.save(model, str(path))
+    return cv2.dnn.readNetFromONNX(str(path))
+
+
+def _face_crops(n_faces):
+    random = np.random.RandomState(1)
+    return random.randint(0, 256, size=(n_faces, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE)).astype(np.uint8)
+
+
+def _one_at_a_time(model, face_crops):
+    probabilities = []
+    for crop in face_crops:
+        model.setInput(crop.reshape(1, 1, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE).astype(np.float32))
+        probabilities.append(visual_emotion._softmax(model.forward().reshape(1, -1))[0])
+    return np.array(probabilities)[:, visual_emotion._EMOTION_COLUMNS]
+
+
+def test_fixed_batch_model_is_fed_one_face_at_a_time(tmp_path):
+    model = _save_onnx_model(tmp_path / 'fixed.onnx', batch=1, reshape_to=[1, -1])
+    assert get_max_batch_size(model) == 1
+
+    face_crops = _face_crops(5)
+    probabilities = classify_face_crops(face_crops, batch_size=32, model=model)
+    np.testing.assert_allclose(probabilities, _one_at_a_time(model, face_crops), atol=1e-5)
+
+
+def test_dynamic_batch_model_is_batched(tmp_path):
+    model = _save_onnx_model(tmp_path / 'dynamic.onnx', batch='N',
+                             reshape_to=[-1, EMOTION_INPUT_SIZE * EMOTION_INPUT_SIZE])
+    assert get_max_batch_size(model) is None
+
+    face_crops = _face_crops(5)
+    probabilities = classify_face_crops(face_crops, batch_size=4, model=model)
+    assert probabilities.shape == (5, len(EMOTIONS))
+    np.testing.assert_allclose(probabilities, _one_at_a_time(model, face_crops), atol=1e-5)
+
+
+def test_failing_model_skips_visual_emotions(tmp_path, monkeypatch):
+    model = _save_onnx_model(tmp_path / 'fixed.onnx', batch=1, reshape_to=[1, -1])
+    # As if the model's batch size had not been checked when it was loaded:
+    monkeypatch.setattr(visual_emotion, '_emotion_model', model)
+    monkeypatch.setattr(visual_emotion, '_emotion_model_max_batch_size', None)
+
+    results = get_visual_emotions(_face_crops(3), batch_size=32)
+    assert results['score'] == 0 and results['n_faces'] == 0
+
+
+def test_deployed_emotion_model():
+    if not visual_emotion.has_emotion_model():
+        pytest.skip(f"Emotion model not found: {visual_emotion.EMOTION_MODEL_PATH}")
+
+    results = get_visual_emotions(_face_crops(40))
+    assert results['n_faces'] == 40
+    assert results['dominant_emotion'] in EMOTIONS
+    assert 1 <= results['score'] <= 5
+    assert sum(results['emotions'].values()) == pytest.approx(1, abs=1e-4)
@@ -0,0 +1,49 @@
+"""
+Tests for the vocabulary richness scorer (audio_analysis/vocabulary.py):
+MATTR, and word frequency rank lookups, including empty and missing word
+frequency tables.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from audio_analysis.vocabulary import UNKNOWN_WORD_RANK, WORD_WIDTH
+from audio_analysis.vocabulary import get_mattr, get_rare_word_share, get_word_ranks
+
+
+def _table(words_by_rank):
+    words = np.array([word.encode('utf-8') for word in words_by_rank], dtype=f'S{WORD_WIDTH}')
+    ranks = np.arange(1, len(words) + 1, dtype=np.int32)
+    order = np.argsort(words)
+    return words[order], ranks[order]
+
+
+def test_mattr():
+    assert get_mattr([]) is None
+    assert get_mattr(['a', 'b', 'a', 'b']) == 0.5
+    # Windows of 2 over a b a a: (a b), (b a), (a a) -> 2, 2, 1 distinct:
+    assert get_mattr(['a', 'b', 'a', 'a'], window=2) == pytest.approx(5 / 6)
+
+
+def test_word_ranks():
+    table = _table(['the', 'a', 'answer'])
+    ranks = get_word_ranks(['answer', 'the', 'zebra', 'the', 'x' * (WORD_WIDTH + 1)], table)
+    assert ranks.tolist() == [3, 1, UNKNOWN_WORD_RANK, 1, UNKNOWN_WORD_RANK]
+    assert get_rare_word_share(['answer', 'the', 'zebra', 'a'], table, rare_word_rank=2) == 0.5
+
+
+def test_empty_table_gives_unknown_ranks():
+    table = _table([])
+    assert get_word_ranks(['the', 'answer'], table).tolist() == [UNKNOWN_WORD_RANK] * 2
+    assert get_word_ranks([], table).tolist() == []
+    assert get_rare_word_share(['the', 'answer'], table) == 1.0
+
+
+def test_missing_table_gives_no_rare_word_share(tmp_path, monkeypatch):
+    from audio_analysis import vocabulary
+
+    monkeypatch.setattr(vocabulary, 'WORD_FREQUENCY_TABLE', str(tmp_path / 'missing'))
+    assert vocabulary.get_word_frequency_table() is None
+    assert get_rare_word_share(['the', 'answer']) is None
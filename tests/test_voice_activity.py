@@ -0,0 +1,67 @@
+"""
+Tests for the voice activity detector (audio_analysis/voice_activity.py):
+speech is found whether it fills the whole recording or only part of it,
+noise is not taken for speech, and callers fall back to the whole audio
+when the detector finds implausibly little speech.
+
+Run from the repo root with: python -m pytest tests
+"""
+
+import numpy as np
+
+from audio_analysis.audio_buffer import AudioBuffer
+from audio_analysis.audio_functions import use_speech_only
+from audio_analysis.voice_activity import get_speech_segments, has_enough_speech
+
+
+SAMPLE_RATE = 16000
+
+
+def _voiced(seconds, level_dbfs):
+    """
+    Stand-in for voiced speech: a tone with harmonics (peaky spectrum in the
+    speech band) at the given RMS level.
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = sum(np.sin(2 * np.pi * 220 * k * t) / k for k in range(1, 6))
+    return signal / np.sqrt(np.mean(signal ** 2)) * 10 ** (level_dbfs / 20)
+
+
+def test_continuous_voiced_audio_is_speech():
+    # No quiet frames, so the recording's own noise floor is the speech:
+    audio_buffer = AudioBuffer(_voiced(10, -17), SAMPLE_RATE)
+    segments = get_speech_segments(audio_buffer)
+    assert len(segments) == 1
+    assert segments[0][0] == 0 and segments[0][1] > 9.9
+    assert has_enough_speech(audio_buffer)
+    assert use_speech_only(audio_buffer, speech_only=True)
+
+
+def test_speech_between_silences_is_found():
+    random = np.random.RandomState(0)
+    samples = 0.001 * random.normal(size=10 * SAMPLE_RATE)
+    samples[3 * SAMPLE_RATE:6 * SAMPLE_RATE] += _voiced(3, -25)
+    segments = get_speech_segments(AudioBuffer(samples, SAMPLE_RATE))
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert 2.5 <= start <= 3.0 and 6.0 <= end <= 6.5
+
+
+def test_noise_is_not_speech_and_falls_back_to_whole_audio():
+    random = np.random.RandomState(1)
+    for level in (0.001, 0.1):
+        audio_buffer = AudioBuffer(level * random.normal(size=10 * SAMPLE_RATE), SAMPLE_RATE)
+        assert get_speech_segments(audio_buffer) == []
+        assert not has_enough_speech(audio_buffer)
+        assert not use_speech_only(audio_buffer, speech_only=True)
+
+
+def test_too_little_speech_falls_back_to_whole_audio():
+    random = np.random.RandomState(2)
+    samples = 0.001 * random.normal(size=60 * SAMPLE_RATE)
+    samples[10 * SAMPLE_RATE:12 * SAMPLE_RATE] += _voiced(2, -25)
+    audio_buffer = AudioBuffer(samples, SAMPLE_RATE)
+    assert len(get_speech_segments(audio_buffer)) == 1
+    assert not has_enough_speech(audio_buffer)
+    assert not use_speech_only(audio_buffer, speech_only=True)
+    assert not use_speech_only(audio_buffer, speech_only=False)